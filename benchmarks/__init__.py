@@ -0,0 +1,10 @@
+"""Benchmarks of the niwidgets hot paths, run with airspeed velocity.
+
+From the repository root::
+
+    asv run            # benchmark the current commit
+    asv continuous master HEAD    # compare against master
+
+Everything runs headless, on synthetic data made by
+:mod:`benchmarks.synthetic`.
+"""
@@ -0,0 +1,22 @@
+"""Benchmarks of the time taken to import the package."""
+
+
+class ImportSuite:
+    """Importing niwidgets, and then one of its widgets, in a fresh process.
+
+    The widgets are loaded lazily, so the bare import should take a small
+    fraction of the time of importing a widget.
+    """
+
+    timeout = 120
+
+    def timeraw_import_package(self):
+        return "import niwidgets"
+
+    def timeraw_import_volume_widget(self):
+        return "from niwidgets import VolumeWidget"
+
+    def timeraw_import_all_widgets(self):
+        return """
+        from niwidgets import NiftiWidget, SurfaceWidget, StreamlineWidget
+        """
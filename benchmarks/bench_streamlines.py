@@ -0,0 +1,30 @@
+"""Benchmarks of the streamline widget."""
+import numpy as np
+
+from niwidgets.streamlines import StreamlineWidget
+
+from .synthetic import tractogram
+
+
+class StreamlineWidgetSuite:
+    """Building the line mesh, and filtering lines by length."""
+
+    params = [10000, 100000, 1000000, 5000000]
+    param_names = ["n_streamlines"]
+    timeout = 1200
+
+    def setup(self, n_streamlines):
+        self.widget = StreamlineWidget(streamlines=tractogram(n_streamlines))
+        self.widget.plot(display_fraction=1.0)
+        self.thresholds = np.percentile(self.widget.lengths, [20, 80])
+
+    def time_create_mesh(self, n_streamlines):
+        self.widget._create_mesh()
+
+    def peakmem_create_mesh(self, n_streamlines):
+        self.widget._create_mesh()
+
+    def time_plot_lines(self, n_streamlines):
+        # raising, then lowering, the length threshold
+        for threshold in (self.thresholds[1], self.thresholds[0]):
+            self.widget._plot_lines(self.widget.state, threshold)
@@ -0,0 +1,54 @@
+"""Benchmarks of the surface widget."""
+from niwidgets.niwidget_surface import SurfaceWidget
+
+from .synthetic import surface_files
+
+
+class SurfaceWidgetSuite:
+    """Plotting a surface, and switching overlays and colormaps."""
+
+    params = [10000, 100000, 300000]
+    param_names = ["n_vertices"]
+    timeout = 300
+
+    def setup(self, n_vertices):
+        self.mesh, self.overlays = surface_files(n_vertices)
+        self.widget = SurfaceWidget(self.mesh, self.overlays)
+        self.widget.surface_plotter()
+        self.kwargs = self._plot_kwargs()
+
+    def teardown(self, n_vertices):
+        self.widget.close()
+
+    def _plot_kwargs(self):
+        import nibabel as nib
+
+        mesh = nib.load(self.mesh)
+        x, y, z = mesh.darrays[0].data.T
+        overlays = {
+            name: nib.load(filename).darrays[0].data
+            for name, filename in self.widget.overlayfiles.items()
+        }
+        return dict(
+            x=x, y=y, z=z, triangles=mesh.darrays[1].data, overlays=overlays
+        )
+
+    def time_surface_plotter(self, n_vertices):
+        widget = SurfaceWidget(self.mesh, self.overlays)
+        widget.surface_plotter()
+        widget.close()
+
+    def peakmem_surface_plotter(self, n_vertices):
+        widget = SurfaceWidget(self.mesh, self.overlays)
+        widget.surface_plotter()
+        widget.close()
+
+    def time_plot_surface(self, n_vertices):
+        # alternate between overlays and colormaps, as the controls would
+        for frame in self.kwargs["overlays"]:
+            for colormap in ("summer", "viridis"):
+                self.widget._plot_surface(
+                    frame=frame, colormap=colormap, **self.kwargs
+                )
+                # colouring happens in the background
+                self.widget.wait()
@@ -0,0 +1,30 @@
+"""Benchmarks of reading the time series of voxels."""
+import numpy as np
+
+from niwidgets.slicing import load_volume
+from niwidgets.timecourse import TimeCourses
+
+from .synthetic import volume_file
+
+SHAPES = [(96, 96, 64, 100), (64, 64, 40, 1000)]
+
+
+class TimeCourseSuite:
+    """Reading the time series of 50 scattered voxels."""
+
+    params = [SHAPES, [False, True]]
+    param_names = ["shape", "time_major"]
+    timeout = 300
+
+    def setup(self, shape, time_major):
+        self.timecourses = TimeCourses(
+            load_volume(volume_file(shape)), time_major=time_major
+        )
+        rng = np.random.RandomState(0)
+        self.voxels = [
+            tuple(rng.randint(0, n) for n in shape[:3]) for _ in range(50)
+        ]
+
+    def time_read_voxels(self, shape, time_major):
+        for voxel in self.voxels:
+            self.timecourses(*voxel)
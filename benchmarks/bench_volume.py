@@ -0,0 +1,187 @@
+"""Benchmarks of the volume widgets."""
+from niwidgets.export import render_lightbox
+from niwidgets.grid import GridWidget
+from niwidgets.lightbox import LightboxWidget
+from niwidgets.niwidget_volume import VolumeWidget
+from niwidgets.raster import FRAME_FORMATS, encode_frame
+from niwidgets.slicing import extract_plane, get_dataobj, load_volume
+from niwidgets.stats import compute_statistics
+
+from .synthetic import volume_file
+
+SHAPES = [(64, 64, 64), (256, 256, 256), (96, 96, 64, 100)]
+
+
+class VolumeWidgetSuite:
+    """Building a VolumeWidget, and moving its sliders."""
+
+    params = [SHAPES, ["matplotlib", "raster"]]
+    param_names = ["shape", "renderer"]
+    timeout = 300
+
+    def setup(self, shape, renderer):
+        self.filename = volume_file(shape)
+        self.widget = VolumeWidget(self.filename, renderer=renderer)
+        self.widget.wait()
+
+    def teardown(self, shape, renderer):
+        self.widget.close()
+
+    def time_construction(self, shape, renderer):
+        widget = VolumeWidget(self.filename, renderer=renderer)
+        widget.wait()
+        widget.close()
+
+    def peakmem_construction(self, shape, renderer):
+        widget = VolumeWidget(self.filename, renderer=renderer)
+        widget.wait()
+        widget.close()
+
+    def time_update_slices(self, shape, renderer):
+        # each step re-reads the axial plane and moves two guides
+        for z in range(10, 30):
+            self.widget.z = z
+            self.widget.wait()
+
+    def time_colormap(self, shape, renderer):
+        for colormap in ("gray", "viridis", "summer"):
+            self.widget.colormap = colormap
+            self.widget.wait()
+
+
+class VolumeTimeSuite:
+    """Stepping a VolumeWidget through the time points of a 4D image."""
+
+    params = [
+        [shape for shape in SHAPES if len(shape) > 3],
+        ["matplotlib", "raster"],
+    ]
+    param_names = ["shape", "renderer"]
+    timeout = 300
+
+    def setup(self, shape, renderer):
+        self.widget = VolumeWidget(volume_file(shape), renderer=renderer)
+        self.widget.wait()
+
+    def teardown(self, shape, renderer):
+        self.widget.close()
+
+    def time_update_time(self, shape, renderer):
+        for t in range(10, 20):
+            self.widget.t = t
+            self.widget.wait()
+
+
+class GridSuite:
+    """Moving the shared cursor over many subjects.
+
+    A grid widget is compared with one linked raster widget per subject.
+    """
+
+    params = [[1, 5, 20], ["grid", "linked"]]
+    param_names = ["subjects", "viewer"]
+    timeout = 300
+
+    def setup(self, subjects, viewer):
+        filenames = [volume_file((64, 64, 64))] * subjects
+        if viewer == "grid":
+            self.widgets = [GridWidget(filenames)]
+        else:
+            self.widgets = [
+                VolumeWidget(filename, renderer="raster")
+                for filename in filenames
+            ]
+        for widget in self.widgets:
+            widget.wait()
+
+    def teardown(self, subjects, viewer):
+        for widget in self.widgets:
+            widget.close()
+
+    def time_move_cursor(self, subjects, viewer):
+        for z in range(10, 30):
+            for widget in self.widgets:
+                widget.z = z
+            for widget in self.widgets:
+                widget.wait()
+
+
+class LightboxSuite:
+    """Stepping a 36 plane lightbox through time, and recolouring it."""
+
+    params = [[(96, 96, 64, 100), (256, 256, 256, 4)]]
+    param_names = ["shape"]
+    timeout = 300
+
+    def setup(self, shape):
+        self.widget = LightboxWidget(
+            volume_file(shape), n_planes=36, colormap="gray"
+        )
+        self.widget.wait()
+
+    def teardown(self, shape):
+        self.widget.close()
+
+    def time_update_time(self, shape):
+        for t in range(shape[3]):
+            self.widget.t = t
+            self.widget.wait()
+
+    def time_colormap(self, shape):
+        for colormap in ("viridis", "summer", "gray"):
+            self.widget.colormap = colormap
+            self.widget.wait()
+
+
+class EncodingSuite:
+    """Encoding a colour-mapped 512 x 512 view in each frame format.
+
+    The size of each encoded frame, which is what a remote link has to
+    carry, is tracked alongside the time to encode it.
+    """
+
+    params = [list(FRAME_FORMATS)]
+    param_names = ["format"]
+
+    def setup(self, image_format):
+        widget = VolumeWidget(
+            volume_file((256, 256, 256)), renderer="raster", colormap="gray"
+        )
+        widget.wait()
+        rgba = widget._rgba[2]
+        widget.close()
+        # a view as large as a typical figure, in pixels
+        self.rgba = rgba.repeat(2, axis=0).repeat(2, axis=1)
+
+    def time_encode(self, image_format):
+        encode_frame(self.rgba, image_format)
+
+    def track_bytes(self, image_format):
+        return len(encode_frame(self.rgba, image_format)[0])
+
+    track_bytes.unit = "bytes"
+
+
+class SlicingSuite:
+    """Reading planes and summarising volumes, without any widgets."""
+
+    params = [SHAPES, [False, True]]
+    param_names = ["shape", "compressed"]
+    timeout = 300
+
+    def setup(self, shape, compressed):
+        self.image = load_volume(volume_file(shape, compressed))
+        self.dataobj = get_dataobj(self.image)
+
+    def time_extract_planes(self, shape, compressed):
+        for axis in range(3):
+            extract_plane(self.dataobj, axis, shape[axis] // 2)
+
+    def time_statistics(self, shape, compressed):
+        compute_statistics(self.image)
+
+    def peakmem_statistics(self, shape, compressed):
+        compute_statistics(self.image)
+
+    def time_lightbox(self, shape, compressed):
+        render_lightbox(self.image, n_planes=16)
@@ -0,0 +1,167 @@
+"""Synthetic volumes, surfaces and tractograms for the benchmarks.
+
+Generated files are written to a temporary directory once per process,
+and reused by every benchmark that asks for the same data.
+"""
+import atexit
+import functools
+import os
+import shutil
+import tempfile
+
+import nibabel as nib
+import numpy as np
+
+_directory = None
+
+
+def data_directory():
+    """A temporary directory that is removed when the process exits."""
+    global _directory
+    if _directory is None:
+        _directory = tempfile.mkdtemp(prefix="niwidgets-bench-")
+        atexit.register(shutil.rmtree, _directory, True)
+    return _directory
+
+
+def volume_array(shape, seed=0):
+    """A smooth head-like blob surrounded by zeros, with some noise."""
+    rng = np.random.RandomState(seed)
+    spatial = shape[:3]
+    grid = np.ogrid[tuple(slice(0, n) for n in spatial)]
+    radius = sum(
+        ((axis - n / 2) / (n / 2.5)) ** 2 for axis, n in zip(grid, spatial)
+    )
+    head = np.where(radius < 1, 1000 * (1.2 - radius), 0).astype(np.float32)
+    if len(shape) == 3:
+        return head + (head > 0) * rng.normal(0, 20, spatial).astype(
+            np.float32
+        )
+    array = np.empty(shape, dtype=np.float32, order="F")
+    for t in range(shape[3]):
+        array[..., t] = head * (1 + 0.01 * np.sin(t))
+    return array
+
+
+@functools.lru_cache(maxsize=None)
+def volume_file(shape, compressed=False):
+    """Write a synthetic volume to a NIfTI file and return its path."""
+    extension = ".nii.gz" if compressed else ".nii"
+    filename = os.path.join(
+        data_directory(),
+        "volume-" + "x".join(str(n) for n in shape) + extension,
+    )
+    nib.save(nib.Nifti1Image(volume_array(shape), np.eye(4)), filename)
+    return filename
+
+
+def sphere_mesh(n_vertices):
+    """A UV sphere with about ``n_vertices`` vertices.
+
+    Returns
+    -------
+        vertices : np.ndarray
+                The (V, 3) coordinates, in a 100 mm radius.
+        triangles : np.ndarray
+                The (T, 3) vertex indices of each triangle.
+    """
+    rows = max(int(np.sqrt(n_vertices / 2)), 3)
+    columns = 2 * rows
+    theta = np.linspace(0.05, np.pi - 0.05, rows)[:, np.newaxis]
+    phi = np.linspace(0, 2 * np.pi, columns, endpoint=False)[np.newaxis]
+    vertices = 100 * np.stack(
+        np.broadcast_arrays(
+            np.sin(theta) * np.cos(phi),
+            np.sin(theta) * np.sin(phi),
+            np.cos(theta),
+        ),
+        axis=-1,
+    ).reshape(-1, 3)
+
+    # two triangles per quad, wrapping around in longitude
+    row, column = np.meshgrid(
+        np.arange(rows - 1), np.arange(columns), indexing="ij"
+    )
+    corner = row * columns + column
+    right = row * columns + (column + 1) % columns
+    below, below_right = corner + columns, right + columns
+    triangles = np.concatenate(
+        [
+            np.stack([corner, below, right], axis=-1).reshape(-1, 3),
+            np.stack([right, below, below_right], axis=-1).reshape(-1, 3),
+        ]
+    )
+    return vertices.astype(np.float32), triangles.astype(np.int32)
+
+
+@functools.lru_cache(maxsize=None)
+def surface_files(n_vertices, n_overlays=2):
+    """Write a sphere mesh and overlays to GIFTI files.
+
+    Returns
+    -------
+        mesh : str
+                The path to the mesh.
+        overlays : tuple
+                The paths to the overlays.
+    """
+    vertices, triangles = sphere_mesh(n_vertices)
+    stem = os.path.join(data_directory(), "surface-{}".format(n_vertices))
+    mesh = nib.gifti.GiftiImage(
+        darrays=[
+            nib.gifti.GiftiDataArray(
+                vertices, intent="NIFTI_INTENT_POINTSET", datatype="float32"
+            ),
+            nib.gifti.GiftiDataArray(
+                triangles, intent="NIFTI_INTENT_TRIANGLE", datatype="int32"
+            ),
+        ]
+    )
+    nib.save(mesh, stem + ".surf.gii")
+
+    rng = np.random.RandomState(0)
+    overlays = []
+    for i in range(n_overlays):
+        overlay = nib.gifti.GiftiImage(
+            darrays=[
+                nib.gifti.GiftiDataArray(
+                    rng.normal(size=len(vertices)).astype(np.float32),
+                    intent="NIFTI_INTENT_NONE",
+                    datatype="float32",
+                )
+            ]
+        )
+        filename = "{}.overlay{}.func.gii".format(stem, i)
+        nib.save(overlay, filename)
+        overlays.append(filename)
+    return stem + ".surf.gii", tuple(overlays)
+
+
+def tractogram(n_streamlines, n_points=10, seed=0):
+    """Random walk streamlines, as a nibabel ArraySequence.
+
+    Args
+    ----
+        n_streamlines : int
+                The number of streamlines.
+        n_points : int
+                The average number of points per streamline.
+    """
+    rng = np.random.RandomState(seed)
+    lengths = rng.randint(
+        max(n_points // 2, 2), n_points * 3 // 2 + 1, n_streamlines
+    )
+    steps = rng.normal(size=(lengths.sum(), 3)).astype(np.float32)
+    starts = np.cumsum(lengths) - lengths
+    # each streamline starts somewhere in a 100 mm cube
+    steps[starts] = rng.uniform(-50, 50, (n_streamlines, 3))
+    points = np.cumsum(steps, axis=0)
+    points -= np.repeat(points[starts] - steps[starts], lengths, axis=0)
+
+    # fill the sequence's buffers directly, rather than from millions of
+    # small arrays
+    streamlines = nib.streamlines.ArraySequence()
+    streamlines._data = points
+    streamlines._offsets = starts
+    streamlines._lengths = lengths
+    return streamlines
@@ -3,9 +3,47 @@ Widgets to visualise neuroimaging data.
 
 For volume images, try import NiftiWidget.
 For surface images, try SurfaceWidget.
+
+The widgets, and the libraries they need, are only imported when they are
+first used, so that ``import niwidgets`` stays fast.
 """
-from .version import __version__  # noqa: F401
-from .exampledata import exampleatlas, examplezmap, examplet1  # noqa: F401
-from .niwidget_volume import NiftiWidget  # noqa: F401
-from .niwidget_surface import SurfaceWidget  # noqa: F401
-from .streamlines import StreamlineWidget  # noqa: F401
+import importlib
+import sys
+
+# the submodule that defines each of the package's attributes
+_LAZY = {
+    "__version__": ".version",
+    "exampleatlas": ".exampledata",
+    "examplezmap": ".exampledata",
+    "examplet1": ".exampledata",
+    "NiftiWidget": ".niwidget_volume",
+    "VolumeWidget": ".niwidget_volume",
+    "ClientVolumeWidget": ".client",
+    "GridWidget": ".grid",
+    "LightboxWidget": ".lightbox",
+    "SurfaceWidget": ".niwidget_surface",
+    "StreamlineWidget": ".streamlines",
+}
+
+__all__ = sorted(name for name in _LAZY if not name.startswith("_"))
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        )
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    # later lookups find the attribute without calling this again
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ needs python 3.7, so import everything up front
+    for _name in _LAZY:
+        globals()[_name] = __getattr__(_name)
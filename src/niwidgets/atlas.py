@@ -0,0 +1,189 @@
+"""Label atlases: region names, colours and a precomputed region index.
+
+The index is built in one pass over the atlas. For each axis, a single
+``np.bincount`` per chunk counts the voxels of every label in every plane.
+These per-plane profiles give each region's voxel count, centroid and
+bounding box, so looking up or jumping to a region never scans the volume
+again.
+"""
+import numpy as np
+
+from .lut import categorical_lut
+from .slicing import get_dataobj, load_volume
+from .stats import _iter_chunks
+
+
+def read_label_table(filename):
+    """Read the names, and any colours, of the labels in an atlas.
+
+    Each line holds a label value and its name, separated by whitespace, as
+    in FreeSurfer's ``FreeSurferColorLUT.txt``. If the name is followed by
+    red, green and blue values, they are used as the region's colour. Empty
+    lines and lines starting with ``#`` are skipped.
+
+    Returns
+    -------
+        names : dict
+                The name of each label.
+        colors : dict
+                The (r, g, b) colour of each label that has one.
+    """
+    names, colors = {}, {}
+    with open(str(filename)) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 2 or fields[0].startswith("#"):
+                continue
+            label = int(fields[0])
+            names[label] = fields[1]
+            if len(fields) >= 5:
+                colors[label] = tuple(int(value) for value in fields[2:5])
+    return names, colors
+
+
+def _as_labels(values):
+    """Round values to integer labels, with negatives and NaNs as 0."""
+    values = np.asarray(values)
+    if values.dtype.kind not in "iu":
+        values = np.nan_to_num(np.round(values))
+    return np.maximum(values.astype(np.int64), 0)
+
+
+class AtlasIndex:
+    """The regions of a label atlas, indexed for constant time lookups.
+
+    Args
+    ----
+        image : str, pathlib.Path, nibabel image
+                The 3D label image, in which each voxel holds a region's
+                integer label and 0 is the background.
+        names : dict, str
+                The name of each label, or a label table file to read them
+                (and colours) from; see :func:`read_label_table`. Labels
+                without a name are called "Region <label>".
+        chunk_bytes : int
+                Roughly how much of the atlas is read at a time while the
+                index is built.
+
+    Attributes
+    ----------
+        labels : np.ndarray
+                The labels of the regions present, excluding 0.
+        counts : np.ndarray
+                The number of voxels of each label value.
+        centroids : np.ndarray
+                The mean voxel coordinates of each label value.
+        bounding_boxes : np.ndarray
+                The first and last voxel of each label value along each
+                axis, of shape (n_labels, 2, 3).
+    """
+
+    def __init__(self, image, names=None, chunk_bytes=64 * 1024 ** 2):
+        self.image = load_volume(image)
+        self.dataobj = get_dataobj(self.image)
+        if len(self.dataobj.shape) != 3:
+            raise ValueError("Label atlases must be 3D images.")
+        self._build(chunk_bytes)
+
+        colors = {}
+        if isinstance(names, dict):
+            names = dict(names)
+        elif names is not None:
+            names, colors = read_label_table(names)
+        self.names = {
+            int(label): "Region {}".format(label) for label in self.labels
+        }
+        self.names.update(names or {})
+        self._labels_by_name = {
+            name: label for label, name in self.names.items()
+        }
+        self.lut = categorical_lut(len(self.counts), colors)
+
+    def _build(self, chunk_bytes):
+        shape = self.dataobj.shape
+        profiles = [np.zeros((0, n), dtype=np.int64) for n in shape]
+        z_start = 0
+        for _, chunk in _iter_chunks(self.dataobj, chunk_bytes):
+            labels = _as_labels(chunk)
+            n_labels = max(int(labels.max()) + 1, len(profiles[0]))
+            planes = [
+                np.arange(shape[0])[:, np.newaxis, np.newaxis],
+                np.arange(shape[1])[np.newaxis, :, np.newaxis],
+                z_start + np.arange(labels.shape[2])[np.newaxis, np.newaxis],
+            ]
+            for axis, plane in enumerate(planes):
+                n = shape[axis]
+                counts = np.bincount(
+                    (labels * n + plane).ravel(), minlength=n_labels * n
+                ).reshape(n_labels, n)
+                counts[: len(profiles[axis])] += profiles[axis]
+                profiles[axis] = counts
+            z_start += labels.shape[2]
+
+        self.counts = profiles[0].sum(axis=1)
+        present = self.counts > 0
+        self.labels = np.flatnonzero(present[1:]) + 1
+        self.centroids = np.full((len(self.counts), 3), np.nan)
+        self.bounding_boxes = np.zeros((len(self.counts), 2, 3), dtype=int)
+        for axis, profile in enumerate(profiles):
+            occupied = profile > 0
+            self.centroids[present, axis] = (
+                profile[present].dot(np.arange(profile.shape[1]))
+                / self.counts[present]
+            )
+            self.bounding_boxes[:, 0, axis] = occupied.argmax(axis=1)
+            self.bounding_boxes[:, 1, axis] = (
+                profile.shape[1] - 1 - occupied[:, ::-1].argmax(axis=1)
+            )
+
+    def label_at(self, x, y, z):
+        """The label of a voxel, or 0 outside the atlas."""
+        if not all(0 <= i < n for i, n in zip((x, y, z), self.dataobj.shape)):
+            return 0
+        return int(_as_labels(self.dataobj[x, y, z]))
+
+    def name(self, label):
+        """The name of a label, or None for the background."""
+        if label == 0:
+            return None
+        return self.names.get(label, "Region {}".format(label))
+
+    def find(self, name):
+        """The label of a region, given its name."""
+        return self._labels_by_name[name]
+
+    def region(self, label):
+        """A summary of one region: its name, size, centroid and extent."""
+        if not 0 < label < len(self.counts) or not self.counts[label]:
+            raise KeyError("There is no region with label {}.".format(label))
+        return {
+            "label": int(label),
+            "name": self.name(label),
+            "voxels": int(self.counts[label]),
+            "centroid": tuple(self.centroids[label]),
+            "bounding_box": tuple(
+                map(tuple, self.bounding_boxes[label].tolist())
+            ),
+        }
+
+    def colorize(self, plane):
+        """Colour a plane of labels into a uint8 RGBA image.
+
+        Values that aren't labels of the atlas, such as the NaNs outside a
+        resliced image, are transparent.
+        """
+        plane = np.asarray(plane)
+        missing = len(self.lut) - 1
+        with np.errstate(invalid="ignore"):
+            outside = ~np.isfinite(plane) | (plane < 0) | (plane >= missing)
+        labels = np.where(outside, missing, _as_labels(plane))
+        return self.lut[labels]
+
+    def colormap(self):
+        """The lookup table as a matplotlib colormap, for label values.
+
+        Use it with ``vmin=-0.5`` and ``vmax=len(atlas.counts) - 0.5``.
+        """
+        from matplotlib.colors import ListedColormap
+
+        return ListedColormap(self.lut[:-1] / 255)
@@ -0,0 +1,125 @@
+"""Caching and background prefetching of extracted planes."""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def get_cache_dir():
+    """Return the directory for data niwidgets keeps between sessions.
+
+    This is ``$NIWIDGETS_CACHE_DIR`` if set, or ``~/.cache/niwidgets``.
+    """
+    directory = os.environ.get(
+        "NIWIDGETS_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "niwidgets"),
+    )
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+class PlaneCache:
+    """A least-recently-used cache of arrays, limited by memory use.
+
+    Args
+    ----
+        max_bytes : int
+                The maximum number of bytes held by the cache. The least
+                recently used arrays are dropped to stay below this.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._arrays = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._arrays
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def get(self, key):
+        """Return the array stored under key, or None."""
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._arrays.move_to_end(key)
+            return array
+
+    def put(self, key, array):
+        """Store an array, evicting old ones if over budget."""
+        array = np.asanyarray(array)
+        if array.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._arrays:
+                self.nbytes -= self._arrays.pop(key).nbytes
+            self._arrays[key] = array
+            self.nbytes += array.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._arrays.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def get_or_compute(self, key, compute):
+        """Return the cached array for key, computing it if needed."""
+        array = self.get(key)
+        if array is None:
+            array = compute(*key)
+            self.put(key, array)
+        return array
+
+    def clear(self):
+        """Remove all arrays from the cache."""
+        with self._lock:
+            self._arrays.clear()
+            self.nbytes = 0
+
+
+class Prefetcher:
+    """Fill a :class:`PlaneCache` ahead of time in a background thread.
+
+    Args
+    ----
+        cache : PlaneCache
+                The cache to fill.
+        compute : callable
+                Called as ``compute(*key)`` to produce the array for a key.
+    """
+
+    def __init__(self, cache, compute):
+        self.cache = cache
+        self.compute = compute
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._generation = 0
+
+    def prefetch(self, keys):
+        """Queue keys to be computed, in order.
+
+        Any keys queued by a previous call that haven't been computed yet
+        are abandoned, since the direction of motion may have changed.
+        """
+        self._generation += 1
+        generation = self._generation
+        for key in keys:
+            if key not in self.cache:
+                self._executor.submit(self._fetch, key, generation)
+
+    def _fetch(self, key, generation):
+        if generation != self._generation or key in self.cache:
+            return
+        self.cache.put(key, self.compute(*key))
+
+    def shutdown(self):
+        """Stop the background thread, dropping queued work."""
+        self._generation += 1
+        self._executor.shutdown(wait=False)
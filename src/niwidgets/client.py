@@ -0,0 +1,211 @@
+"""Volume rendering in the browser, with no kernel round-trips for slicing.
+
+The volume (or a downsampled level of its pyramid) is quantised to uint8
+once, and sent to the browser through ipyvolume's ``volshow``, which
+packs it into a binary buffer. The browser then renders and colour-maps it
+locally with a transfer function. Sliders are linked to the figure in the
+browser, so moving them doesn't wait for the kernel. The kernel is only
+told about cursor changes once a slider is released, and only sends data
+again when the time point changes.
+"""
+import ipyvolume as ipv
+import ipywidgets as widgets
+import numpy as np
+import traitlets
+from IPython import display
+
+from .lut import get_lut, quantise
+from .pyramid import build_pyramid
+from .slicing import get_dataobj, load_volume
+from .stats import get_statistics
+
+# quantised values run from 0 to 254, and 255 marks missing values
+N_LEVELS = 255
+
+
+def quantise_volume(dataobj, vmin, vmax, t=None, chunk_bytes=64 * 1024 ** 2):
+    """Quantise a volume to uint8, reading it a slab at a time.
+
+    Values from ``vmin`` to ``vmax`` map to 0 to 254. Missing values map
+    to 255.
+
+    Args
+    ----
+        dataobj : array-like
+                The image data.
+        vmin, vmax : float
+                The intensity window.
+        t : int
+                The time point, for 4D images.
+        chunk_bytes : int
+                Roughly how much of the volume is read at a time.
+
+    Returns
+    -------
+        volume : np.ndarray
+                The uint8 volume, of the spatial shape of ``dataobj``.
+    """
+    shape = dataobj.shape
+    quantised = np.empty(shape[:3], dtype=np.uint8)
+    step = max(1, chunk_bytes // (int(np.prod(shape[:2])) * 8))
+    extra = () if len(shape) < 4 else (t or 0,) + (0,) * (len(shape) - 4)
+    for start in range(0, shape[2], step):
+        slab = (slice(None), slice(None), slice(start, start + step))
+        quantised[slab] = quantise(
+            np.asanyarray(dataobj[slab + extra]), vmin, vmax, N_LEVELS
+        )
+    return quantised
+
+
+def transfer_function_rgba(colormap, opacity=0.1):
+    """The (256, 4) float RGBA table of a colormap, for ipyvolume.
+
+    Opacity rises with intensity up to ``opacity``, so that the background
+    is see-through. Missing values are transparent.
+    """
+    rgba = get_lut(colormap, N_LEVELS).astype(np.float32) / 255
+    rgba[:N_LEVELS, 3] = np.linspace(0, opacity, N_LEVELS)
+    rgba[N_LEVELS, 3] = 0
+    return rgba
+
+
+class ClientVolumeWidget(traitlets.HasTraits):
+    """Render a volume in the browser with ipyvolume.
+
+    Args
+    ----
+        filename : str, pathlib.Path, nibabel image
+                The image to show.
+        colormap : str, list
+                A colormap, or a list of colormaps to choose from. Changing
+                it only sends a new 256 entry table.
+        opacity : float
+                The opacity of the brightest voxels.
+        max_shape : int
+                The largest size the volume is sent at along any axis.
+                Bigger images are sent as a level of their pyramid, which
+                is built beside the file.
+        width, height : int
+                The size of the figure, in pixels.
+
+    Notes
+    -----
+        If the installed ipyvolume has slice planes (the figure's
+        ``slice_x``, ``slice_y`` and ``slice_z`` traits), the sliders move
+        them in the browser directly.
+    """
+
+    x = traitlets.Integer(0)
+    y = traitlets.Integer(0)
+    z = traitlets.Integer(0)
+    t = traitlets.Integer(0)
+    colormap = traitlets.Unicode("gray")
+    opacity = traitlets.Float(0.1)
+
+    def __init__(
+        self,
+        filename,
+        colormap="gray",
+        opacity=0.1,
+        max_shape=256,
+        width=500,
+        height=500,
+    ):
+        self.data = load_volume(filename)
+        self.shape = tuple(self.data.shape)
+        self.ndim = min(len(self.shape), 4)
+        self.dims = ["x", "y", "z", "t"][: self.ndim]
+        dataobj = get_dataobj(self.data)
+        self._window = None
+        if max(self.shape[:3]) > max_shape:
+            pyramid = build_pyramid(self.data)
+            fits = [
+                level
+                for level in pyramid.levels
+                if max(level.shape[:3]) <= max_shape
+            ]
+            # the finest level that fits, or else the coarsest there is
+            self._dataobj = fits[0] if fits else pyramid.levels[-1]
+            self._window = pyramid.window
+        else:
+            self._dataobj = dataobj
+        if self._window is None:
+            self._window = get_statistics(self.data).window()
+
+        self.controls = {}
+        for i, dim in enumerate(self.dims):
+            self.controls[dim] = widgets.IntSlider(
+                min=0,
+                max=self.shape[i] - 1,
+                value=(self.shape[i] - 1) // 2,
+                description=dim.upper(),
+                # the kernel only needs to know where the slider settles
+                continuous_update=False,
+            )
+            widgets.link((self.controls[dim], "value"), (self, dim))
+
+        if isinstance(colormap, str):
+            self.color_picker = widgets.HBox([])
+        else:
+            self.color_picker = widgets.Dropdown(
+                options=colormap, description="Colormap:"
+            )
+            widgets.link((self.color_picker, "value"), (self, "colormap"))
+            colormap = colormap[0]
+        self.colormap = colormap
+        self.opacity = opacity
+
+        self.figure = ipv.figure(width=width, height=height)
+        self.transfer_function = ipv.transferfunction.TransferFunction(
+            rgba=transfer_function_rgba(self.colormap, self.opacity)
+        )
+        ipv.volshow(
+            self._quantised(),
+            data_min=0,
+            data_max=N_LEVELS,
+            tf=self.transfer_function,
+            controls=False,
+            # voxel coordinates, so the sliders and the figure agree
+            extent=[[0, n] for n in self.shape[:3]],
+        )
+        for dim in "xyz":
+            trait = "slice_" + dim
+            if self.figure.has_trait(trait):
+                widgets.jslink(
+                    (self.controls[dim], "value"), (self.figure, trait)
+                )
+
+    def _quantised(self):
+        """The current time point as uint8, in ipyvolume's (z, y, x) order."""
+        volume = quantise_volume(self._dataobj, *self._window, t=self.t)
+        return np.ascontiguousarray(volume.T)
+
+    @traitlets.observe("t")
+    def _update_time(self, change):
+        # the only change that needs new voxel data
+        if hasattr(self, "figure"):
+            self.figure.volume_data = self._quantised()
+
+    @traitlets.observe("colormap", "opacity")
+    def _update_transfer_function(self, change):
+        if hasattr(self, "transfer_function"):
+            self.transfer_function.rgba = transfer_function_rgba(
+                self.colormap, self.opacity
+            )
+
+    def render(self):
+        """Build the widget view and return it."""
+        return widgets.VBox(
+            [
+                widgets.Box(
+                    [self.controls[dim] for dim in self.dims],
+                    layout={"flex_flow": "row wrap"},
+                ),
+                self.color_picker,
+                self.figure,
+            ]
+        )
+
+    def _ipython_display_(self):
+        """This gets called instead of __repr__ in ipython."""
+        display.display(self.render())
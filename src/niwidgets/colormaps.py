@@ -2,25 +2,26 @@ import ipywidgets
 
 # from matplotlib import pyplot as plt
 
+# options = (sorted(m for m in plt.cm.datad if not m.endswith("_r")))
+DEFAULT_COLORMAPS = (
+    "viridis",
+    "summer",
+    "gray",
+    "Blues",
+    "Greens",
+    "Greys",
+    "Oranges",
+    "Purples",
+    "Reds",
+    "nipy_spectral",
+)
+
 
 def get_cmap_dropdown(colormap):
     # set default colormap options & add them to the kwargs
     if colormap is None:
-        # options = (sorted(m for m in plt.cm.datad if not m.endswith("_r")))
-        options = [
-            "viridis",
-            "summer",
-            "gray",
-            "Blues",
-            "Greens",
-            "Greys",
-            "Oranges",
-            "Purples",
-            "Reds",
-            "nipy_spectral",
-        ]
         return ipywidgets.Dropdown(
-            options=options,
+            options=list(DEFAULT_COLORMAPS),
             value="viridis",
             description="Colormap:",
             indent=False,
@@ -1,7 +1,64 @@
+import inspect
+import weakref
+
 import ipywidgets as widgets
 import traitlets
 
 
+def weak_link(source, target):
+    """Link two traits, like :func:`ipywidgets.link`, without keeping the
+    target alive.
+
+    ipywidgets keeps every control alive until it is closed, so a control
+    linked to a widget's trait would keep the widget, and all the data it
+    holds, alive too. This link only holds a weak reference to the target,
+    and is dropped once the target is gone.
+
+    Args
+    ----
+        source : tuple
+                The control and the name of its trait, e.g.
+                ``(slider, "value")``.
+        target : tuple
+                The object and the name of its trait to keep in sync.
+    """
+    control, control_name = source
+    target, name = target
+    target_ref = weakref.ref(target)
+    setattr(target, name, getattr(control, control_name))
+
+    def update_target(change):
+        target = target_ref()
+        if target is None:
+            control.unobserve(update_target, names=control_name)
+        else:
+            setattr(target, name, change["new"])
+
+    def update_source(change):
+        setattr(control, control_name, change["new"])
+
+    control.observe(update_target, names=control_name)
+    target.observe(update_source, names=name)
+
+
+def weak_callback(method):
+    """Wrap a bound method, so that whatever calls it doesn't keep the
+    method's object alive.
+
+    Calls made once the object is gone do nothing. The wrapper has the
+    method's signature, so that it can be passed to ``interact``.
+    """
+    method_ref = weakref.WeakMethod(method)
+
+    def callback(*args, **kwargs):
+        method = method_ref()
+        if method is not None:
+            return method(*args, **kwargs)
+
+    callback.__signature__ = inspect.signature(method)
+    return callback
+
+
 class PlaySlider(widgets.HBox):
     """
     A combined Play / IntSlider widget.
@@ -0,0 +1,409 @@
+"""Export the views of volume images to files, without a notebook.
+
+The images are drawn the same way as the raster views of
+:class:`~niwidgets.niwidget_volume.VolumeWidget`, so quality control images
+for many subjects can be produced in one go::
+
+    from niwidgets.export import export_batch
+
+    export_batch(filenames, "qc", lightbox=2, sweep="gif")
+
+Each file is handled by one worker process. Planes are read one at a time
+from the file, and videos are written a frame at a time, so a worker's
+memory use doesn't grow with the size of the image. GIFs have to be
+written in one go, so their frames are kept as palette images, at one
+byte per pixel.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .raster import (
+    GUIDE_COLOR,
+    _flatten,
+    colormap_plane,
+    encode_png,
+    tile_images,
+)
+from .slicing import extract_planes, get_dataobj, load_volume
+from .sources import _import_optional
+from .stats import get_statistics
+
+VIEW_NAMES = ("sagittal", "coronal", "axial")
+ANIMATION_FORMATS = ("gif", "mp4")
+
+
+def render_planes(
+    image,
+    axis,
+    indices,
+    t=None,
+    colormap="gray",
+    window=None,
+    orient_radiology=True,
+    guides=None,
+):
+    """Draw planes along one axis of an image as uint8 RGBA arrays.
+
+    The planes are read in one slicing operation and colour-mapped in one
+    lookup.
+
+    Args
+    ----
+        image : nibabel image
+                The image to draw.
+        axis : int
+                The axis perpendicular to the planes: 0 for sagittal, 1 for
+                coronal and 2 for axial.
+        indices : list
+                The positions of the planes along that axis.
+        t : int
+                The time point, for 4D images.
+        colormap : str
+                The name of a matplotlib colormap.
+        window : tuple
+                The (vmin, vmax) intensity range. By default, the same
+                window as the widgets use.
+        orient_radiology : bool
+                Whether to show left on the right, as the widgets do.
+        guides : tuple
+                The (x, y, z) position to draw guide lines through, if any.
+
+    Returns
+    -------
+        rgba : np.ndarray
+                The images, of shape (n_planes, height, width, 4).
+    """
+    if window is None:
+        window = get_statistics(image).window()
+    planes = extract_planes(get_dataobj(image), axis, indices, t)
+    rgba = colormap_plane(np.rot90(planes, axes=(1, 2)), colormap, *window)
+    if guides is not None:
+        x_idx, y_idx = (i for i in range(3) if i != axis)
+        rgba[:, :, guides[x_idx]] = GUIDE_COLOR
+        rgba[:, image.shape[y_idx] - 1 - guides[y_idx]] = GUIDE_COLOR
+    if orient_radiology:
+        rgba = rgba[:, :, ::-1]
+    return rgba
+
+
+def render_plane(image, axis, index, t=None, **kwargs):
+    """Draw one plane of an image as a uint8 RGBA array.
+
+    Args
+    ----
+        image : nibabel image
+                The image to draw.
+        axis : int
+                The axis perpendicular to the plane: 0 for sagittal, 1 for
+                coronal and 2 for axial.
+        index : int
+                The position of the plane along that axis.
+        t : int
+                The time point, for 4D images.
+        kwargs :
+                Passed on to :func:`render_planes`.
+    """
+    return render_planes(image, axis, [index], t, **kwargs)[0]
+
+
+def render_views(image, coords=None, t=None, **kwargs):
+    """Draw the sagittal, coronal and axial planes through a point.
+
+    Args
+    ----
+        image : nibabel image
+                The image to draw.
+        coords : tuple
+                The (x, y, z) point. By default, the centre of the image.
+        t : int
+                The time point, for 4D images.
+        kwargs :
+                Passed on to :func:`render_planes`.
+    """
+    if coords is None:
+        coords = [n // 2 for n in image.shape[:3]]
+    return [
+        render_plane(image, axis, coords[axis], t, **kwargs)
+        for axis in range(3)
+    ]
+
+
+def lightbox_indices(size, n_planes, margin=0.1):
+    """Evenly strided plane positions, leaving out a margin at each end.
+
+    The planes are centred in the range, and are a whole number of planes
+    apart, so that they can be read with a single strided slice.
+    """
+    start = int(size * margin)
+    stop = max(start, size - 1 - int(size * margin))
+    step = max(1, (stop - start) // max(n_planes - 1, 1))
+    n_planes = min(n_planes, (stop - start) // step + 1)
+    start += (stop - start - step * (n_planes - 1)) // 2
+    return np.arange(n_planes) * step + start
+
+
+def render_lightbox(
+    image, axis=2, n_planes=16, columns=None, t=None, **kwargs
+):
+    """Draw evenly spaced planes along one axis as a single mosaic.
+
+    Args
+    ----
+        image : nibabel image
+                The image to draw.
+        axis : int
+                The axis to step along.
+        n_planes : int
+                The number of planes to show.
+        columns : int
+                The number of planes in each row of the mosaic.
+        t : int
+                The time point, for 4D images.
+        kwargs :
+                Passed on to :func:`render_planes`.
+    """
+    indices = lightbox_indices(image.shape[axis], n_planes)
+    return tile_images(
+        render_planes(image, axis, indices, t, **kwargs), columns=columns
+    )
+
+
+def iter_sweep(image, coords=None, **kwargs):
+    """Yield the three views through a point at each time point.
+
+    Frames are produced one at a time, so a whole run is never held in
+    memory. 3D images give a single frame.
+
+    Args
+    ----
+        image : nibabel image
+                The image to draw.
+        coords : tuple
+                The (x, y, z) point. By default, the centre of the image.
+        kwargs :
+                Passed on to :func:`render_plane`.
+    """
+    n_frames = image.shape[3] if len(image.shape) > 3 else 1
+    # use the same window for every frame, so the brightness doesn't flicker
+    kwargs.setdefault("window", get_statistics(image).window())
+    for t in range(n_frames):
+        yield tile_images(
+            render_views(
+                image, coords, t=t if n_frames > 1 else None, **kwargs
+            ),
+            columns=3,
+        )
+
+
+def save_png(filename, rgba):
+    """Write a uint8 RGBA image to a PNG file."""
+    with open(filename, "wb") as f:
+        f.write(encode_png(rgba))
+    return filename
+
+
+def save_animation(filename, frames, fps=10):
+    """Write frames to an animated GIF or an MP4 video.
+
+    GIFs need Pillow, and videos need imageio (with its ffmpeg plugin).
+
+    Args
+    ----
+        filename : str
+                The file to write. The format is chosen from the extension.
+        frames : iterable
+                uint8 RGBA images, all the same size.
+        fps : float
+                The frames per second to play the animation at.
+    """
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension == "gif":
+        _import_optional("PIL", "Exporting GIFs", package="pillow")
+        from PIL import Image
+
+        # Pillow needs all the frames up front, so each one is reduced to
+        # a palette image, a third the size of RGB, as it is drawn
+        images = [
+            Image.fromarray(_flatten(frame)).quantize() for frame in frames
+        ]
+        images[0].save(
+            filename,
+            save_all=True,
+            append_images=images[1:],
+            duration=int(1000 / fps),
+            loop=0,
+        )
+    elif extension == "mp4":
+        imageio = _import_optional(
+            "imageio", "Exporting videos", package="imageio[ffmpeg]"
+        )
+        with imageio.get_writer(filename, fps=fps) as writer:
+            for frame in frames:
+                writer.append_data(_flatten(frame))
+    else:
+        raise ValueError(
+            "Animations can be saved as " + " or ".join(ANIMATION_FORMATS)
+        )
+    return filename
+
+
+def _stem(filename):
+    name = os.path.basename(str(filename).rstrip("/\\"))
+    for extension in (".nii.gz", ".nii", ".zarr", ".hdf5", ".h5", ".mgz"):
+        if name.lower().endswith(extension):
+            return name[: -len(extension)]
+    return os.path.splitext(name)[0]
+
+
+def _unique_stems(filenames):
+    """Name the files of each image so that no two images share names.
+
+    Images with the same file name, e.g. ``sub-01/T1.nii`` and
+    ``sub-02/T1.nii``, are named after their directory too (``sub-01_T1``),
+    and numbered if that still isn't enough.
+    """
+    names = [_stem(filename) for filename in filenames]
+    stems = list(names)
+    for i, filename in enumerate(filenames):
+        if names.count(names[i]) > 1:
+            parent = os.path.basename(
+                os.path.dirname(os.path.abspath(str(filename).rstrip("/\\")))
+            )
+            stems[i] = parent + "_" + stems[i]
+    named = list(stems)
+    for i, stem in enumerate(named):
+        if named.count(stem) > 1:
+            stems[i] = "{}_{}".format(stem, i)
+    return stems
+
+
+def export_volume(
+    filename,
+    output_dir,
+    views=True,
+    lightbox=None,
+    sweep=None,
+    coords=None,
+    t=None,
+    n_planes=16,
+    fps=10,
+    name=None,
+    **kwargs
+):
+    """Export views of one image to files.
+
+    Files are named after the image, e.g. ``sub-01_axial.png``.
+
+    Args
+    ----
+        filename : str, pathlib.Path
+                The image to export.
+        output_dir : str
+                The directory to write to. It is created if needed.
+        views : bool
+                Whether to write the sagittal, coronal and axial planes
+                through ``coords`` as PNGs.
+        lightbox : int
+                If set, also write a mosaic of ``n_planes`` planes along
+                this axis.
+        sweep : str
+                If set to "gif" or "mp4", also write an animation of the
+                three views over time.
+        coords : tuple
+                The (x, y, z) point the views go through. By default, the
+                centre of the image.
+        t : int
+                The time point of the still images, for 4D images.
+        n_planes : int
+                The number of planes in the lightbox.
+        fps : float
+                The frame rate of the animation.
+        name : str
+                The start of the file names. By default, the name of the
+                image file without its extension.
+        kwargs :
+                Passed on to :func:`render_plane`, e.g. ``colormap``.
+
+    Returns
+    -------
+        files : list
+                The files written.
+    """
+    if sweep is not None and sweep not in ANIMATION_FORMATS:
+        raise ValueError(
+            "sweep should be one of: " + ", ".join(ANIMATION_FORMATS)
+        )
+    image = load_volume(filename)
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.join(output_dir, name or _stem(filename))
+
+    files = []
+    if views:
+        for view, rgba in zip(
+            VIEW_NAMES, render_views(image, coords, t=t, **kwargs)
+        ):
+            files.append(save_png(stem + "_" + view + ".png", rgba))
+    if lightbox is not None:
+        rgba = render_lightbox(
+            image, axis=lightbox, n_planes=n_planes, t=t, **kwargs
+        )
+        files.append(save_png(stem + "_lightbox.png", rgba))
+    if sweep is not None:
+        files.append(
+            save_animation(
+                stem + "_sweep." + sweep,
+                iter_sweep(image, coords, **kwargs),
+                fps=fps,
+            )
+        )
+    return files
+
+
+def export_batch(filenames, output_dir, processes=None, **kwargs):
+    """Export views of many images, spread across worker processes.
+
+    Images with the same file name in different directories are told apart
+    by their directory, e.g. ``sub-01_T1_axial.png``.
+
+    Args
+    ----
+        filenames : list
+                The images to export.
+        output_dir : str
+                The directory to write to.
+        processes : int
+                The number of worker processes. By default, one per CPU.
+                With 1, images are exported in this process.
+        kwargs :
+                Passed on to :func:`export_volume`, except ``name``, since
+                each image's files are named after it.
+
+    Returns
+    -------
+        files : dict
+                The files written for each image, keyed by its filename.
+    """
+    if "name" in kwargs:
+        raise ValueError(
+            "Batch exports are named after each image, so name can't be set."
+        )
+    filenames = [str(filename) for filename in filenames]
+    stems = _unique_stems(filenames)
+    if processes == 1:
+        return {
+            filename: export_volume(filename, output_dir, name=stem, **kwargs)
+            for filename, stem in zip(filenames, stems)
+        }
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {
+            filename: executor.submit(
+                export_volume, filename, output_dir, name=stem, **kwargs
+            )
+            for filename, stem in zip(filenames, stems)
+        }
+        return {
+            filename: future.result() for filename, future in futures.items()
+        }
@@ -0,0 +1,344 @@
+"""Compare many volume images side by side, with one shared cursor.
+
+Rather than linking one :class:`~niwidgets.niwidget_volume.VolumeWidget`
+per subject, which re-draws each of them in turn, a :class:`GridWidget`
+reads the same plane of every subject, colour-maps them all in one
+vectorised lookup, and tiles them into one image per view. All the views
+are sent to the browser together, as a single image.
+"""
+import threading
+
+import ipywidgets as widgets
+import numpy as np
+import traitlets
+from IPython import display
+
+from .cache import PlaneCache, Prefetcher
+from .colormaps import get_cmap_dropdown
+from .controls import PlaySlider, weak_link
+from .instrumentation import FRAME, PipelineStats
+from .lut import apply_lut, precompute_luts
+from .raster import GUIDE_COLOR, encode_png, tile_images
+from .reslice import PlaneSampler, Reslicer
+from .scheduler import RenderCancelled, RenderScheduler
+from .slicing import get_dataobj, load_volume
+from .stats import get_statistics
+
+
+def normalise_planes(planes, windows):
+    """Scale a stack of planes so that each plane's window maps to 0 to 1.
+
+    Args
+    ----
+        planes : np.ndarray
+                The planes, of shape (n, rows, columns).
+        windows : np.ndarray
+                The (vmin, vmax) of each plane, of shape (n, 2).
+    """
+    windows = np.asarray(windows, dtype=np.float32)
+    vmin = windows[:, 0, np.newaxis, np.newaxis]
+    span = (windows[:, 1] - windows[:, 0])[:, np.newaxis, np.newaxis]
+    # a flat window maps everything to the bottom of the colormap
+    span = np.where(span > 0, span, np.inf)
+    with np.errstate(invalid="ignore"):
+        return (np.asarray(planes, dtype=np.float32) - vmin) / span
+
+
+class GridWidget(traitlets.HasTraits):
+    """Show the same planes of many images in a grid, with linked sliders.
+
+    The first image sets the grid that the cursor moves on, in world (RAS+)
+    orientation. The other images are sampled onto it with their affines,
+    so they should be registered to the same space, but needn't share the
+    first image's shape or voxel order.
+
+    Args
+    ----
+        filenames : list
+                The images to show: paths, or nibabel images.
+        names : list
+                A label for each image. By default, their position.
+        columns : int
+                The number of images in each row of a view. By default,
+                the grid is as close to square as possible.
+        views : tuple
+                The views to show: 0 for sagittal, 1 for coronal and 2 for
+                axial.
+        colormap : str, list
+                A colormap, or a list of colormaps to choose from.
+        guidelines : bool
+                Whether to display guide lines.
+        orient_radiology : bool
+                Whether to display the images with left and right reversed.
+        robust : bool
+                Whether to choose each image's intensity window from
+                percentiles rather than its full range.
+        animation_speed : int
+                The time between frames when playing, in milliseconds.
+        cache_size : int
+                The memory, in bytes, used to keep recently shown planes.
+        prefetch : int
+                How many planes to read ahead in the background, in the
+                direction a slider is moving. Set to 0 to disable.
+        compression : int
+                The zlib level frames are encoded with. The composed frames
+                are large, so by default they are compressed quickly
+                rather than tightly.
+        stats_callback : callable
+                Called as ``stats_callback(stage, seconds, nbytes)`` after
+                each timed stage of drawing, e.g. to log them. The "frame"
+                stage marks the end of a frame.
+    """
+
+    x = traitlets.Integer(0)
+    y = traitlets.Integer(0)
+    z = traitlets.Integer(0)
+    t = traitlets.Integer(0)
+    colormap = traitlets.Unicode("gray")
+    reverse_colors = traitlets.Bool(False)
+
+    guidelines = traitlets.Bool(True)
+    orient_radiology = traitlets.Bool(True)
+
+    def __init__(
+        self,
+        filenames,
+        names=None,
+        columns=None,
+        views=(0, 1, 2),
+        colormap="gray",
+        guidelines=True,
+        orient_radiology=True,
+        robust=False,
+        animation_speed=300,
+        cache_size=256 * 1024 ** 2,
+        prefetch=4,
+        compression=1,
+        stats_callback=None,
+    ):
+        self.stats = PipelineStats(callback=stats_callback)
+        with self.stats.stage("load"):
+            self.images = [load_volume(filename) for filename in filenames]
+        if not self.images:
+            raise ValueError("At least one image is needed.")
+        self.names = list(names or range(1, len(self.images) + 1))
+        self.columns = columns
+        self.views = tuple(views)
+        self.compression = compression
+
+        reference = Reslicer(
+            get_dataobj(self.images[0]), self.images[0].affine
+        )
+        # the first image is resliced directly, the rest sampled onto it
+        self._samplers = [reference] + [
+            PlaneSampler(
+                get_dataobj(image),
+                np.linalg.inv(image.affine).dot(reference.grid_affine),
+                reference.shape[:3],
+            )
+            for image in self.images[1:]
+        ]
+        self._n_frames = [
+            image.shape[3] if len(image.shape) > 3 else 1
+            for image in self.images
+        ]
+        self.shape = reference.shape[:3]
+        if max(self._n_frames) > 1:
+            self.shape += (max(self._n_frames),)
+        self.ndim = len(self.shape)
+        self.dims = ["x", "y", "z", "t"][: self.ndim]
+        self._windows = np.array(
+            [get_statistics(image).window(robust) for image in self.images]
+        )
+
+        self._cache = PlaneCache(max_bytes=cache_size)
+        self._prefetcher = Prefetcher(self._cache, self._read_plane)
+        self.n_prefetch = prefetch
+        # the colour-mapped planes of each view, before guides are drawn
+        self._rgba = {}
+        self._dirty_content = set(self.views)
+        self._dirty_lock = threading.Lock()
+        self._scheduler = RenderScheduler(self._refresh)
+
+        self.image = widgets.Image(format="png")
+        self.controls = {}
+        for i, dim in enumerate(self.dims):
+            maxval = self.shape[i] - 1
+            self.controls[dim] = PlaySlider(
+                min=0,
+                max=maxval,
+                value=maxval // 2,
+                interval=animation_speed,
+                label=dim.upper(),
+                continuous_update=False,
+            )
+            weak_link((self.controls[dim], "value"), (self, dim))
+
+        if isinstance(colormap, str):
+            self.color_picker = widgets.HBox([])
+            self.colormap = colormap
+        else:
+            self.color_picker = get_cmap_dropdown(colormap)
+            weak_link((self.color_picker, "value"), (self, "colormap"))
+            precompute_luts(self.color_picker.options)
+        self.guidelines = guidelines
+        self.orient_radiology = orient_radiology
+        self._scheduler.request()
+
+    @property
+    def indices(self):
+        return [self.x, self.y, self.z, self.t][: self.ndim]
+
+    def _read_plane(self, subject, axis, index, t):
+        """Read a plane of one image, rotated for display."""
+        with self.stats.stage("read"):
+            if self._n_frames[subject] > 1:
+                t = min(t, self._n_frames[subject] - 1)
+            else:
+                t = None
+            return np.rot90(self._samplers[subject].plane(axis, index, t))
+
+    def _get_plane(self, subject, axis, index, t):
+        return self._cache.get_or_compute(
+            (subject, axis, index, t), self._read_plane
+        )
+
+    def _prefetch(self, change):
+        """Read the next planes of every image, ahead of a slider."""
+        if self.n_prefetch < 1 or change["name"] not in self.dims:
+            return
+        step = 1 if change["new"] >= change["old"] else -1
+        dim = self.dims.index(change["name"])
+        upcoming = [
+            change["new"] + step * i
+            for i in range(1, self.n_prefetch + 1)
+            if 0 <= change["new"] + step * i < self.shape[dim]
+        ]
+        subjects = range(len(self.images))
+        if dim == 3:
+            keys = [
+                (subject, axis, self.indices[axis], t)
+                for t in upcoming
+                for axis in self.views
+                for subject in subjects
+            ]
+        elif dim in self.views:
+            keys = [
+                (subject, dim, index, self.t)
+                for index in upcoming
+                for subject in subjects
+            ]
+        else:
+            return
+        self._prefetcher.prefetch(keys)
+
+    @traitlets.observe("x", "y", "z", "t", "colormap", "reverse_colors")
+    def _update_content(self, change):
+        with self._dirty_lock:
+            if change["name"] in ("x", "y", "z"):
+                # the other views only move a guide line
+                self._dirty_content.add("xyz".index(change["name"]))
+            else:
+                self._dirty_content.update(self.views)
+        self._scheduler.request()
+        self._prefetch(change)
+
+    @traitlets.observe("guidelines", "orient_radiology")
+    def _update_overlay(self, change):
+        self._scheduler.request()
+
+    def _colormap_view(self, axis):
+        """Colour-map the plane of every image in a view, in one go."""
+        t = self.t if self.ndim > 3 else 0
+        planes = np.stack(
+            [
+                self._get_plane(subject, axis, self.indices[axis], t)
+                for subject in range(len(self.images))
+            ]
+        )
+        with self.stats.stage("colormap"):
+            colormap = self.colormap + ("_r" if self.reverse_colors else "")
+            return apply_lut(
+                normalise_planes(planes, self._windows), colormap, 0, 1
+            )
+
+    def _compose_view(self, axis):
+        """Tile the planes of a view, with guides, into one image."""
+        rgba = self._rgba[axis]
+        if self.guidelines:
+            x_idx, y_idx = (i for i in range(3) if i != axis)
+            rgba = rgba.copy()
+            # planes are rotated for display, so the rows run upwards
+            rgba[:, :, self.indices[x_idx]] = GUIDE_COLOR
+            rgba[:, self.shape[y_idx] - 1 - self.indices[y_idx]] = GUIDE_COLOR
+        if self.orient_radiology:
+            rgba = rgba[:, :, ::-1]
+        return tile_images(rgba, columns=self.columns)
+
+    def _refresh(self):
+        """Re-draw the views, and send them as one image.
+
+        This runs on the scheduler's thread.
+        """
+        with self._dirty_lock:
+            content, self._dirty_content = self._dirty_content, set()
+        try:
+            with self.stats.stage(FRAME):
+                for axis in content & set(self.views):
+                    self._scheduler.checkpoint()
+                    self._rgba[axis] = self._colormap_view(axis)
+                frame = tile_images(
+                    [self._compose_view(axis) for axis in self.views],
+                    columns=1,
+                )
+                self._scheduler.checkpoint()
+                with self.stats.stage("encode"):
+                    png = encode_png(frame, self.compression)
+                self._scheduler.checkpoint()
+                with self.stats.stage("send", len(png)):
+                    self.image.value = png
+        except RenderCancelled:
+            # the next render draws these views, in their newest state
+            with self._dirty_lock:
+                self._dirty_content.update(content)
+            raise
+
+    def wait(self, timeout=None):
+        """Block until the image shows the current state."""
+        return self._scheduler.flush(timeout)
+
+    @property
+    def frame_rates(self):
+        """The frame rates requested by the controls, and achieved."""
+        return self._scheduler.stats()
+
+    def render(self):
+        """Build the widget view and return it."""
+        names = ", ".join(str(name) for name in self.names)
+        return widgets.VBox(
+            [
+                widgets.Box(
+                    [self.controls[dim] for dim in self.dims],
+                    layout={"flex_flow": "row wrap"},
+                ),
+                self.color_picker,
+                widgets.Label("Images, row by row: " + names),
+                self.image,
+            ]
+        )
+
+    def _ipython_display_(self):
+        """This gets called instead of __repr__ in ipython."""
+        display.display(self.render())
+
+    def close(self):
+        """Stop the background threads of this widget."""
+        # the widget may not have been built fully, if its arguments were
+        # invalid
+        for worker in ("_scheduler", "_prefetcher"):
+            if getattr(self, worker, None) is not None:
+                getattr(self, worker).shutdown()
+
+    def __del__(self):
+        """Method to tidy up afterwards."""
+        self.close()
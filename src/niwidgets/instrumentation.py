@@ -0,0 +1,179 @@
+"""Timing of the stages widgets go through to show a frame."""
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# the upper edges, in seconds, of the latency histogram bins
+LATENCY_BINS = (
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    float("inf"),
+)
+# the stage that covers drawing a whole frame
+FRAME = "frame"
+# the stage that sends encoded images to the browser
+SEND = "send"
+
+
+class StageStats:
+    """The count, latencies and bytes of one pipeline stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.nbytes = 0
+        self.last_nbytes = 0
+        self.histogram = [0] * len(LATENCY_BINS)
+
+    def add(self, seconds, nbytes=0):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        self.nbytes += nbytes
+        self.last_nbytes = nbytes
+        self.histogram[bisect.bisect_left(LATENCY_BINS, seconds)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def mean_nbytes(self):
+        return self.nbytes / self.count if self.count else 0.0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "max": self.max,
+            "last": self.last,
+            "bytes": self.nbytes,
+            "mean_bytes": self.mean_nbytes,
+            "last_bytes": self.last_nbytes,
+            "histogram": list(zip(LATENCY_BINS, self.histogram)),
+        }
+
+
+class PipelineStats:
+    """Counts, latency histograms and bytes for each stage of a widget.
+
+    Widgets time their stages (e.g. "read", "colormap", "encode", "send")
+    with :meth:`stage`, so that slow sessions can be profiled. The bytes
+    sent while drawing a frame are added up, and recorded as the bytes of
+    the frame stage.
+
+    Args
+    ----
+        callback : callable
+                Called as ``callback(stage, seconds, nbytes)`` after each
+                timed stage.
+        logger : logging.Logger
+                If given, each timed stage is logged at debug level.
+    """
+
+    def __init__(self, callback=None, logger=None):
+        self.callback = callback
+        self.logger = logger
+        self._stages = OrderedDict()
+        self._lock = threading.Lock()
+        self._overlays = []
+        # bytes sent since the last frame was recorded
+        self._sent = 0
+
+    @contextmanager
+    def stage(self, name, nbytes=0):
+        """Time the code in a ``with`` block as one run of a stage."""
+        start = time.perf_counter()
+        yield
+        self.record(name, time.perf_counter() - start, nbytes)
+
+    def record(self, name, seconds, nbytes=0):
+        """Add one run of a stage, taking ``seconds`` and sending bytes."""
+        with self._lock:
+            if name == SEND:
+                self._sent += nbytes
+            elif name == FRAME:
+                nbytes, self._sent = nbytes + self._sent, 0
+            self._stages.setdefault(name, StageStats()).add(seconds, nbytes)
+        if self.callback is not None:
+            self.callback(name, seconds, nbytes)
+        if self.logger is not None:
+            self.logger.debug(
+                "%s took %.2f ms (%d bytes)", name, seconds * 1000, nbytes
+            )
+        if name == FRAME:
+            for overlay in self._overlays:
+                overlay.value = _frame_text(seconds, nbytes)
+
+    def __getitem__(self, name):
+        return self._stages[name]
+
+    def __contains__(self, name):
+        return name in self._stages
+
+    def summary(self):
+        """A dictionary of each stage's statistics, keyed by name."""
+        with self._lock:
+            return {
+                name: stats.as_dict() for name, stats in self._stages.items()
+            }
+
+    def report(self):
+        """A table of the stages, as text."""
+        lines = [
+            "{:<12}{:>8}{:>12}{:>12}{:>12}".format(
+                "stage", "count", "mean (ms)", "max (ms)", "bytes"
+            )
+        ]
+        for name, stats in self.summary().items():
+            lines.append(
+                "{:<12}{:>8}{:>12.2f}{:>12.2f}{:>12}".format(
+                    name,
+                    stats["count"],
+                    stats["mean"] * 1000,
+                    stats["max"] * 1000,
+                    stats["bytes"],
+                )
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        """Forget all recorded stages."""
+        with self._lock:
+            self._stages.clear()
+            self._sent = 0
+
+    def overlay(self):
+        """A label that shows the time taken by the latest frame."""
+        import ipywidgets as widgets
+
+        label = widgets.Label()
+        if FRAME in self._stages:
+            frame = self._stages[FRAME]
+            label.value = _frame_text(frame.last, frame.last_nbytes)
+        self._overlays.append(label)
+        return label
+
+
+def _frame_text(seconds, nbytes=0):
+    text = "Frame: {:.1f} ms ({:.0f} fps)".format(
+        seconds * 1000, 1 / seconds if seconds > 0 else float("inf")
+    )
+    if nbytes:
+        text += ", {:.1f} kB".format(nbytes / 1000)
+    return text
@@ -0,0 +1,118 @@
+"""Overlay layers, such as statistical maps shown over an anatomical."""
+import numpy as np
+import traitlets
+
+from .lut import apply_lut
+from .reslice import PlaneSampler
+from .slicing import get_dataobj, load_volume
+from .stats import get_statistics
+
+
+class Layer(traitlets.HasTraits):
+    """An image shown on top of the base image of a widget.
+
+    The layer is resampled onto the base image's display grid with the
+    affines of both, so it doesn't need to have the same shape, resolution
+    or orientation. Only the displayed planes are resampled.
+
+    Args
+    ----
+        image : str, pathlib.Path, nibabel image
+                The overlay image.
+        colormap : str
+                The name of a matplotlib colormap.
+        threshold : float
+                Values whose magnitude is below this are transparent.
+        opacity : float
+                How opaque the layer is, from 0 to 1.
+        window : tuple
+                The (vmin, vmax) range mapped to the colormap. By default,
+                this is chosen from the image's intensities.
+        name : str
+                A label for the layer's controls.
+    """
+
+    colormap = traitlets.Unicode("hot")
+    threshold = traitlets.Float(None, allow_none=True)
+    opacity = traitlets.Float(1.0)
+
+    def __init__(
+        self,
+        image,
+        colormap="hot",
+        threshold=None,
+        opacity=1.0,
+        window=None,
+        name=None,
+    ):
+        super().__init__(
+            colormap=colormap, threshold=threshold, opacity=opacity
+        )
+        self.image = load_volume(image)
+        self.dataobj = get_dataobj(self.image)
+        self.window = window or get_statistics(self.image).window()
+        self.name = name or "Layer"
+        self._samplers = []
+
+    def bind(self, grid_affines, grid_shapes, order=0):
+        """Prepare to sample the layer onto display grids.
+
+        Args
+        ----
+            grid_affines : list
+                    The 4x4 affine from grid indices to world coordinates,
+                    for each level of the base image.
+            grid_shapes : list
+                    The spatial shape of each of those grids.
+            order : int
+                    The interpolation order, when the layer's axes don't
+                    line up with the grid.
+        """
+        to_voxel = np.linalg.inv(np.asarray(self.image.affine, dtype=float))
+        self._samplers = [
+            PlaneSampler(self.dataobj, to_voxel.dot(affine), shape, order)
+            for affine, shape in zip(grid_affines, grid_shapes)
+        ]
+
+    def plane(self, axis, index, t=None, level=0):
+        """The layer's values on a plane of the base grid.
+
+        Layers with fewer time points than the base image show their last
+        one from then on.
+        """
+        if len(self.dataobj.shape) > 3:
+            t = min(t or 0, self.dataobj.shape[3] - 1)
+        else:
+            t = None
+        return self._samplers[level].plane(axis, index, t)
+
+    @property
+    def style(self):
+        """The (colormap, threshold, opacity) the layer is drawn with."""
+        return self.colormap, self.threshold, self.opacity
+
+    def colorize(self, plane, style=None):
+        """Colour-map a plane of values into a uint8 RGBA image.
+
+        Values outside the layer, or below the threshold, are transparent,
+        and the rest are scaled by the layer's opacity.
+
+        Args
+        ----
+            plane : np.ndarray
+                    The layer's values.
+            style : tuple
+                    The (colormap, threshold, opacity) to use, instead of
+                    the layer's current :attr:`style`.
+        """
+        colormap, threshold, opacity = style or self.style
+        hidden = np.isnan(plane)
+        if threshold is not None:
+            with np.errstate(invalid="ignore"):
+                hidden |= np.abs(plane) < threshold
+        rgba = apply_lut(
+            np.ma.masked_array(plane, hidden), colormap, *self.window
+        )
+        if opacity < 1:
+            rgba[..., 3] = (rgba[..., 3] * opacity).astype(np.uint8)
+        return rgba
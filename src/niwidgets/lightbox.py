@@ -0,0 +1,243 @@
+"""A lightbox of many planes of a volume, drawn as one mosaic image.
+
+The planes are read with a single strided slice and quantised to colormap
+table indices once. Changing the colormap is then a single table lookup
+over the whole mosaic, and stepping through time reads one slab per frame.
+"""
+import ipywidgets as widgets
+import numpy as np
+import traitlets
+from IPython import display
+
+from .cache import PlaneCache, Prefetcher
+from .colormaps import get_cmap_dropdown
+from .controls import PlaySlider, weak_link
+from .export import lightbox_indices
+from .instrumentation import FRAME, PipelineStats
+from .lut import get_lut, precompute_luts, quantise
+from .raster import encode_png, tile_images
+from .scheduler import RenderScheduler
+from .slicing import extract_planes, get_dataobj, load_volume
+from .stats import get_statistics
+
+VIEWS = ("Sagittal", "Coronal", "Axial")
+
+
+class LightboxWidget(traitlets.HasTraits):
+    """Show evenly spaced planes of a volume side by side.
+
+    Args
+    ----
+        filename : str, pathlib.Path, nibabel image
+                The image to show.
+        axis : int
+                The axis to step along: 0 for sagittal, 1 for coronal and 2
+                for axial.
+        n_planes : int
+                The number of planes to show.
+        columns : int
+                The number of planes in each row. By default, the mosaic is
+                as close to square as possible.
+        colormap : str, list
+                A colormap, or a list of colormaps to choose from. If None,
+                a selection of maps is offered.
+        orient_radiology : bool
+                Whether to display the images with left and right reversed.
+        width : int
+                The width of the mosaic on screen, in pixels.
+        animation_speed : int
+                The time between frames when playing, in milliseconds.
+        cache_size : int
+                The memory, in bytes, used to keep recently shown mosaics.
+        prefetch : int
+                How many time points to read ahead in the background. Set
+                to 0 to disable.
+        stats_callback : callable
+                Called as ``stats_callback(stage, seconds, nbytes)`` after
+                each timed stage of drawing, e.g. to log them. The "frame"
+                stage marks the end of a frame.
+    """
+
+    axis = traitlets.Integer(2)
+    n_planes = traitlets.Integer(16)
+    t = traitlets.Integer(0)
+    colormap = traitlets.Unicode("gray")
+    reverse_colors = traitlets.Bool(False)
+    orient_radiology = traitlets.Bool(True)
+
+    def __init__(
+        self,
+        filename,
+        axis=2,
+        n_planes=16,
+        columns=None,
+        colormap=None,
+        orient_radiology=True,
+        width=800,
+        animation_speed=300,
+        cache_size=256 * 1024 ** 2,
+        prefetch=2,
+        stats_callback=None,
+    ):
+        self.stats = PipelineStats(callback=stats_callback)
+        with self.stats.stage("load"):
+            self.data = load_volume(filename)
+            self._dataobj = get_dataobj(self.data)
+        self.shape = tuple(self.data.shape)
+        self.columns = columns
+        self._window = get_statistics(self.data).window()
+
+        self._cache = PlaneCache(max_bytes=cache_size)
+        self._prefetcher = Prefetcher(self._cache, self._read_mosaic)
+        self.n_prefetch = prefetch
+        self._scheduler = RenderScheduler(self._refresh)
+        self.image = widgets.Image(
+            format="png", layout={"width": str(width) + "px"}
+        )
+        self.label = widgets.Label()
+
+        self.axis_picker = widgets.Dropdown(
+            options=list(zip(VIEWS, range(3))), description="View:"
+        )
+        weak_link((self.axis_picker, "value"), (self, "axis"))
+        self.planes_slider = widgets.IntSlider(
+            min=1,
+            max=max(64, n_planes),
+            description="Planes:",
+            continuous_update=False,
+        )
+        weak_link((self.planes_slider, "value"), (self, "n_planes"))
+        if len(self.shape) > 3:
+            self.time_slider = PlaySlider(
+                min=0,
+                max=self.shape[3] - 1,
+                value=0,
+                interval=animation_speed,
+                label="T",
+                continuous_update=False,
+            )
+            weak_link((self.time_slider, "value"), (self, "t"))
+        else:
+            self.time_slider = widgets.Box([])
+
+        if isinstance(colormap, str):
+            self.color_picker = widgets.HBox([])
+            self.color_reverser = widgets.HBox([])
+            self.colormap = colormap
+        else:
+            self.color_picker = get_cmap_dropdown(colormap)
+            weak_link((self.color_picker, "value"), (self, "colormap"))
+            self.color_reverser = widgets.Checkbox(
+                description="Reverse colormap", indent=True
+            )
+            weak_link((self.color_reverser, "value"), (self, "reverse_colors"))
+            precompute_luts(self.color_picker.options)
+
+        self.axis = axis
+        self.n_planes = n_planes
+        self.orient_radiology = orient_radiology
+        self._scheduler.request()
+
+    def _read_mosaic(self, axis, n_planes, t):
+        """Read the planes of a lightbox, as colormap table indices."""
+        indices = lightbox_indices(self.shape[axis], n_planes)
+        t = t if len(self.shape) > 3 else None
+        with self.stats.stage("read"):
+            planes = extract_planes(self._dataobj, axis, indices, t)
+        with self.stats.stage("quantise"):
+            # the table has 257 rows, so the indices fit in 16 bits
+            return quantise(
+                np.rot90(planes, axes=(1, 2)), *self._window
+            ).astype(np.uint16)
+
+    def _get_mosaic(self, axis, n_planes, t):
+        return self._cache.get_or_compute(
+            (axis, n_planes, t), self._read_mosaic
+        )
+
+    @traitlets.observe("t")
+    def _prefetch(self, change):
+        """Read the next time points in the direction of motion."""
+        if self.n_prefetch < 1 or len(self.shape) < 4:
+            return
+        step = 1 if change["new"] >= change["old"] else -1
+        upcoming = [
+            change["new"] + step * i
+            for i in range(1, self.n_prefetch + 1)
+            if 0 <= change["new"] + step * i < self.shape[3]
+        ]
+        self._prefetcher.prefetch(
+            [(self.axis, self.n_planes, t) for t in upcoming]
+        )
+
+    @traitlets.observe(
+        "axis",
+        "n_planes",
+        "t",
+        "colormap",
+        "reverse_colors",
+        "orient_radiology",
+    )
+    def _update(self, change):
+        self._scheduler.request()
+
+    def _refresh(self):
+        """Draw the mosaic and send it to the browser.
+
+        This runs on the scheduler's thread.
+        """
+        with self.stats.stage(FRAME):
+            indices = self._get_mosaic(self.axis, self.n_planes, self.t)
+            with self.stats.stage("colormap"):
+                colormap = self.colormap + (
+                    "_r" if self.reverse_colors else ""
+                )
+                rgba = get_lut(colormap)[indices]
+                if self.orient_radiology:
+                    rgba = rgba[:, :, ::-1]
+                mosaic = tile_images(rgba, columns=self.columns)
+            self._scheduler.checkpoint()
+            with self.stats.stage("encode"):
+                png = encode_png(mosaic)
+            self._scheduler.checkpoint()
+            with self.stats.stage("send", len(png)):
+                self.image.value = png
+        positions = lightbox_indices(self.shape[self.axis], self.n_planes)
+        self.label.value = "{} planes, from {} to {}".format(
+            len(positions), positions[0], positions[-1]
+        )
+
+    def wait(self, timeout=None):
+        """Block until the image shows the current state."""
+        return self._scheduler.flush(timeout)
+
+    def render(self):
+        """Build the widget view and return it."""
+        return widgets.VBox(
+            [
+                widgets.HBox(
+                    [self.axis_picker, self.planes_slider],
+                    layout={"flex_flow": "row wrap"},
+                ),
+                self.time_slider,
+                widgets.HBox([self.color_picker, self.color_reverser]),
+                self.label,
+                self.image,
+            ]
+        )
+
+    def _ipython_display_(self):
+        """This gets called instead of __repr__ in ipython."""
+        display.display(self.render())
+
+    def close(self):
+        """Stop the background threads of this widget."""
+        # the widget may not have been built fully, if its arguments were
+        # invalid
+        for worker in ("_scheduler", "_prefetcher"):
+            if getattr(self, worker, None) is not None:
+                getattr(self, worker).shutdown()
+
+    def __del__(self):
+        """Method to tidy up afterwards."""
+        self.close()
@@ -0,0 +1,114 @@
+"""Colormap lookup tables, for colour-mapping with a single array lookup.
+
+Each table has ``size`` colours spanning the colormap, plus one extra row
+holding the colormap's colour for missing (masked or NaN) values. Data is
+quantised to table indices once, after which any colormap can be applied
+by indexing into its table.
+"""
+import functools
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import hsv_to_rgb
+
+from .colormaps import DEFAULT_COLORMAPS
+
+LUT_SIZE = 256
+
+
+def reversed_name(colormap):
+    """Return the name of the reversed version of a colormap."""
+    return colormap[:-2] if colormap.endswith("_r") else colormap + "_r"
+
+
+@functools.lru_cache(maxsize=None)
+def get_lut(colormap, size=LUT_SIZE):
+    """Return the (read-only) uint8 RGBA lookup table of a colormap.
+
+    Args
+    ----
+        colormap : str
+                The name of a matplotlib colormap.
+        size : int
+                The number of colours in the table.
+
+    Returns
+    -------
+        lut : np.ndarray
+                An array of shape (size + 1, 4). The last row is the colour
+                for missing values.
+    """
+    cmap = plt.get_cmap(colormap)
+    lut = np.empty((size + 1, 4), dtype=np.uint8)
+    lut[:size] = cmap(np.linspace(0, 1, size), bytes=True)
+    lut[size] = cmap(np.ma.masked_invalid([np.nan]), bytes=True)[0]
+    lut.flags.writeable = False
+    return lut
+
+
+def precompute_luts(colormaps=DEFAULT_COLORMAPS, size=LUT_SIZE):
+    """Build the tables for colormaps and their reversed versions."""
+    for colormap in colormaps:
+        get_lut(colormap, size)
+        get_lut(reversed_name(colormap), size)
+
+
+def quantise(data, vmin, vmax, size=LUT_SIZE):
+    """Convert data to lookup table indices.
+
+    Values are binned the same way matplotlib does: ``vmin`` and below map
+    to 0, ``vmax`` and above to ``size - 1``. Masked and non-finite values
+    map to ``size``, the missing value colour.
+    """
+    values = np.asarray(np.ma.getdata(data), dtype=np.float32)
+    if vmax > vmin:
+        # NaNs are replaced below, so casting them is harmless
+        with np.errstate(invalid="ignore"):
+            scaled = (values - vmin) * (size / (vmax - vmin))
+            indices = np.clip(scaled, 0, size - 1).astype(np.intp)
+    else:
+        scaled = values
+        indices = np.zeros(values.shape, dtype=np.intp)
+    indices[~np.isfinite(scaled) | np.ma.getmaskarray(data)] = size
+    return indices
+
+
+def apply_lut(data, colormap, vmin, vmax, size=LUT_SIZE):
+    """Colour-map data to uint8 RGBA in one vectorised lookup."""
+    return get_lut(colormap, size)[quantise(data, vmin, vmax, size)]
+
+
+def categorical_lut(n_labels, colors=None, background=(0, 0, 0, 255)):
+    """Return a uint8 RGBA lookup table with a distinct colour per label.
+
+    Hues are spaced by the golden angle, so that neighbouring label values,
+    which are often neighbouring regions, get clearly different colours.
+
+    Args
+    ----
+        n_labels : int
+                The number of labels, including 0 for the background.
+        colors : dict
+                Colours to use for some labels, as (r, g, b) tuples of 0 to
+                255, e.g. from a label table file.
+        background : tuple
+                The RGBA colour of label 0.
+
+    Returns
+    -------
+        lut : np.ndarray
+                An array of shape (n_labels + 1, 4). The last row is the
+                colour for missing values, which is transparent.
+    """
+    hues = (np.arange(n_labels) * 0.618033988749895) % 1
+    # alternate the brightness too, for atlases with many labels
+    values = np.where(np.arange(n_labels) % 2, 0.75, 1.0)
+    hsv = np.stack([hues, np.full(n_labels, 0.7), values], axis=-1)
+    lut = np.zeros((n_labels + 1, 4), dtype=np.uint8)
+    lut[:n_labels, :3] = np.round(hsv_to_rgb(hsv) * 255)
+    lut[:n_labels, 3] = 255
+    for label, color in (colors or {}).items():
+        if 0 <= label < n_labels:
+            lut[label, :3] = color[:3]
+    lut[0] = background
+    return lut
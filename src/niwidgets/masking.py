@@ -0,0 +1,140 @@
+"""Masking of the background around the head in volume images."""
+import hashlib
+import os
+
+import numpy as np
+import scipy.ndimage
+
+from .cache import get_cache_dir
+from .slicing import get_dataobj
+from .stats import reduce_time
+
+# bump this when the masking method changes, to ignore old cached masks
+MASK_VERSION = 1
+
+
+def edge_labels(labels):
+    """Find the labels that touch any of the six faces of a 3D volume.
+
+    All faces are gathered into one array, so this is a single pass over
+    the faces no matter how many labels there are.
+
+    Args
+    ----
+        labels : np.ndarray
+                A 3D array of integer labels, with 0 as the unlabelled
+                value.
+    """
+    faces = np.concatenate(
+        [
+            labels[[0, -1], :, :].ravel(),
+            labels[:, [0, -1], :].ravel(),
+            labels[:, :, [0, -1]].ravel(),
+        ]
+    )
+    found = np.unique(faces)
+    return found[found != 0]
+
+
+def compute_background_mask(data_array):
+    """Find the background of an image.
+
+    The background is every cluster of voxels that round to zero (at every
+    time point, for 4D images) and that touches the edge of the image.
+
+    Args
+    ----
+        data_array : np.ndarray
+                A 3D or 4D array.
+
+    Returns
+    -------
+        mask : np.ndarray
+                A 3D boolean array that is True in the background.
+    """
+    if data_array.ndim == 3:
+        zero = np.round(data_array) == 0
+    else:
+        zero = np.round(data_array).max(axis=3) == 0
+    labels, n_labels = scipy.ndimage.label(zero)
+
+    # a lookup table from label to whether it touches the edge
+    is_background = np.zeros(n_labels + 1, dtype=bool)
+    is_background[edge_labels(labels)] = True
+    return is_background[labels]
+
+
+def _image_background_mask(image):
+    """Mask an image, streaming over time so 4D data is never all loaded."""
+    dataobj = get_dataobj(image)
+    if len(dataobj.shape) > 3:
+        peak = reduce_time(dataobj, ("max",), transform=np.round)["max"]
+        return compute_background_mask(peak)
+    return compute_background_mask(np.asanyarray(dataobj))
+
+
+def pack_mask(mask):
+    """Store a boolean mask as bits, one eighth of its size in memory."""
+    return np.packbits(mask, axis=None), mask.shape
+
+
+def unpack_mask(packed, shape):
+    """Restore a mask stored with :func:`pack_mask`."""
+    size = int(np.prod(shape))
+    return np.unpackbits(packed)[:size].reshape(shape).astype(bool)
+
+
+def file_key(filename):
+    """A key that changes whenever a file is replaced or modified.
+
+    This is the SHA1 hash of the file's absolute path, size and
+    modification time, so the file's content is never read.
+    """
+    status = os.stat(filename)
+    key = "{}:{}:{}".format(
+        os.path.abspath(filename), status.st_size, status.st_mtime_ns
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def get_background_mask(image, use_cache=True):
+    """Return the background mask of an image, using a cache on disk.
+
+    Masks of images that come from a file are saved, bit-packed, in the
+    niwidgets cache directory, keyed by the file's path, size and
+    modification time (see :func:`file_key`). The same file is only masked
+    once, even across sessions.
+
+    Args
+    ----
+        image : nibabel image
+                The image to mask.
+        use_cache : bool
+                Whether to read and write the disk cache.
+
+    Returns
+    -------
+        mask : np.ndarray
+                A 3D boolean array that is True in the background.
+    """
+    filename = image.get_filename() if hasattr(image, "get_filename") else None
+    if not use_cache or filename is None or not os.path.isfile(filename):
+        return _image_background_mask(image)
+
+    path = os.path.join(
+        get_cache_dir(),
+        "masks",
+        "{}-v{}.npz".format(file_key(filename), MASK_VERSION),
+    )
+    if os.path.isfile(path):
+        with np.load(path) as cached:
+            return unpack_mask(cached["packed"], tuple(cached["shape"]))
+
+    mask = _image_background_mask(image)
+    packed, shape = pack_mask(mask)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write to a temporary file first, so a partial write is never read
+    with open(path + ".partial", "wb") as f:
+        np.savez(f, packed=packed, shape=shape)
+    os.replace(path + ".partial", path)
+    return mask
@@ -2,17 +2,21 @@
 from __future__ import print_function
 
 import os
+import time
 from collections import defaultdict
 from xml.parsers.expat import ExpatError
 
 import ipyvolume.pylab as p3
-import matplotlib.pyplot as plt
 import nibabel as nb
 import numpy as np
 from IPython.display import display
 from ipywidgets import Dropdown, fixed, interact
 
 from .colormaps import get_cmap_dropdown
+from .controls import weak_callback
+from .instrumentation import FRAME, PipelineStats
+from .lut import get_lut, quantise
+from .scheduler import RenderScheduler
 
 
 def _check_file(file):
@@ -43,7 +47,7 @@ def _get_name(file):
 class SurfaceWidget:
     """Interact with brain surfaces right in the notebook."""
 
-    def __init__(self, meshfile, overlayfiles=()):
+    def __init__(self, meshfile, overlayfiles=(), stats_callback=None):
         """Create a surface widget.
 
         This widget takes in surface data, in the form of gifti files or
@@ -61,7 +65,19 @@ class SurfaceWidget:
             GiftiImage. Possible file formats: .annot, .thickness, .curv, .sulc
             or .gii.
 
+        stats_callback : callable
+            Called as ``stats_callback(stage, seconds, nbytes)`` after each
+            timed stage of drawing, e.g. to log them. The "frame" stage
+            marks the end of a frame.
+
         """
+        # overlays are coloured in the background, so that the kernel
+        # stays responsive while they are. Each request is published as
+        # one (overlays, frame, colormap, lut_indices) tuple, so the
+        # background thread never sees half of an update.
+        self._request = None
+        self._scheduler = RenderScheduler(self._refresh)
+
         # check meshfile is a valid argument
         self.meshfile = _check_file(meshfile)
 
@@ -78,6 +94,8 @@ class SurfaceWidget:
             }
 
         self.fig = None
+        # the time taken by each stage of plotting
+        self.stats = PipelineStats(callback=stats_callback)
 
     def _init_figure(self, x, y, z, triangles, figsize, figlims):
         """
@@ -132,23 +150,60 @@ class SurfaceWidget:
         overlays: V x F numpy array, where each column corresponds to a
                   different overlay. F=#frames or #timepoints.
 
+        The overlay is coloured in the background, see :meth:`wait`.
         """
         if self.fig is None:
             self._init_figure(x, y, z, triangles, figsize, figlims)
+        request = self._request
+        if request is not None and request[0] is overlays:
+            lut_indices = request[3]
+        else:
+            # the quantised overlays, filled in by the background thread
+            lut_indices = {}
+        self._request = (overlays, frame, colormap, lut_indices)
+        self._scheduler.request()
+
+    def _refresh(self):
+        """Colour the mesh with the current overlay.
+
+        This runs on the scheduler's thread, and only reads the latest
+        request.
+        """
+        if self._request is None:
+            return
+        overlays, frame, colormap, lut_indices = self._request
         # overlays is a 2D matrix
         # with 2nd dimension corresponding to (time) frame
-        my_color = plt.cm.get_cmap(colormap)
-        if overlays[frame] is not None:
-            # activation = overlays[:, frame]
-            activation = overlays[frame]
-            if max(activation) - min(activation) > 0:
-                colors = my_color(
-                    (activation - min(activation))
-                    / (max(activation) - min(activation))
-                )
-            else:
-                colors = my_color((activation - min(activation)))
-            self.fig.meshes[0].color = colors[:, :3]
+        if overlays is None or overlays.get(frame) is None:
+            return
+        with self.stats.stage(FRAME):
+            # quantising is done once per overlay, so changing the colormap
+            # or the frame is a single table lookup
+            if frame not in lut_indices:
+                activation = overlays[frame]
+                with self.stats.stage("quantise"):
+                    lut_indices[frame] = quantise(
+                        activation, activation.min(), activation.max()
+                    )
+                self._scheduler.checkpoint()
+            with self.stats.stage("colormap"):
+                lut = get_lut(colormap)[:, :3] / 255
+                colors = lut[lut_indices[frame]]
+            self._scheduler.checkpoint()
+            with self.stats.stage("send", colors.nbytes):
+                self.fig.meshes[0].color = colors
+
+    def wait(self, timeout=None):
+        """Block until the surface shows the current overlay."""
+        return self._scheduler.flush(timeout)
+
+    def close(self):
+        """Stop the background thread of this widget."""
+        self._scheduler.shutdown()
+
+    def __del__(self):
+        """Method to tidy up afterwards."""
+        self.close()
 
     def zmask(surf, mask):
         """
@@ -216,6 +271,7 @@ class SurfaceWidget:
             Display vertices with intensity = 0, default True
 
         """
+        start = time.perf_counter()
         kwargs["colormap"] = get_cmap_dropdown(colormap)
         kwargs["figsize"] = fixed(figsize)
         kwargs["figlims"] = fixed(figlims)
@@ -280,6 +336,8 @@ class SurfaceWidget:
                     if not show_zeroes:
                         pass
 
+        self.stats.record("load", time.perf_counter() - start)
+
         kwargs["triangles"] = fixed(vertex_edges)
         kwargs["x"] = fixed(x)
         kwargs["y"] = fixed(y)
@@ -295,5 +353,7 @@ class SurfaceWidget:
                 description="Overlay:",
             )
 
-        interact(self._plot_surface, frame=frame, **kwargs)
+        # the controls only hold a weak reference, so that they don't keep
+        # the widget alive
+        interact(weak_callback(self._plot_surface), frame=frame, **kwargs)
         display(self.fig)
@@ -1,18 +1,45 @@
 """Widgets that visualise volume images in .nii files."""
+import base64
 import inspect
-import os.path
+import io
+import threading
+import time
+import weakref
 
 import ipywidgets as widgets
 import matplotlib.pyplot as plt
-import nibabel as nib
 import numpy as np
-import scipy.ndimage
 import traitlets
 from IPython import display
 from ipywidgets import IntSlider, fixed, interact
-
-from .colormaps import get_cmap_dropdown
-from .controls import PlaySlider
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .atlas import AtlasIndex
+from .cache import PlaneCache, Prefetcher
+from .colormaps import DEFAULT_COLORMAPS, get_cmap_dropdown
+from .controls import PlaySlider, weak_callback, weak_link
+from .instrumentation import FRAME, PipelineStats
+from .layers import Layer
+from .lut import precompute_luts
+from .masking import get_background_mask
+from .pyramid import Pyramid, build_pyramid
+from .raster import FrameEncoder, blend, colormap_plane, draw_guides
+from .reslice import Reslicer, level_affine
+from .scheduler import RenderCancelled, RenderScheduler
+from .slicing import extract_plane, get_dataobj, load_volume
+from .stats import get_statistics
+from .timecourse import TimeCourses, timecourse_svg
+
+VIEWS = ("Sagittal", "Coronal", "Axial")
+# the resolution used to convert figure sizes to pixels
+DPI = 100
+
+# the (left, right) labels of each view, keyed by radiological orientation
+ORIENTATION_LABELS = {
+    True: [("F", "P"), ("R", "L"), ("R", "L")],
+    False: [("P", "F"), ("L", "R"), ("L", "R")],
+}
 
 
 class NiftiWidget:
@@ -23,9 +50,13 @@ class NiftiWidget:
         filename : str
                 The path to your ``.nii`` file. Can be a string, or a
                 ``PosixPath`` from python3's pathlib.
+        stats_callback : callable
+                Called as ``stats_callback(stage, seconds, nbytes)`` after
+                each timed stage of drawing, e.g. to log them. The "frame"
+                stage marks the end of a frame.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, stats_callback=None):
         """
         Turn .nii files into interactive plots using ipywidgets.
 
@@ -34,24 +65,33 @@ class NiftiWidget:
             filename : str
                     The path to your ``.nii`` file. Can be a string, or a
                     ``PosixPath`` from python3's pathlib.
+            stats_callback : callable
+                    Called as ``stats_callback(stage, seconds, nbytes)`` after
+                    each timed stage of drawing, e.g. to log them. The "frame"
+                    stage marks the end of a frame.
         """
-        if hasattr(filename, "get_data"):
-            self.data = filename
-        else:
-            filename = str(filename)
-            if not os.path.isfile(filename):
-                raise OSError("File " + filename + " not found.")
+        # the time taken by each stage of plotting
+        self.stats = PipelineStats(callback=stats_callback)
 
-            # load data in advance
-            # this ensures once the widget is created that the file is of a
-            # format readable by nibabel
-            self.data = nib.load(str(filename))
+        # this ensures once the widget is created that the file is of a
+        # format readable by nibabel
+        with self.stats.stage("load"):
+            self.data = load_volume(filename)
 
         # initialise where the image handles will go
         self.image_handles = None
+        # custom plots are drawn one at a time, maybe in the background
+        self._render_lock = threading.Lock()
+        self._prerenderer = None
 
     def nifti_plotter(
-        self, plotting_func=None, colormap=None, figsize=(15, 5), **kwargs
+        self,
+        plotting_func=None,
+        colormap=None,
+        figsize=(15, 5),
+        render_cache=64 * 1024 ** 2,
+        prerender=False,
+        **kwargs
     ):
         """
         Plot volumetric data.
@@ -67,6 +107,11 @@ class NiftiWidget:
                     of values that round to zero and somewhere touch the edges
                     of the image. These are set to NA. If you think you are
                     missing data in your image, set this False.
+            reslice : bool
+                    Whether to use the image's affine to show it in world
+                    orientation, rather than in the order it is stored.
+                    This parameter only works with the default plotting
+                    function. Only the displayed planes are resampled.
             colormap : str | list
                     The matplotlib colormap that should be applied to the data.
                     By default, the widget will allow you to pick from all that
@@ -75,6 +120,14 @@ class NiftiWidget:
                     options.
             figsize : tup
                     The figure height and width for matplotlib, in inches.
+            render_cache : int
+                    With a custom plot function, the memory, in bytes, used
+                    to keep rendered plots. Going back to settings that
+                    were shown before is then instant.
+            prerender : bool
+                    With a custom plot function, whether to render the
+                    plots one slider step either side of the current one in
+                    the background.
 
             If you are providing a custom plot function, any kwargs you provide
             to nifti_plotter will be passed to that function.
@@ -86,9 +139,14 @@ class NiftiWidget:
         if plotting_func is None:
             self._default_plotter(**kwargs)
         else:
-            self._custom_plotter(plotting_func, **kwargs)
+            self._custom_plotter(
+                plotting_func,
+                render_cache=render_cache,
+                prerender=prerender,
+                **kwargs
+            )
 
-    def _default_plotter(self, mask_background=False, **kwargs):
+    def _default_plotter(self, mask_background=False, reslice=False, **kwargs):
         """Plot three orthogonal views.
 
         This is called by nifti_plotter, you shouldn't call it directly.
@@ -96,46 +154,23 @@ class NiftiWidget:
         plt.gcf().clear()
         plt.ioff()  # disable interactive mode
 
-        data_array = self.data.get_data()
+        # planes are read from this as they are shown
+        data_array = get_dataobj(self.data)
 
-        if not ((data_array.ndim == 3) or (data_array.ndim == 4)):
+        if len(data_array.shape) not in (3, 4):
             raise ValueError("Input image should be 3D or 4D")
 
-        # mask the background
+        # the background mask is applied to each plane as it is shown, so
+        # no full size masked copy of the data is made
+        mask = None
         if mask_background:
             # TODO: add the ability to pass 'mne' to use a default brain mask
-            # TODO: split this out into a different function
-            if data_array.ndim == 3:
-                labels, n_labels = scipy.ndimage.measurements.label(
-                    (np.round(data_array) == 0)
-                )
-            else:  # 4D
-                labels, n_labels = scipy.ndimage.measurements.label(
-                    (np.round(data_array).max(axis=3) == 0)
-                )
+            mask = get_background_mask(self.data)
 
-            mask_labels = [
-                lab
-                for lab in range(1, n_labels + 1)
-                if (
-                    np.any(labels[[0, -1], :, :] == lab)
-                    | np.any(labels[:, [0, -1], :] == lab)
-                    | np.any(labels[:, :, [0, -1]] == lab)
-                )
-            ]
-
-            if data_array.ndim == 3:
-                data_array = np.ma.masked_where(
-                    np.isin(labels, mask_labels), data_array
-                )
-            else:
-                data_array = np.ma.masked_where(
-                    np.broadcast_to(
-                        np.isin(labels, mask_labels)[:, :, :, np.newaxis],
-                        data_array.shape,
-                    ),
-                    data_array,
-                )
+        if reslice:
+            data_array = Reslicer(data_array, self.data.affine)
+            if mask is not None:
+                mask = Reslicer(mask, self.data.affine, order=0)
 
         # init sliders for the various dimensions
         for dim, label in enumerate(["x", "y", "z"]):
@@ -147,7 +182,7 @@ class NiftiWidget:
                     continuous_update=False,
                 )
 
-        if (data_array.ndim == 3) or (data_array.shape[3] == 1):
+        if (len(data_array.shape) == 3) or (data_array.shape[3] == 1):
             kwargs["t"] = fixed(None)  # time is fixed
         else:
             kwargs["t"] = IntSlider(
@@ -157,19 +192,33 @@ class NiftiWidget:
                 continuous_update=False,
             )
 
-        widgets.interact(self._plot_slices, data=fixed(data_array), **kwargs)
+        widgets.interact(
+            self._plot_slices,
+            data=fixed(data_array),
+            mask=fixed(mask),
+            **kwargs
+        )
 
         plt.close()  # clear plot
         plt.ion()  # return to interactive state
 
     def _plot_slices(
-        self, data, x, y, z, t, colormap="viridis", figsize=(15, 5)
+        self,
+        data,
+        x,
+        y,
+        z,
+        t,
+        colormap="viridis",
+        figsize=(15, 5),
+        mask=None,
     ):
         """
         Plot x,y,z slices.
 
         This function is called by _default_plotter
         """
+        start = time.perf_counter()
         fresh = self.image_handles is None
         if fresh:
             self._init_figure(data, colormap, figsize)
@@ -183,20 +232,18 @@ class NiftiWidget:
 
         for ii, imh in enumerate(self.image_handles):
 
-            slice_obj = 3 * [slice(None)]
-
-            if data.ndim == 4:
-                slice_obj.append(t)
-
-            slice_obj[ii] = coords[ii]
+            with self.stats.stage("read"):
+                plane = _extract(data, ii, coords[ii], t)
+                if mask is not None:
+                    plane = np.ma.masked_where(
+                        _extract(mask, ii, coords[ii]).astype(bool), plane
+                    )
 
             # update the image
             imh.set_data(
-                np.flipud(np.rot90(data[tuple(slice_obj)], k=1))
+                np.flipud(np.rot90(plane, k=1))
                 if views[ii] != "Sagittal"
-                else np.fliplr(
-                    np.flipud(np.rot90(data[tuple(slice_obj)], k=1))
-                )
+                else np.fliplr(np.flipud(np.rot90(plane, k=1)))
             )
 
             # draw guides to show selected coordinates
@@ -208,6 +255,7 @@ class NiftiWidget:
 
             imh.set_cmap(colormap)
 
+        self.stats.record(FRAME, time.perf_counter() - start)
         if not fresh:
             return self.fig
 
@@ -239,10 +287,9 @@ class NiftiWidget:
             ax.set_ylim(0, axis_limits[1])
 
             img = np.zeros(axis_limits[::-1])
-            # img[1] = data_max
-            im = ax.imshow(
-                img, cmap=colormap, vmin=data.min(), vmax=data.max()
-            )
+            # the intensity range is computed once per image and cached
+            vmin, vmax = get_statistics(self.data).window()
+            im = ax.imshow(img, cmap=colormap, vmin=vmin, vmax=vmax)
             # add "cross hair"
             ax.axvline(x=0, color="gray", alpha=0.8)
             ax.axhline(y=0, color="gray", alpha=0.8)
@@ -250,15 +297,29 @@ class NiftiWidget:
             self.image_handles.append(im)
         # plt.show()
 
-    def _custom_plotter(self, plotting_func, **kwargs):
+    def _custom_plotter(
+        self,
+        plotting_func,
+        render_cache=64 * 1024 ** 2,
+        prerender=False,
+        **kwargs
+    ):
         """Collect data and start interactive widget for custom plot."""
         self.plotting_func = plotting_func
+        self._plot_args = _arg_names(plotting_func)
         plt.gcf().clear()
         plt.ioff()
 
+        # stop pre-rendering any earlier plot
+        self.close()
+        # rendered plots, as PNG bytes, keyed by the arguments they used
+        self._render_cache = PlaneCache(max_bytes=render_cache)
+        if prerender:
+            self._prerenderer = Prefetcher(self._render_cache, self._render)
+
         # XYZ Sliders if plot supports it and user didn't provide any:
         if (
-            "cut_coords" in inspect.getargspec(self.plotting_func)[0]
+            "cut_coords" in self._plot_args
             and "cut_coords" not in kwargs.keys()
         ):
             for label in ["x", "y", "z"]:
@@ -267,30 +328,59 @@ class NiftiWidget:
                     kwargs[label] = IntSlider(
                         value=0, min=-90, max=90, continuous_update=False
                     )
+        # the sliders whose neighbouring values can be rendered ahead
+        self._sliders = {
+            name: value
+            for name, value in kwargs.items()
+            if isinstance(value, (widgets.IntSlider, widgets.FloatSlider))
+        }
 
         # Create the widget:
         interact(self._custom_plot_wrapper, data=fixed(self.data), **kwargs)
         plt.ion()
 
     def _custom_plot_wrapper(self, data, **kwargs):
-        """Wrap a custom function."""
-        # start the figure
-        fig = plt.figure(figsize=kwargs.pop("figsize", None))
+        """Wrap a custom function, showing a cached render if there is one."""
+        key = self._render_key(kwargs)
+        with self.stats.stage(FRAME):
+            if _hashable(key):
+                png = self._render_cache.get_or_compute(key, self._render)
+            else:
+                png = self._render(*key)
+        display.display(display.Image(data=png.tobytes(), format="png"))
+
+        if self._prerenderer is not None:
+            keys = [
+                self._render_key(other) for other in self._neighbours(kwargs)
+            ]
+            # plots whose colormap is set through matplotlib's defaults are
+            # only drawn here, since the defaults are shared by all threads
+            self._prerenderer.prefetch(
+                [key for key in keys if _hashable(key) and key[2] is None]
+            )
+
+    def _render_key(self, kwargs):
+        """Resolve a plot's arguments into a key for the render cache.
+
+        The key holds the plotting function, the figure size, a colormap to
+        make the default (if the function has no ``cmap`` argument), and the
+        arguments the function is called with, as sorted pairs.
+        """
+        kwargs = dict(kwargs)
+        figsize = _freeze(kwargs.pop("figsize", None))
+        default_cmap = None
 
         # The following should provide a colormap option to most plots:
         if "colormap" in kwargs.keys():
-            if "cmap" in inspect.getargspec(self.plotting_func)[0]:
+            if "cmap" in self._plot_args:
                 # if cmap is valid argument to plot func, rename colormap
                 kwargs["cmap"] = kwargs.pop("colormap")
             else:
                 # if cmap is not valid for plot func, try and coerce it
-                plt.set_cmap(kwargs.pop("colormap"))
+                default_cmap = kwargs.pop("colormap")
 
         # reconstruct manually added x-y-z-sliders:
-        if (
-            "cut_coords" in inspect.getargspec(self.plotting_func)[0]
-            and "x" in kwargs.keys()
-        ):
+        if "cut_coords" in self._plot_args and "x" in kwargs.keys():
 
             # add the x-y-z as cut_coords
             if "display_mode" not in kwargs.keys() or not any(
@@ -309,9 +399,50 @@ class NiftiWidget:
             # remove x-y-z from kwargs
             [kwargs.pop(label, None) for label in ["x", "y", "z"]]
 
-        # Actually plot the image
-        self.plotting_func(data, figure=fig, **kwargs)
-        plt.show()
+        return (
+            self.plotting_func,
+            figsize,
+            default_cmap,
+            tuple(
+                sorted(
+                    (name, _freeze(value)) for name, value in kwargs.items()
+                )
+            ),
+        )
+
+    def _render(self, plotting_func, figsize, default_cmap, kwargs):
+        """Draw a custom plot, and return the PNG bytes as a uint8 array.
+
+        The figure isn't managed by pyplot, so that plots can be drawn in
+        the background. matplotlib's global state isn't thread-safe though,
+        so only one plot is drawn at a time, and a ``default_cmap`` (for
+        functions without a ``cmap`` argument) is only set on the main
+        thread.
+        """
+        figure = Figure(figsize=figsize)
+        FigureCanvasAgg(figure)
+        buffer = io.BytesIO()
+        # if cmap is not valid for plot func, try and coerce it
+        style = {} if default_cmap is None else {"image.cmap": default_cmap}
+        with self._render_lock, plt.rc_context(style):
+            # Actually plot the image
+            plotting_func(self.data, figure=figure, **dict(kwargs))
+            figure.savefig(buffer, format="png")
+        return np.frombuffer(buffer.getvalue(), dtype=np.uint8)
+
+    def _neighbours(self, kwargs):
+        """The arguments one slider step away, in either direction."""
+        for name, slider in self._sliders.items():
+            for step in (slider.step, -slider.step):
+                value = kwargs[name] + step
+                if slider.min <= value <= slider.max:
+                    yield dict(kwargs, **{name: value})
+
+    def close(self):
+        """Stop rendering plots in the background."""
+        if self._prerenderer is not None:
+            self._prerenderer.shutdown()
+            self._prerenderer = None
 
 
 class VolumeWidget(traitlets.HasTraits):
@@ -343,6 +474,19 @@ class VolumeWidget(traitlets.HasTraits):
         orient_radiology=None,
         guidelines=None,
         animation_speed=300,
+        cache_size=256 * 1024 ** 2,
+        prefetch=8,
+        renderer="matplotlib",
+        pyramid=False,
+        settle_time=0.3,
+        reslice=False,
+        layers=(),
+        show_frame_time=False,
+        timecourse=False,
+        time_major=False,
+        atlas=False,
+        encoding="png",
+        stats_callback=None,
     ):
         """
         Turn .nii files into interactive plots using ipywidgets.
@@ -351,7 +495,8 @@ class VolumeWidget(traitlets.HasTraits):
         ----
             filename : str
                     The path to your ``.nii`` file. Can be a string, or a
-                    ``PosixPath`` from python3's pathlib.
+                    ``PosixPath`` from python3's pathlib. Chunked volumes
+                    (``.zarr``, ``.h5``) or a ``VolumeSource`` work too.
             figsize : tuple
                     The figure size for each individual view.
             colormaps : tuple, list
@@ -368,28 +513,204 @@ class VolumeWidget(traitlets.HasTraits):
             animation_speed : int
                     The speed used for the animation, in milliseconds between
                     frames (the lower, the faster, up to a limit).
+            cache_size : int
+                    The memory, in bytes, used to keep recently shown planes
+                    so they don't need to be read again. The raster
+                    renderer keeps them colour-mapped, so they don't need
+                    to be colour-mapped again either.
+            prefetch : int
+                    How many planes to read (and, with the raster
+                    renderer, colour-map) ahead in the background, in the
+                    direction a slider is moving. Set to 0 to disable.
+            renderer : str
+                    How to draw the views. "matplotlib" draws a matplotlib
+                    figure per view. "raster" colour-maps each plane
+                    directly into an image, which is much faster to update.
+            pyramid : bool
+                    Whether to build (or load) downsampled copies of the
+                    image, saved beside the file. Views then show a level
+                    that matches the figure size, and a coarser one while a
+                    slider is moving.
+            settle_time : float
+                    With a pyramid, how many seconds after the last slider
+                    change the views are refined to the full display level.
+            reslice : bool
+                    Whether to use the image's affine to show it in world
+                    (RAS+) orientation. Only the displayed planes are
+                    resampled: images that are just flipped or transposed
+                    cost nothing extra, and oblique images are interpolated
+                    from the slab of voxels each plane passes through.
+            layers : list
+                    Images to show on top of this one, as :class:`Layer`
+                    objects or filenames. See :meth:`add_layer`.
+            show_frame_time : bool
+                    Whether to show how long the latest frame took to draw.
+                    The time taken by each stage of drawing is recorded in
+                    ``stats`` either way.
+            timecourse : bool
+                    Whether to plot the time series of the voxel under the
+                    cursor, for 4D images. Only that voxel's values are
+                    read from the file.
+            time_major : bool
+                    Whether to keep a copy of the image with each voxel's
+                    time series stored contiguously, for fast time series
+                    reads. It is built once, beside the file.
+            atlas : bool, dict, str
+                    Whether the image is a label atlas. Regions are then
+                    shown in distinct colours, the region under the cursor
+                    is named, and the cursor can jump to a region. Pass
+                    the names of the labels as a dict, or a label table
+                    file (see :func:`niwidgets.atlas.read_label_table`).
+            encoding : str, FrameEncoder
+                    The format views are sent to the browser in: "raw",
+                    "png", "jpeg" or "webp" (see
+                    :func:`niwidgets.raster.encode_frame`). Pass a
+                    :class:`niwidgets.raster.FrameEncoder` to set the
+                    quality, or to send lossy frames only while a slider
+                    is dragged. The bytes sent per frame are recorded in
+                    ``stats``.
+            stats_callback : callable
+                    Called as ``stats_callback(stage, seconds, nbytes)`` after
+                    each timed stage of drawing, e.g. to log them. The "frame"
+                    stage marks the end of a frame.
         """
-
-        if hasattr(filename, "get_data"):
-            self.data = filename
+        if renderer not in ("matplotlib", "raster"):
+            raise ValueError(
+                "The renderer must be either 'matplotlib' or 'raster'."
+            )
+        self.renderer = renderer
+        if isinstance(encoding, FrameEncoder):
+            self.encoder = encoding
+        else:
+            self.encoder = FrameEncoder(encoding)
+        if renderer == "matplotlib" and "webp" in (
+            self.encoder.format,
+            self.encoder.drag_format,
+        ):
+            raise ValueError(
+                "Notebooks can't show WebP outputs, so the matplotlib "
+                "renderer can't send WebP frames."
+            )
+        self.stats = PipelineStats(callback=stats_callback)
+        self.show_frame_time = show_frame_time
+
+        # only the header is read here; planes are read when displayed
+        with self.stats.stage("load"):
+            self.data = load_volume(filename)
+            self._dataobj = get_dataobj(self.data)
+
+        if atlas is not False and atlas is not None:
+            if pyramid:
+                raise ValueError(
+                    "Label atlases can't be shown with a pyramid, since "
+                    "downsampling would mix the labels."
+                )
+            with self.stats.stage("index"):
+                self.atlas = AtlasIndex(
+                    self.data, names=None if atlas is True else atlas
+                )
         else:
-            filename = str(filename)
-            if not os.path.isfile(filename):
-                raise OSError("File " + filename + " not found.")
-            # load data to ensures that the file readable by nibabel
-            self.data = nib.load(str(filename))
+            self.atlas = None
+
+        if self.atlas is not None:
+            self.region_label = widgets.Label()
+            self.region_picker = widgets.Dropdown(
+                options=[("", 0)]
+                + [
+                    (self.atlas.name(label), int(label))
+                    for label in self.atlas.labels
+                ],
+                description="Region:",
+            )
+            self.region_picker.observe(
+                weak_callback(self._pick_region), names="value"
+            )
 
-        self.displays = [widgets.Output() for _ in range(3)]
-        self._generate_axes(figsize=figsize)
+        if pyramid:
+            self._pyramid = build_pyramid(self.data)
+        else:
+            self._pyramid = Pyramid([self._dataobj])
+        if reslice:
+            self._reslicers = [
+                Reslicer(
+                    level,
+                    level_affine(self.data.affine, i),
+                    # labels can't be interpolated
+                    order=1 if self.atlas is None else 0,
+                )
+                for i, level in enumerate(self._pyramid.levels)
+            ]
+            self.shape = self._reslicers[0].shape
+            # where each level's displayed voxels are, for overlays
+            self._grid_affines = [r.grid_affine for r in self._reslicers]
+            self._grid_shapes = [r.shape[:3] for r in self._reslicers]
+        else:
+            self._reslicers = None
+            self.shape = tuple(self.data.shape)
+            self._grid_affines = [
+                level_affine(self.data.affine, i)
+                for i in range(self._pyramid.n_levels)
+            ]
+            self._grid_shapes = [
+                level.shape[:3] for level in self._pyramid.levels
+            ]
+        self.layers = []
+        # the level that fills each view, and a coarser one for dragging
+        self._fine_level = min(
+            self._pyramid.level_for_size(
+                self._plane_shape(axis), figsize[0] * DPI
+            )
+            for axis in range(3)
+        )
+        self._coarse_level = min(
+            self._fine_level + 1, self._pyramid.n_levels - 1
+        )
+        self._level = self._fine_level
+        self._view_levels = [None] * 3
+        self.settle_time = settle_time
+        self._last_change = 0
+        self._dragging = False
+        # which views were last sent in the lossy format for dragging
+        self._view_lossy = [False] * 3
+        self._refine_timer = None
+
+        self._cache = PlaneCache(max_bytes=cache_size)
+        # raster views are cached colour-mapped, so that playing through
+        # cached planes only costs encoding them
+        self._prefetcher = Prefetcher(
+            self._cache,
+            self._render_view if renderer == "raster" else self._read_plane,
+        )
+        self.n_prefetch = prefetch
+
+        # views whose image, or whose guide lines, need to be redrawn
+        self._dirty_content = set(range(3))
+        self._dirty_overlay = set(range(3))
+        self._dirty_cursor = True
+        self._dirty_lock = threading.Lock()
+        if timecourse and len(self.shape) > 3:
+            self.timecourses = TimeCourses(self.data, time_major=time_major)
+            self.timecourse_display = widgets.HTML()
+        else:
+            self.timecourses = None
+        # the voxel whose time series is plotted, and its values
+        self._timecourse = (None, None)
+        # views are drawn in the background, merging changes that arrive
+        # while a frame is being drawn
+        self._scheduler = RenderScheduler(self._refresh)
+        if self.renderer == "raster":
+            self._generate_raster_views(figsize=figsize)
+        else:
+            self._generate_axes(figsize=figsize)
 
         # set how many dimensions this file has
-        self.ndim = len(self.data.shape)
+        self.ndim = len(self.shape)
 
         # initialise the control components of this widget
         self.dims = ["x", "y", "z", "t"][: self.ndim]
         self.controls = {}
         for i, dim in enumerate(self.dims):
-            maxval = self.data.shape[i] - 1
+            maxval = self.shape[i] - 1
             self.controls[dim] = PlaySlider(
                 min=0,
                 max=maxval,
@@ -398,29 +719,29 @@ class VolumeWidget(traitlets.HasTraits):
                 label=dim.upper(),
                 continuous_update=False,
             )
-            widgets.link((self.controls[dim], "value"), (self, dim))
+            weak_link((self.controls[dim], "value"), (self, dim))
 
-        if not isinstance(colormap, str):
+        if self.atlas is None and not isinstance(colormap, str):
             self.color_picker = get_cmap_dropdown(colormap)
-            widgets.link((self.color_picker, "value"), (self, "colormap"))
+            weak_link((self.color_picker, "value"), (self, "colormap"))
             self.color_reverser = widgets.Checkbox(
                 description="Reverse colormap", indent=True
             )
-            widgets.link(
-                (self.color_reverser, "value"), (self, "reverse_colors")
-            )
+            weak_link((self.color_reverser, "value"), (self, "reverse_colors"))
+            if self.renderer == "raster":
+                # so that switching colormaps is just a table lookup
+                precompute_luts(self.color_picker.options)
         else:
             self.color_picker = widgets.HBox([])
             self.color_reverser = widgets.HBox([])
-            self.colormap = colormap
+            if isinstance(colormap, str):
+                self.colormap = colormap
 
         if guidelines is None:
             self.guideline_picker = widgets.Checkbox(
                 value=True, description="Show guides", indent=False
             )
-            widgets.link(
-                (self.guideline_picker, "value"), (self, "guidelines")
-            )
+            weak_link((self.guideline_picker, "value"), (self, "guidelines"))
         else:
             self.guideline_picker = widgets.Box([])
             self.guidelines = guidelines
@@ -431,7 +752,7 @@ class VolumeWidget(traitlets.HasTraits):
                 indent=False,
                 description="Radiological Orientation",
             )
-            widgets.link(
+            weak_link(
                 (self.orientation_switcher, "value"),
                 (self, "orient_radiology"),
             )
@@ -441,165 +762,555 @@ class VolumeWidget(traitlets.HasTraits):
 
         self._update_orientation(True)
 
+        for layer in layers:
+            self.add_layer(layer)
+
+    def add_layer(self, image, **kwargs):
+        """Show another image on top of this one.
+
+        The layer is resampled onto this image's grid using the affines of
+        both images. The mapping is computed once, and only the displayed
+        planes are resampled, so each layer costs about as much as the
+        base image.
+
+        Args
+        ----
+            image : str, pathlib.Path, nibabel image, Layer
+                    The image to overlay.
+            kwargs :
+                    Passed on to :class:`Layer`, e.g. ``colormap``,
+                    ``threshold`` and ``opacity``.
+
+        Returns
+        -------
+            layer : Layer
+                    The layer. Changing its traits updates the views.
+        """
+        layer = image if isinstance(image, Layer) else Layer(image, **kwargs)
+        layer.bind(self._grid_affines, self._grid_shapes)
+        layer.observe(
+            self._update_layers, names=["colormap", "threshold", "opacity"]
+        )
+        if self.renderer == "raster":
+            precompute_luts([layer.colormap])
+        self.layers.append(layer)
+        self._update_layers({"name": "layers"})
+        return layer
+
+    def _update_layers(self, change):
+        self._invalidate("layers")
+        self._scheduler.request()
+
     @property
     def indices(self):
         return [self.x, self.y, self.z, self.t][: self.ndim]
 
+    def _plane_shape(self, axis):
+        """The full resolution (rows, columns) of a view."""
+        columns, rows = (n for i, n in enumerate(self.shape[:3]) if i != axis)
+        return rows, columns
+
+    def _read_plane(self, axis, index, t, level=0, layer=None):
+        """Read a plane of the image, or of a layer, rotated for display."""
+        with self.stats.stage("read"):
+            return self._read_rotated(axis, index, t, level, layer)
+
+    def _read_rotated(self, axis, index, t, level, layer):
+        if layer is not None:
+            return np.rot90(
+                self.layers[layer].plane(axis, index // 2 ** level, t, level)
+            )
+        if self._reslicers is not None:
+            return np.rot90(
+                self._reslicers[level].plane(axis, index // 2 ** level, t)
+            )
+        return np.rot90(self._pyramid.plane(level, axis, index, t))
+
+    def _get_plane(self, axis, index, t, level=0, layer=None):
+        return self._cache.get_or_compute(
+            (axis, index, t, level, layer), self._read_plane
+        )
+
+    def _view_style(self):
+        """What a colour-mapped view shows, besides the planes.
+
+        This is the base image's (colormap, vmin, vmax), or None for an
+        atlas, and the style of each layer.
+        """
+        if self.atlas is None:
+            base = (self._colormap_name,) + tuple(self._window)
+        else:
+            base = None
+        return base, tuple(layer.style for layer in self.layers)
+
+    def _render_view(self, axis, index, t, level, style):
+        """Read and colour-map a view, with its layers blended on top."""
+        base, layer_styles = style
+        plane = self._read_plane(axis, index, t, level)
+        layer_planes = [
+            self._read_plane(axis, index, t, level, i)
+            for i in range(len(layer_styles))
+        ]
+        with self.stats.stage("colormap"):
+            if base is None:
+                rgba = self.atlas.colorize(plane)
+            else:
+                colormap, vmin, vmax = base
+                rgba = colormap_plane(plane, colormap, vmin, vmax)
+            for layer, layer_style, layer_plane in zip(
+                self.layers, layer_styles, layer_planes
+            ):
+                rgba = blend(rgba, layer.colorize(layer_plane, layer_style))
+        return rgba
+
+    def _get_view(self, axis, index, t, level=0):
+        return self._cache.get_or_compute(
+            (axis, index, t, level, self._view_style()), self._render_view
+        )
+
+    def _prefetch(self, change):
+        """Read the next planes in the direction a slider is moving."""
+        if self.n_prefetch < 1 or change["name"] not in self.dims:
+            return
+        step = 1 if change["new"] >= change["old"] else -1
+        dim = self.dims.index(change["name"])
+        upcoming = [
+            change["new"] + step * i
+            for i in range(1, self.n_prefetch + 1)
+            if 0 <= change["new"] + step * i < self.shape[dim]
+        ]
+        if self.renderer == "raster":
+            # views are cached colour-mapped, layers and all
+            last = [self._view_style()]
+        else:
+            # the image and each layer are cached apart
+            last = [None] + list(range(len(self.layers)))
+        if dim == 3:
+            # a time step changes all three views
+            keys = [
+                (axis, self.indices[axis], t, self._level, key)
+                for t in upcoming
+                for axis in range(3)
+                for key in last
+            ]
+        else:
+            keys = [
+                (dim, index, self.t, self._level, key)
+                for index in upcoming
+                for key in last
+            ]
+        self._prefetcher.prefetch(keys)
+
+    def _invalidate(self, name):
+        """Mark which views need new content, and which new guides."""
+        views = set(range(3))
+        with self._dirty_lock:
+            if name in ("x", "y", "z"):
+                # only the view perpendicular to this axis changes its
+                # image, the other two only move a guide line
+                axis = "xyz".index(name)
+                self._dirty_content.add(axis)
+                self._dirty_overlay.update(views - {axis})
+            elif name in ("t", "colormap", "reverse_colors", "layers"):
+                self._dirty_content.update(views)
+            elif name in ("guidelines", "orient_radiology"):
+                # flipping a view is done with the overlays
+                self._dirty_overlay.update(views)
+            if name in ("x", "y", "z", "t"):
+                self._dirty_cursor = True
+
+    def _refresh(self):
+        """Re-draw the views that have been invalidated.
+
+        This runs on the scheduler's thread.
+        """
+        with self._dirty_lock:
+            content, overlay = self._dirty_content, self._dirty_overlay
+            self._dirty_content, self._dirty_overlay = set(), set()
+            cursor, self._dirty_cursor = self._dirty_cursor, False
+        if cursor:
+            self._update_timecourse()
+            self._update_region()
+        if not content | overlay:
+            return
+        try:
+            self._draw(content, overlay)
+        except RenderCancelled:
+            # the next render draws these views, in their newest state
+            with self._dirty_lock:
+                self._dirty_content.update(content)
+                self._dirty_overlay.update(overlay)
+            raise
+
+    def _draw(self, content, overlay):
+        """Draw and encode the views that changed, then send them together.
+
+        The render is cancelled between views if the state changes again,
+        so only complete frames of the latest state are sent.
+        """
+        with self.stats.stage(FRAME):
+            frames = []
+            for iimage in sorted(content | overlay):
+                self._scheduler.checkpoint()
+                if self.renderer == "raster":
+                    frames.append(
+                        self._render_raster(iimage, iimage in content)
+                    )
+                else:
+                    if iimage in content:
+                        self._update_image(iimage)
+                    self._update_guides(iimage)
+                    self._orient_figure(iimage)
+                    frames.append(self._encode_figure(iimage))
+            self._scheduler.checkpoint()
+            nbytes = sum(len(data) for _, data, _ in frames)
+            with self.stats.stage("send", nbytes):
+                for iimage, data, image_format in frames:
+                    self._publish(iimage, data, image_format)
+
+    def _cursor_voxel(self):
+        """The voxel of the image under the cursor."""
+        to_voxel = np.linalg.inv(self.data.affine).dot(self._grid_affines[0])
+        cursor = to_voxel.dot([self.x, self.y, self.z, 1])[:3]
+        return tuple(int(i) for i in np.round(cursor))
+
+    def _update_timecourse(self):
+        """Plot the time series at the cursor, reading it if it moved."""
+        if self.timecourses is None:
+            return
+        with self.stats.stage("timecourse"):
+            voxel = self._cursor_voxel()
+            if self._timecourse[0] != voxel:
+                self._timecourse = (voxel, self.timecourses(*voxel))
+            self.timecourse_display.value = timecourse_svg(
+                self._timecourse[1], self.t
+            )
+
+    def _update_region(self):
+        """Name the atlas region under the cursor."""
+        if self.atlas is None:
+            return
+        label = self.atlas.label_at(*self._cursor_voxel())
+        self.region_label.value = (
+            "Region under cursor: {} ({})".format(
+                self.atlas.name(label), label
+            )
+            if label
+            else "Region under cursor: none"
+        )
+
+    def jump_to_region(self, region):
+        """Move the cursor to the centre of a region of the atlas.
+
+        The region's centroid comes from the atlas index, so the volume
+        isn't read. Regions that aren't convex may not contain their
+        centroid.
+
+        Args
+        ----
+            region : int, str
+                    The region's label, or its name.
+        """
+        if self.atlas is None:
+            raise ValueError("Only atlases have regions to jump to.")
+        label = self.atlas.find(region) if isinstance(region, str) else region
+        centroid = self.atlas.region(label)["centroid"]
+        to_grid = np.linalg.inv(self._grid_affines[0]).dot(self.data.affine)
+        position = np.round(to_grid.dot(list(centroid) + [1])[:3])
+        with self.hold_trait_notifications():
+            for dim, index, size in zip("xyz", position, self.shape):
+                setattr(self, dim, int(min(max(index, 0), size - 1)))
+
+    def _pick_region(self, change):
+        if change["new"]:
+            self.jump_to_region(change["new"])
+
     @traitlets.observe("x", "y", "z", "t", "guidelines", "orient_radiology")
     def _update_slices(self, change):
-        array = self.data.get_data()
+        if change["name"] in self.dims:
+            self._choose_level()
+        self._invalidate(change["name"])
+        self._scheduler.request()
+        self._prefetch(change)
 
-        if self.ndim == 3:
-            array = array[:, :, :, np.newaxis]
+    def wait(self, timeout=None):
+        """Block until the views show the current state."""
+        return self._scheduler.flush(timeout)
 
-        for iimage, (disp, fig, ax, image) in enumerate(
-            zip(self.displays, self.figures, self.axes, self.images)
+    @property
+    def frame_rates(self):
+        """The frame rates requested by the controls, and achieved."""
+        return self._scheduler.stats()
+
+    def _choose_level(self):
+        """Use the coarse level and lossy frames while sliders move quickly."""
+        if (
+            self._coarse_level == self._fine_level
+            and not self.encoder.lossy_drag
         ):
-            image_data = np.rot90(
-                array[
-                    tuple(
-                        slice(None) if iimage != idim else self.indices[idim]
-                        for idim in range(3)
-                    )
-                    + (self.t,)
-                ]
+            return
+        now = time.monotonic()
+        dragging = now - self._last_change < self.settle_time
+        self._last_change = now
+        self._dragging = dragging
+        self._level = self._coarse_level if dragging else self._fine_level
+
+        if self._refine_timer is not None:
+            self._refine_timer.cancel()
+        if dragging:
+            self._refine_timer = threading.Timer(
+                self.settle_time, self._refine
+            )
+            self._refine_timer.daemon = True
+            self._refine_timer.start()
+
+    def _refine(self):
+        """Re-draw coarse or lossy views at full quality once sliders settle."""
+        self._level = self._fine_level
+        self._dragging = False
+        with self._dirty_lock:
+            self._dirty_content.update(
+                i
+                for i, level in enumerate(self._view_levels)
+                if level != self._level
             )
-            if image is not None:
-                image.set_data(image_data)
+            # views that only need encoding again
+            self._dirty_overlay.update(
+                i for i, lossy in enumerate(self._view_lossy) if lossy
+            )
+        self._scheduler.request()
+
+    def _guide_positions(self, iimage, level=0):
+        """The (column, row) of the guide lines in a rotated plane."""
+        x_idx, y_idx = (i for i in range(3) if i != iimage)
+        factor = 2 ** level
+        # planes are rotated for display, so the second axis is flipped
+        return (
+            self.indices[x_idx] // factor,
+            self.shape[y_idx] // factor - 1 - self.indices[y_idx] // factor,
+        )
+
+    def _update_image(self, iimage):
+        image_data = self._get_plane(
+            iimage, self.indices[iimage], self.t, self._level
+        )
+        self._view_levels[iimage] = self._level
+        ax = self.axes[iimage]
+        rows, columns = self._plane_shape(iimage)
+        # keep full resolution coordinates for any pyramid level
+        extent = (-0.5, columns - 0.5, rows - 0.5, -0.5)
+        if self.images[iimage] is not None:
+            self.images[iimage].set_data(image_data)
+            if self.atlas is None:
+                self.images[iimage].set_cmap(self._colormap_name)
+        else:
+            if self.atlas is None:
+                vmin, vmax = self._window
+                style = {
+                    "cmap": self._colormap_name,
+                    "vmin": vmin,
+                    "vmax": vmax,
+                }
             else:
-                self.images[iimage] = ax.imshow(
-                    image_data,
-                    cmap=self.colormap,
-                    vmin=self.data.get_data().min(),
-                    vmax=self.data.get_data().max(),
-                )
+                # each label value gets its own colour
+                style = {
+                    "cmap": self.atlas.colormap(),
+                    "vmin": -0.5,
+                    "vmax": len(self.atlas.counts) - 0.5,
+                    "interpolation": "nearest",
+                }
+            self.images[iimage] = ax.imshow(image_data, extent=extent, **style)
+            # add "cross hair"
+            self.guides[iimage] = (
+                ax.axvline(x=0, color="gray"),
+                ax.axhline(y=0, color="gray"),
+            )
 
-            if self.guidelines:
-                # add "cross hair"
-                x_idx, y_idx = (i for i in range(3) if i != iimage)
-                x = self.indices[x_idx]
-                y = self.data.shape[y_idx] - self.indices[y_idx]
-                ax.lines = [
-                    ax.axvline(x=x, color="gray"),
-                    ax.axhline(y=y, color="gray"),
-                ]
+        # layers are colour-mapped here, and drawn over the image
+        layer_planes = self._layer_planes(iimage)
+        with self.stats.stage("colormap"):
+            layer_rgbas = [
+                layer.colorize(plane)
+                for layer, plane in zip(self.layers, layer_planes)
+            ]
+        for i, rgba in enumerate(layer_rgbas):
+            if i < len(self.layer_images[iimage]):
+                self.layer_images[iimage][i].set_data(rgba)
             else:
-                ax.lines = []
+                self.layer_images[iimage].append(
+                    ax.imshow(rgba, extent=extent, interpolation="nearest")
+                )
+
+    def _layer_planes(self, iimage):
+        """The planes of each layer in a view."""
+        return [
+            self._get_plane(
+                iimage, self.indices[iimage], self.t, self._level, i
+            )
+            for i in range(len(self.layers))
+        ]
+
+    def _update_guides(self, iimage):
+        column, row = self._guide_positions(iimage)
+        vertical, horizontal = self.guides[iimage]
+        vertical.set_xdata([column, column])
+        horizontal.set_ydata([row, row])
+        vertical.set_visible(self.guidelines)
+        horizontal.set_visible(self.guidelines)
+
+    def _render_raster(self, iimage, content=True):
+        """Colour-map and encode one view.
+
+        Colour-mapped planes come from the cache, where they are prefetched
+        ahead of a moving slider. The current one is also kept, so that if
+        only the guide lines or orientation changed (``content=False``) it
+        isn't looked up again.
+        """
+        if content or self._rgba[iimage] is None:
+            self._rgba[iimage] = self._get_view(
+                iimage, self.indices[iimage], self.t, self._level
+            )
+            self._view_levels[iimage] = self._level
 
-        self._redraw()
+        rgba = self._rgba[iimage]
+        if self.guidelines:
+            column, row = self._guide_positions(
+                iimage, self._view_levels[iimage]
+            )
+            rgba = draw_guides(rgba, column=column, row=row)
+        if self.orient_radiology:
+            rgba = rgba[:, ::-1]
+
+        with self.stats.stage("encode"):
+            data, image_format = self._encode(iimage, rgba)
+        return iimage, data, image_format
+
+    def _encode_figure(self, iimage):
+        """Draw and encode the matplotlib figure of one view."""
+        with self.stats.stage("encode"):
+            data, image_format = self._encode(
+                iimage, _figure_rgba(self.figures[iimage])
+            )
+        return iimage, data, image_format
+
+    def _publish(self, iimage, data, image_format):
+        """Send an encoded view to the browser."""
+        if self.renderer == "raster":
+            if self.images[iimage].format != image_format:
+                self.images[iimage].format = image_format
+            self.images[iimage].value = data
+        else:
+            # outputs are set directly, rather than by displaying inside
+            # the output widget, since that only works on the main thread
+            self.displays[iimage].outputs = (
+                _figure_output(self.figures[iimage], data, image_format),
+            )
+
+    def _encode(self, iimage, rgba):
+        """Encode a view, in the lossy format if a slider is dragged."""
+        dragging = self._dragging and self.encoder.lossy_drag
+        self._view_lossy[iimage] = dragging
+        return self.encoder.encode(rgba, dragging)
+
+    @property
+    def _window(self):
+        """The intensity range that the colormap spans."""
+        if self._pyramid.window is not None:
+            # recorded when the pyramid was built, so the full resolution
+            # data isn't read again
+            return self._pyramid.window
+        return get_statistics(self.data).window()
+
+    @property
+    def _colormap_name(self):
+        return self.colormap + ("_r" if self.reverse_colors else "")
 
     @traitlets.observe("orient_radiology")
     def _update_orientation(self, change):
-        for i, ax in enumerate(self.axes):
-            if change is not None:
-                ax.invert_xaxis()
-            ax.texts = []
-            if self.orient_radiology:
-                if i == 0:
-                    ax.text(
-                        -0.01,
-                        0.5,
-                        "F",
-                        transform=ax.transAxes,
-                        horizontalalignment="right",
-                        verticalalignment="center",
-                        fontsize=16,
-                    )
-                    ax.text(
-                        1.01,
-                        0.5,
-                        "P",
-                        transform=ax.transAxes,
-                        horizontalalignment="left",
-                        verticalalignment="center",
-                        fontsize=16,
-                    )
-                elif i == 1 or i == 2:
-                    ax.text(
-                        -0.01,
-                        0.5,
-                        "R",
-                        transform=ax.transAxes,
-                        horizontalalignment="right",
-                        verticalalignment="center",
-                        fontsize=16,
-                    )
-                    ax.text(
-                        1.01,
-                        0.5,
-                        "L",
-                        transform=ax.transAxes,
-                        horizontalalignment="left",
-                        verticalalignment="center",
-                        fontsize=16,
-                    )
-            else:
-                if i == 0:
-                    ax.text(
-                        -0.01,
-                        0.5,
-                        "P",
-                        transform=ax.transAxes,
-                        horizontalalignment="right",
-                        verticalalignment="center",
-                        fontsize=16,
-                    )
-                    ax.text(
-                        1.01,
-                        0.5,
-                        "F",
-                        transform=ax.transAxes,
-                        horizontalalignment="left",
-                        verticalalignment="center",
-                        fontsize=16,
-                    )
-                elif i == 1 or i == 2:
-                    ax.text(
-                        -0.01,
-                        0.5,
-                        "L",
-                        transform=ax.transAxes,
-                        horizontalalignment="right",
-                        verticalalignment="center",
-                        fontsize=16,
-                    )
-                    ax.text(
-                        1.01,
-                        0.5,
-                        "R",
-                        transform=ax.transAxes,
-                        horizontalalignment="left",
-                        verticalalignment="center",
-                        fontsize=16,
-                    )
-
-        self._redraw()
+        if self.renderer == "raster":
+            labels = ORIENTATION_LABELS[self.orient_radiology]
+            for (left, right), (left_label, right_label) in zip(
+                self.orientation_labels, labels
+            ):
+                left.value = left_label
+                right.value = right_label
+        # figures are flipped as they are drawn, in the background
+        self._scheduler.request()
+
+    def _orient_figure(self, iimage):
+        """Flip a matplotlib view, and label its sides, if needed."""
+        if self._figure_orientations[iimage] == self.orient_radiology:
+            return
+        ax = self.axes[iimage]
+        left, right = sorted(ax.get_xlim())
+        ax.set_xlim((right, left) if self.orient_radiology else (left, right))
+        for text in list(ax.texts):
+            text.remove()
+        left_label, right_label = ORIENTATION_LABELS[self.orient_radiology][
+            iimage
+        ]
+        for position, label, alignment in (
+            (-0.01, left_label, "right"),
+            (1.01, right_label, "left"),
+        ):
+            ax.text(
+                position,
+                0.5,
+                label,
+                transform=ax.transAxes,
+                horizontalalignment=alignment,
+                verticalalignment="center",
+                fontsize=16,
+            )
+        self._figure_orientations[iimage] = self.orient_radiology
 
     @traitlets.observe("colormap", "reverse_colors")
     def _update_colormap(self, change):
-        for image in self.images:
-            if self.reverse_colors:
-                image.set_cmap(self.colormap + "_r")
-            else:
-                image.set_cmap(self.colormap)
-        self._redraw()
+        self._invalidate(change["name"])
+        self._scheduler.request()
 
     def _generate_axes(self, figsize=(5, 5)):
         plt.ioff()  # to avoid figure duplication
         self.figures, self.axes = zip(
             *[plt.subplots(1, 1, figsize=figsize) for _ in range(3)]
         )
+        self.displays = [widgets.Output() for _ in range(3)]
 
         self.images = [None] * 3
-        for ax, title in zip(self.axes, ["Sagittal", "Coronal", "Axial"]):
+        self.layer_images = [[] for _ in range(3)]
+        self.guides = [None] * 3
+        # whether each figure is flipped for radiological orientation yet
+        self._figure_orientations = [None] * 3
+        for ax, title in zip(self.axes, VIEWS):
             ax.set_title(title)
             ax.set_axis_off()
 
-    def _redraw(self):
-        for fig, disp in zip(self.figures, self.displays):
-            with disp:
-                display.clear_output(wait=True)
-                display.display(fig)
+    def _generate_raster_views(self, figsize=(5, 5)):
+        """Create image widgets, with orientation labels either side."""
+        self.figures, self.axes = (), ()
+        self.images = [
+            widgets.Image(
+                format="png", layout={"width": str(figsize[0] * DPI) + "px"}
+            )
+            for _ in range(3)
+        ]
+        self.orientation_labels = [
+            (widgets.Label(), widgets.Label()) for _ in range(3)
+        ]
+        self._rgba = [None] * 3
+        self.displays = [
+            widgets.VBox(
+                [
+                    widgets.HTML("<center>" + title + "</center>"),
+                    widgets.HBox(
+                        [left, image, right], layout={"align_items": "center"}
+                    ),
+                ]
+            )
+            for title, image, (left, right) in zip(
+                VIEWS, self.images, self.orientation_labels
+            )
+        ]
 
     def render(self):
         """Build the widget view and return it."""
@@ -618,20 +1329,133 @@ class VolumeWidget(traitlets.HasTraits):
                     ],
                     layout={"flex_flow": "row wrap"},
                 ),
+                widgets.VBox(
+                    [self._layer_controls(layer) for layer in self.layers]
+                ),
                 widgets.Box(self.displays, layout={"flex_flow": "row wrap"}),
             ]
+            + (
+                [self.timecourse_display]
+                if self.timecourses is not None
+                else []
+            )
+            + (
+                [widgets.HBox([self.region_picker, self.region_label])]
+                if self.atlas is not None
+                else []
+            )
+            + ([self.stats.overlay()] if self.show_frame_time else [])
         )
         return self.layout
 
+    def _layer_controls(self, layer):
+        """A colormap picker, opacity slider and threshold for a layer."""
+        colormaps = sorted(
+            set(DEFAULT_COLORMAPS) | {"hot", "coolwarm", layer.colormap}
+        )
+        picker = widgets.Dropdown(
+            options=colormaps, value=layer.colormap, description="Colormap:"
+        )
+        opacity = widgets.FloatSlider(
+            value=layer.opacity,
+            min=0,
+            max=1,
+            step=0.05,
+            description="Opacity:",
+        )
+        threshold = widgets.FloatText(
+            value=layer.threshold or 0, description="Threshold:"
+        )
+        weak_link((picker, "value"), (layer, "colormap"))
+        weak_link((opacity, "value"), (layer, "opacity"))
+        layer_ref = weakref.ref(layer)
+        threshold.observe(
+            lambda change: layer_ref() is not None
+            and setattr(layer_ref(), "threshold", change["new"]),
+            names="value",
+        )
+        return widgets.HBox(
+            [widgets.Label(layer.name), picker, opacity, threshold],
+            layout={"flex_flow": "row wrap"},
+        )
+
     def _ipython_display_(self):
         """This gets called instead of __repr__ in ipython."""
         display.display(self.render())
 
     def close(self):
         """Close all figures created for this widget."""
-        for fig in self.figures:
+        # the widget may not have been built fully, if its arguments were
+        # invalid
+        for worker in ("_scheduler", "_prefetcher"):
+            if getattr(self, worker, None) is not None:
+                getattr(self, worker).shutdown()
+        if getattr(self, "_refine_timer", None) is not None:
+            self._refine_timer.cancel()
+        for fig in getattr(self, "figures", ()):
             plt.close(fig)  # to avoid matplotlib warnings
 
     def __del__(self):
         """Method to tidy up afterwards."""
         self.close()
+
+
+def _figure_rgba(figure, pad_inches=0.1):
+    """Draw a figure, cropped to its contents, as a uint8 RGBA array.
+
+    The crop matches ``savefig(bbox_inches="tight")``, but the figure is
+    only drawn once, and the pixels can then be encoded in any format.
+    """
+    figure.canvas.draw()
+    rgba = np.asarray(figure.canvas.buffer_rgba())
+    bbox = (
+        figure.get_tightbbox(figure.canvas.get_renderer())
+        .padded(pad_inches)
+        .transformed(figure.dpi_scale_trans)
+    )
+    height, width = rgba.shape[:2]
+    # the bounding box is measured up from the bottom of the figure
+    left, right = (int(round(min(max(x, 0), width))) for x in bbox.intervalx)
+    bottom, top = (
+        int(round(min(max(height - y, 0), height))) for y in bbox.intervaly
+    )
+    return rgba[top:bottom, left:right]
+
+
+def _figure_output(figure, data, image_format="png"):
+    """An encoded figure as a display output, like the inline backend's."""
+    return {
+        "output_type": "display_data",
+        "data": {
+            "image/" + image_format: base64.b64encode(data).decode("ascii"),
+            "text/plain": repr(figure),
+        },
+        "metadata": {},
+    }
+
+
+def _arg_names(func):
+    """The names of the arguments a function takes."""
+    return list(inspect.signature(func).parameters)
+
+
+def _freeze(value):
+    """Turn lists into tuples, so that they can be hashed."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _hashable(key):
+    try:
+        hash(key)
+    except TypeError:
+        return False
+    return True
+
+
+def _extract(data, axis, index, t=None):
+    """Read a plane from an array, or from a Reslicer in world space."""
+    if isinstance(data, Reslicer):
+        return data.plane(axis, index, t)
+    return extract_plane(data, axis, index, t)
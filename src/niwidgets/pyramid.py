@@ -0,0 +1,200 @@
+"""Multi-resolution pyramids of large volumes, kept on disk."""
+import hashlib
+import os
+
+import numpy as np
+
+from .cache import get_cache_dir
+from .slicing import extract_plane, get_dataobj
+
+
+class Pyramid:
+    """A volume and downsampled copies of it.
+
+    Each level halves the size of the previous one along the three spatial
+    axes. The time axis of 4D images is kept, and any axes after it are
+    read at their first index, as when planes are extracted.
+
+    Args
+    ----
+        levels : list
+                Array-like volumes, starting with the full resolution data.
+        window : tuple
+                The (min, max) of the full resolution data, if known. It is
+                recorded while the levels are built, so that displaying a
+                pyramid never has to scan the full resolution data.
+    """
+
+    def __init__(self, levels, window=None):
+        self.levels = list(levels)
+        self.window = window
+
+    @property
+    def n_levels(self):
+        return len(self.levels)
+
+    def level_for_size(self, plane_shape, pixels):
+        """Choose the coarsest level that still fills the display.
+
+        Args
+        ----
+            plane_shape : tuple
+                    The full resolution shape of the displayed plane.
+            pixels : int
+                    The number of pixels available to show the plane's
+                    longest side.
+        """
+        longest = max(plane_shape)
+        level = 0
+        while (
+            level + 1 < self.n_levels and longest / 2 ** (level + 1) >= pixels
+        ):
+            level += 1
+        return level
+
+    def plane(self, level, axis, index, t=None):
+        """Read a plane of a level, given its full resolution index."""
+        data = self.levels[level]
+        index = min(index // 2 ** level, data.shape[axis] - 1)
+        return extract_plane(data, axis, index, t)
+
+
+def _downsample_slab(slab):
+    """Average 2x2x2 blocks of a 3D slab, dropping odd edges."""
+    nx, ny, nz = (n // 2 * 2 for n in slab.shape)
+    slab = np.asarray(slab[:nx, :ny, :nz], dtype=np.float32)
+    return slab.reshape(nx // 2, 2, ny // 2, 2, nz // 2, 2).mean(
+        axis=(1, 3, 5)
+    )
+
+
+def _downsample(source, target, chunk_planes=16):
+    """Fill target with source at half resolution, a slab at a time.
+
+    Returns
+    -------
+        window : tuple
+                The (min, max) of the finite values of ``source``, including
+                the odd edges that aren't part of ``target``.
+    """
+    vmin, vmax = np.inf, -np.inf
+    n_frames = target.shape[3] if target.ndim > 3 else 1
+    for frame in range(n_frames):
+        for start in range(0, target.shape[2], chunk_planes):
+            stop = min(start + chunk_planes, target.shape[2])
+            # the last slab also reads an odd trailing plane, for the range
+            source_stop = 2 * stop if stop < target.shape[2] else None
+            source_slicer = (
+                slice(None),
+                slice(None),
+                slice(2 * start, source_stop),
+            )
+            target_slicer = (slice(None), slice(None), slice(start, stop))
+            if target.ndim > 3:
+                # axes after time are read at their first index
+                source_slicer += (frame,) + (0,) * (source.ndim - 4)
+                target_slicer += (frame,)
+            slab = np.asanyarray(source[source_slicer])
+            finite = slab[np.isfinite(slab)]
+            if finite.size:
+                vmin = min(vmin, float(finite.min()))
+                vmax = max(vmax, float(finite.max()))
+            target[target_slicer] = _downsample_slab(slab)
+    return vmin, vmax
+
+
+def _level_shapes(shape, min_size):
+    """The shapes of the downsampled levels, largest first."""
+    shapes = []
+    spatial = tuple(shape[:3])
+    while min(spatial) // 2 >= min_size:
+        spatial = tuple(n // 2 for n in spatial)
+        shapes.append(spatial + tuple(shape[3:4]))
+    return shapes
+
+
+def pyramid_directory(filename):
+    """Where the pyramid of a file is stored.
+
+    This is a ``.pyramid`` directory beside the file, or a directory in the
+    niwidgets cache if the file's directory isn't writable.
+    """
+    filename = os.path.abspath(str(filename))
+    if os.access(os.path.dirname(filename), os.W_OK):
+        return filename + ".pyramid"
+    key = hashlib.sha1(filename.encode("utf-8")).hexdigest()
+    return os.path.join(get_cache_dir(), "pyramids", key)
+
+
+def build_pyramid(image, min_size=64, directory=None):
+    """Build (or load) the pyramid of an image.
+
+    Levels are saved as ``.npy`` files in ``directory`` and memory-mapped,
+    so building them once is enough, even across sessions. They are rebuilt
+    if the source file is newer. Images that aren't backed by a file are
+    downsampled in memory instead. The intensity range of the image is
+    recorded while the first level is built, and saved with the levels.
+
+    Args
+    ----
+        image : nibabel image
+                The full resolution image.
+        min_size : int
+                Levels are added until the next one would have a spatial
+                dimension smaller than this.
+        directory : str
+                Where to keep the levels. By default, see
+                :func:`pyramid_directory`.
+    """
+    dataobj = get_dataobj(image)
+    shapes = _level_shapes(dataobj.shape, min_size)
+
+    filename = image.get_filename() if hasattr(image, "get_filename") else None
+    if directory is None and filename is not None:
+        directory = pyramid_directory(filename)
+
+    levels = [dataobj]
+    source = dataobj
+    window = None
+    if directory is not None:
+        window_path = os.path.join(directory, "window.npy")
+        if _is_fresh(window_path, filename):
+            window = tuple(float(value) for value in np.load(window_path))
+    for i, shape in enumerate(shapes, start=1):
+        # the range of the source, if it was read to build this level
+        level_window = None
+        if directory is None:
+            level = np.zeros(shape, dtype=np.float32)
+            level_window = _downsample(source, level)
+        else:
+            path = os.path.join(directory, "level{}.npy".format(i))
+            # the range is found while the first level is built
+            if not _is_fresh(path, filename) or (i == 1 and window is None):
+                os.makedirs(directory, exist_ok=True)
+                # write to a temporary file, so that an interrupted build
+                # doesn't leave a level behind that looks complete
+                partial = np.lib.format.open_memmap(
+                    path + ".partial",
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=shape,
+                    fortran_order=True,
+                )
+                level_window = _downsample(source, partial)
+                partial.flush()
+                del partial
+                os.replace(path + ".partial", path)
+            level = np.load(path, mmap_mode="r")
+        if i == 1 and level_window is not None:
+            window = level_window
+            if directory is not None:
+                np.save(window_path, np.array(window))
+        levels.append(level)
+        source = level
+    return Pyramid(levels, window)
+
+
+def _is_fresh(path, source):
+    return os.path.isfile(path) and (
+        source is None or os.path.getmtime(path) >= os.path.getmtime(source)
+    )
@@ -0,0 +1,279 @@
+"""Render planes straight to image bytes, without matplotlib figures."""
+import struct
+import zlib
+
+import numpy as np
+
+from .lut import apply_lut
+from .sources import _import_optional
+
+GUIDE_COLOR = (128, 128, 128, 255)
+# the formats frames can be sent in; the last two are lossy
+FRAME_FORMATS = ("raw", "png", "jpeg", "webp")
+LOSSY_FORMATS = ("jpeg", "webp")
+
+
+def colormap_plane(plane, colormap, vmin, vmax):
+    """Map a 2D plane of intensities to a uint8 RGBA image.
+
+    Args
+    ----
+        plane : np.ndarray
+                The intensities. Masked values become transparent.
+        colormap : str
+                The name of a matplotlib colormap.
+        vmin, vmax : float
+                The intensities mapped to the bottom and top of the colormap.
+    """
+    return apply_lut(plane, colormap, vmin, vmax)
+
+
+def draw_guides(rgba, column=None, row=None, color=GUIDE_COLOR):
+    """Return a copy of an RGBA image with guide lines drawn on it.
+
+    Args
+    ----
+        rgba : np.ndarray
+                The image, of shape (height, width, 4).
+        column : int
+                The column to draw a vertical line in, if any.
+        row : int
+                The row to draw a horizontal line in, if any.
+    """
+    rgba = rgba.copy()
+    if column is not None and 0 <= column < rgba.shape[1]:
+        rgba[:, column] = color
+    if row is not None and 0 <= row < rgba.shape[0]:
+        rgba[row, :] = color
+    return rgba
+
+
+def _png_chunk(tag, data):
+    return (
+        struct.pack(">I", len(data))
+        + tag
+        + data
+        + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    )
+
+
+def encode_png(image, compression=6):
+    """Encode a uint8 image as PNG bytes.
+
+    Args
+    ----
+        image : np.ndarray
+                A (height, width) grayscale, or (height, width, 3|4) RGB(A)
+                image of dtype uint8.
+        compression : int
+                The zlib compression level, from 0 (fastest, largest) to 9.
+    """
+    image = np.asarray(image, dtype=np.uint8)
+    if image.ndim == 2:
+        image = image[:, :, np.newaxis]
+    height, width, channels = image.shape
+    color_type = {1: 0, 3: 2, 4: 6}[channels]
+
+    # each row starts with a filter byte, 0 meaning "no filter"
+    raw = np.zeros((height, width * channels + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, -1)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            _png_chunk(b"IHDR", header),
+            _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), compression)),
+            _png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+def _flatten(rgba):
+    """Composite an RGBA image onto black, for formats without alpha."""
+    alpha = rgba[..., 3:].astype(np.uint16)
+    return (rgba[..., :3] * alpha // 255).astype(np.uint8)
+
+
+def encode_frame(image, format="png", quality=85, compression=6):
+    """Encode a uint8 image in a format browsers can show.
+
+    Args
+    ----
+        image : np.ndarray
+                A (height, width) grayscale, or (height, width, 3|4) RGB(A)
+                image of dtype uint8.
+        format : str
+                "raw" stores the pixels uncompressed, which is the fastest
+                to encode but the largest to send. "png" compresses them
+                losslessly. "jpeg" and "webp" are lossy and much smaller;
+                they need Pillow, and transparent pixels become black.
+        quality : int
+                The quality of lossy formats, from 1 to 100.
+        compression : int
+                The zlib level of "png", from 0 to 9.
+
+    Returns
+    -------
+        data : bytes
+                The encoded image.
+        format : str
+                The image format of ``data``, as ``ipywidgets.Image`` and
+                browsers name it.
+    """
+    if format == "raw":
+        # an uncompressed PNG is the raw pixels, plus a few header bytes
+        return encode_png(image, 0), "png"
+    if format == "png":
+        return encode_png(image, compression), "png"
+    if format not in LOSSY_FORMATS:
+        raise ValueError(
+            "Frames can be encoded as " + ", ".join(FRAME_FORMATS) + "."
+        )
+    _import_optional("PIL", "Lossy frame encoding", package="pillow")
+    import io
+
+    from PIL import Image
+
+    image = np.asarray(image, dtype=np.uint8)
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = _flatten(image)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format=format, quality=quality)
+    return buffer.getvalue(), format
+
+
+class FrameEncoder:
+    """How a widget encodes the frames it sends to the browser.
+
+    Over a slow link, most of the time to show a frame goes on sending it,
+    so smaller frames trade fidelity for latency. A lossy format can be
+    used only while a slider is being dragged, and the settled frame is
+    then sent again losslessly.
+
+    Args
+    ----
+        format : str
+                The format of settled frames; see :func:`encode_frame`.
+        quality : int
+                The quality of lossy formats, from 1 to 100.
+        compression : int
+                The zlib level of PNG frames, from 0 to 9.
+        drag_format : str
+                The format of frames drawn while a slider is dragged. By
+                default, the same as ``format``.
+        drag_quality : int
+                The quality of lossy frames drawn while dragging. By
+                default, the same as ``quality``.
+    """
+
+    def __init__(
+        self,
+        format="png",
+        quality=85,
+        compression=6,
+        drag_format=None,
+        drag_quality=None,
+    ):
+        for name in (format, drag_format):
+            if name is not None and name not in FRAME_FORMATS:
+                raise ValueError(
+                    "Frames can be encoded as "
+                    + ", ".join(FRAME_FORMATS)
+                    + "."
+                )
+        self.format = format
+        self.quality = quality
+        self.compression = compression
+        self.drag_format = drag_format or format
+        self.drag_quality = drag_quality or quality
+
+    @property
+    def lossy_drag(self):
+        """Whether frames drawn while dragging differ from settled ones."""
+        return (self.drag_format, self.drag_quality) != (
+            self.format,
+            self.quality,
+        ) and self.drag_format in LOSSY_FORMATS
+
+    def encode(self, image, dragging=False):
+        """Encode a frame, returning its bytes and their image format."""
+        if dragging:
+            return encode_frame(
+                image, self.drag_format, self.drag_quality, self.compression
+            )
+        return encode_frame(image, self.format, self.quality, self.compression)
+
+
+def tile_images(images, columns=None, fill=(0, 0, 0, 255)):
+    """Arrange RGBA images in a grid, row by row.
+
+    Args
+    ----
+        images : list, np.ndarray
+                The (height, width, 4) uint8 images. Smaller ones are
+                centred in a cell the size of the largest. Images of the
+                same size can be passed as one (n, height, width, 4) array,
+                which is tiled without copying each image in turn.
+        columns : int
+                The number of images in a row. By default, the grid is as
+                close to square as possible.
+        fill : tuple
+                The colour of cells, or parts of cells, without an image.
+    """
+    if isinstance(images, np.ndarray) and images.ndim == 4:
+        return _tile_stack(images, columns, fill)
+    images = [np.asarray(image, dtype=np.uint8) for image in images]
+    if columns is None:
+        columns = int(np.ceil(np.sqrt(len(images))))
+    rows = int(np.ceil(len(images) / columns))
+    height = max(image.shape[0] for image in images)
+    width = max(image.shape[1] for image in images)
+
+    mosaic = np.empty((rows * height, columns * width, 4), dtype=np.uint8)
+    mosaic[:] = fill
+    for i, image in enumerate(images):
+        top = (i // columns) * height + (height - image.shape[0]) // 2
+        left = (i % columns) * width + (width - image.shape[1]) // 2
+        mosaic[top : top + image.shape[0], left : left + image.shape[1]] = (
+            image
+        )
+    return mosaic
+
+
+def _tile_stack(images, columns, fill):
+    n_images, height, width, channels = images.shape
+    if columns is None:
+        columns = int(np.ceil(np.sqrt(n_images)))
+    rows = int(np.ceil(n_images / columns))
+    cells = np.empty((rows * columns, height, width, channels), dtype=np.uint8)
+    cells[:n_images] = images
+    cells[n_images:] = fill
+    # (rows, height, columns, width) are the mosaic's rows and columns
+    return (
+        cells.reshape(rows, columns, height, width, channels)
+        .swapaxes(1, 2)
+        .reshape(rows * height, columns * width, channels)
+    )
+
+
+def blend(bottom, top):
+    """Draw one RGBA image over another, using their alpha channels.
+
+    Args
+    ----
+        bottom, top : np.ndarray
+                uint8 RGBA images of the same shape.
+    """
+    top = top.astype(np.float32) / 255
+    bottom = bottom.astype(np.float32) / 255
+    top_alpha, bottom_alpha = top[..., 3:], bottom[..., 3:]
+    alpha = top_alpha + bottom_alpha * (1 - top_alpha)
+    rgb = top[..., :3] * top_alpha + bottom[..., :3] * bottom_alpha * (
+        1 - top_alpha
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rgb = np.where(alpha > 0, rgb / alpha, 0)
+    return np.round(np.concatenate([rgb, alpha], axis=-1) * 255).astype(
+        np.uint8
+    )
@@ -0,0 +1,252 @@
+"""Display planes in world orientation, using the image's affine.
+
+Rather than resampling the whole volume up front, a :class:`Reslicer` only
+computes the planes that are shown. Images whose axes line up with the
+world axes (in any order or direction) are reoriented by reading the
+matching raw plane and transposing or flipping it, which costs nothing
+extra. Oblique images are interpolated on a grid of world coordinates,
+reading only the slab of voxels the plane passes through.
+"""
+import nibabel as nib
+import numpy as np
+import scipy.ndimage
+
+from .slicing import extract_plane
+
+
+def is_oblique(affine, tolerance=1e-3):
+    """Whether the voxel axes of an affine are rotated from world axes."""
+    rotation = np.asarray(affine)[:3, :3]
+    directions = np.abs(rotation / np.linalg.norm(rotation, axis=0))
+    return bool((directions.max(axis=0) < 1 - tolerance).any())
+
+
+def level_affine(affine, level):
+    """The affine of a pyramid level, whose voxels are 2 ** level wide."""
+    factor = 2 ** level
+    scale = np.diag([factor, factor, factor, 1.0])
+    # downsampled voxels are centred between the voxels they average
+    scale[:3, 3] = (factor - 1) / 2
+    return np.asarray(affine).dot(scale)
+
+
+class PlaneSampler:
+    """Sample the planes of a display grid from another volume's voxels.
+
+    The voxel coordinates of the first plane along each axis are computed
+    once and cached. Since the mapping is affine, any other plane is that
+    grid shifted by a constant step. When the grid's axes line up with the
+    volume's axes, planes are gathered with cached nearest-voxel indices
+    instead of being interpolated.
+
+    Args
+    ----
+        dataobj : array-like
+                The voxel data to sample.
+        grid_to_voxel : np.ndarray
+                The 4x4 affine from display grid indices to voxel indices
+                of ``dataobj``.
+        grid_shape : tuple
+                The spatial shape of the display grid.
+        order : int
+                The spline order used to interpolate, when the axes don't
+                line up.
+    """
+
+    def __init__(self, dataobj, grid_to_voxel, grid_shape, order=1):
+        self.dataobj = dataobj
+        self.grid_to_voxel = np.asarray(grid_to_voxel, dtype=float)
+        self.grid_shape = tuple(int(n) for n in grid_shape[:3])
+        self.order = order
+        self.aligned = not is_oblique(self.grid_to_voxel)
+        self._grids = {}
+
+    def _grid(self, axis):
+        """The voxel coordinates of plane 0 along an axis, cached."""
+        if axis not in self._grids:
+            first, second = (i for i in range(3) if i != axis)
+            matrix = self.grid_to_voxel
+            if self.aligned:
+                # the nearest voxel index for each row and column
+                self._grids[axis] = [
+                    self._nearest_indices(first),
+                    self._nearest_indices(second),
+                ]
+            else:
+                rows = np.arange(self.grid_shape[first])
+                columns = np.arange(self.grid_shape[second])
+                self._grids[axis] = (
+                    matrix[:3, 3, np.newaxis, np.newaxis]
+                    + matrix[:3, first, np.newaxis, np.newaxis]
+                    * rows[np.newaxis, :, np.newaxis]
+                    + matrix[:3, second, np.newaxis, np.newaxis]
+                    * columns[np.newaxis, np.newaxis, :]
+                )
+        return self._grids[axis]
+
+    def plane(self, axis, index, t=None):
+        """Sample the plane at ``index`` along a display axis.
+
+        Points outside the volume are NaN.
+        """
+        if self.aligned:
+            return self._aligned_plane(axis, index, t)
+        return self._interpolated_plane(axis, index, t)
+
+    def _aligned_axis(self, axis):
+        """The voxel axis along a display axis, with its scale and offset."""
+        voxel_axis = int(np.argmax(np.abs(self.grid_to_voxel[:3, axis])))
+        return (
+            voxel_axis,
+            self.grid_to_voxel[voxel_axis, axis],
+            self.grid_to_voxel[voxel_axis, 3],
+        )
+
+    def _nearest_indices(self, axis):
+        """The voxel axis along a display axis, and the nearest indices."""
+        voxel_axis, scale, offset = self._aligned_axis(axis)
+        steps = np.arange(self.grid_shape[axis])
+        return voxel_axis, np.round(offset + scale * steps).astype(int)
+
+    def _aligned_plane(self, axis, index, t):
+        (first_axis, rows), (second_axis, columns) = self._grid(axis)
+        voxel_axis, scale, offset = self._aligned_axis(axis)
+        source = int(np.round(offset + scale * index))
+        shape = self.dataobj.shape
+        plane = np.full((len(rows), len(columns)), np.nan)
+        if not 0 <= source < shape[voxel_axis]:
+            return plane
+        raw = extract_plane(self.dataobj, voxel_axis, source, t)
+        if first_axis > second_axis:
+            raw = raw.T
+        valid_rows = (rows >= 0) & (rows < shape[first_axis])
+        valid_columns = (columns >= 0) & (columns < shape[second_axis])
+        plane[np.ix_(valid_rows, valid_columns)] = raw[
+            np.ix_(rows[valid_rows], columns[valid_columns])
+        ]
+        return plane
+
+    def _interpolated_plane(self, axis, index, t):
+        # the grid is linear, so any plane is the first one shifted
+        coordinates = self._grid(axis) + (
+            self.grid_to_voxel[:3, axis, np.newaxis, np.newaxis] * index
+        )
+        raw_shape = self.dataobj.shape
+        low = np.floor(coordinates.min(axis=(1, 2))).astype(int)
+        high = np.ceil(coordinates.max(axis=(1, 2))).astype(int) + 1
+        low = np.clip(low, 0, raw_shape[:3])
+        high = np.clip(high, 0, raw_shape[:3])
+        if (high <= low).any():
+            # the plane misses the volume
+            return np.full(coordinates.shape[1:], np.nan)
+
+        slicer = tuple(slice(lo, hi) for lo, hi in zip(low, high))
+        if len(raw_shape) > 3:
+            slicer += (t or 0,) + (0,) * (len(raw_shape) - 4)
+        slab = np.asarray(self.dataobj[slicer], dtype=float)
+        return scipy.ndimage.map_coordinates(
+            slab,
+            coordinates - low[:, np.newaxis, np.newaxis],
+            order=self.order,
+            mode="constant",
+            cval=np.nan,
+        )
+
+
+class Reslicer:
+    """Read planes of a volume along the world (RAS+) axes.
+
+    Planes are indexed like ``extract_plane``: axis 0 is sagittal, 1 is
+    coronal and 2 is axial, and a plane's axes are the other two, in
+    order, running towards right, anterior and superior.
+
+    Args
+    ----
+        dataobj : array-like
+                The voxel data, e.g. a nibabel array proxy.
+        affine : np.ndarray
+                The 4x4 voxel to world affine.
+        order : int
+                The spline order used to interpolate oblique images.
+    """
+
+    def __init__(self, dataobj, affine, order=1):
+        self.dataobj = dataobj
+        self.affine = np.asarray(affine, dtype=float)
+        self.order = order
+        self.oblique = is_oblique(self.affine)
+        raw_shape = tuple(dataobj.shape)
+        if self.oblique:
+            grid_to_voxel, spatial = self._init_grid(raw_shape[:3])
+            self._sampler = PlaneSampler(
+                dataobj, grid_to_voxel, spatial, order=order
+            )
+        else:
+            ornt = nib.orientations.io_orientation(self.affine)
+            # for each world axis, the voxel axis along it and whether
+            # that axis runs the other way
+            self._axes = [0] * 3
+            self._flips = [False] * 3
+            grid_to_voxel = np.zeros((4, 4))
+            grid_to_voxel[3, 3] = 1
+            for voxel_axis, (world_axis, direction) in enumerate(ornt):
+                world_axis = int(world_axis)
+                self._axes[world_axis] = voxel_axis
+                self._flips[world_axis] = direction < 0
+                grid_to_voxel[voxel_axis, world_axis] = direction
+                if direction < 0:
+                    grid_to_voxel[voxel_axis, 3] = raw_shape[voxel_axis] - 1
+            spatial = tuple(raw_shape[axis] for axis in self._axes)
+        self.shape = spatial + raw_shape[3:]
+        # from display grid indices to world coordinates
+        self.grid_affine = self.affine.dot(grid_to_voxel)
+
+    def _init_grid(self, raw_shape):
+        """Set up an axis-aligned world grid around an oblique volume."""
+        zooms = np.linalg.norm(self.affine[:3, :3], axis=0)
+        corners = np.array(
+            [
+                [i, j, k, 1]
+                for i in (0, raw_shape[0] - 1)
+                for j in (0, raw_shape[1] - 1)
+                for k in (0, raw_shape[2] - 1)
+            ]
+        ).T
+        world = self.affine.dot(corners)[:3]
+        origin, extent = world.min(axis=1), world.max(axis=1)
+        voxel_size = zooms.min()
+        grid_shape = tuple(
+            int(n) for n in np.floor((extent - origin) / voxel_size) + 1
+        )
+        grid_to_world = np.diag([voxel_size] * 3 + [1.0])
+        grid_to_world[:3, 3] = origin
+        return np.linalg.inv(self.affine).dot(grid_to_world), grid_shape
+
+    def plane(self, axis, index, t=None):
+        """Read a plane along a world axis.
+
+        Args
+        ----
+            axis : int
+                    The world axis perpendicular to the plane.
+            index : int
+                    The position along that axis, in ``shape``.
+            t : int
+                    The time point, for 4D images.
+        """
+        index = min(max(index, 0), self.shape[axis] - 1)
+        if self.oblique:
+            return self._sampler.plane(axis, index, t)
+
+        voxel_axis = self._axes[axis]
+        if self._flips[axis]:
+            index = self.shape[axis] - 1 - index
+        plane = extract_plane(self.dataobj, voxel_axis, index, t)
+        first, second = (i for i in range(3) if i != axis)
+        if self._axes[first] > self._axes[second]:
+            plane = plane.T
+        if self._flips[first]:
+            plane = plane[::-1]
+        if self._flips[second]:
+            plane = plane[:, ::-1]
+        return plane
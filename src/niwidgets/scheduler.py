@@ -0,0 +1,197 @@
+"""Coalescing of render requests, so that slow renders don't back up."""
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCancelled(Exception):
+    """Raised in a render that a newer request has made obsolete."""
+
+
+class RenderScheduler:
+    """Run a render function in a background thread, skipping stale frames.
+
+    Requests return immediately. If more requests arrive while a frame is
+    being rendered, they are merged into a single render that starts once
+    the current one is done, so the display always catches up with the
+    latest state instead of working through a queue of outdated frames.
+
+    Renders can also give up on a frame that is already out of date, by
+    calling :meth:`checkpoint` between their stages (e.g. before encoding
+    and before sending). Renders that change what they draw as they go
+    should then publish the whole frame after their last checkpoint, so
+    that only complete, current frames are shown.
+
+    The scheduler only holds a weak reference to a bound render method,
+    so that the render thread doesn't keep its widget alive. The thread
+    stops once the widget is gone.
+
+    Args
+    ----
+        render : callable
+                Called with no arguments to draw the current state.
+        window : float
+                The number of seconds over which frame rates are measured.
+        max_latency : float
+                Renders aren't cancelled once no frame has been shown for
+                this many seconds, so that a steady stream of requests
+                can't stop the display from updating.
+    """
+
+    def __init__(self, render, window=2.0, max_latency=0.5):
+        if hasattr(render, "__self__"):
+            self._render = weakref.WeakMethod(render)
+        else:
+            self._render = lambda: render
+        self.window = window
+        self.max_latency = max_latency
+        self.rendered = 0
+        self.dropped = 0
+        self.cancelled = 0
+        # the latest error raised while rendering, for flush to re-raise
+        self.error = None
+        self.lock = threading.RLock()
+        self._pending = False
+        self._busy = False
+        self._closed = False
+        self._requests = deque()
+        self._frames = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        # when the last frame was finished, or None before the first
+        self._last_frame = None
+
+    def request(self):
+        """Ask for a render of the current state."""
+        with self._condition:
+            if self._closed:
+                return
+            self._requests.append(time.monotonic())
+            if self._pending:
+                # this frame would be out of date before it is drawn
+                self.dropped += 1
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    @property
+    def render(self):
+        """The render function, or None once its widget is gone."""
+        return self._render()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    # wake up now and then to check the widget still exists
+                    self._condition.wait(1.0)
+                    if self.render is None:
+                        self._closed = True
+                if self._closed:
+                    return
+                self._pending = False
+                self._busy = True
+            finished = True
+            try:
+                with self.lock:
+                    self._render_once()
+            except RenderCancelled:
+                finished = False
+            except Exception as error:
+                # nothing waits on the render thread, so errors are logged
+                # as they happen
+                logger.exception("Drawing a frame failed.")
+                self.error = error
+            finally:
+                with self._condition:
+                    self._busy = False
+                    if finished:
+                        self.rendered += 1
+                        self._last_frame = time.monotonic()
+                        self._frames.append(self._last_frame)
+                    else:
+                        self.cancelled += 1
+                    self._condition.notify_all()
+
+    def _render_once(self):
+        # the render function is only held while it runs, so that the
+        # thread doesn't keep the widget alive while it waits
+        render = self.render
+        if render is not None:
+            render()
+
+    def checkpoint(self):
+        """Cancel the current render if a newer request has arrived.
+
+        This is called by the render function, and raises
+        :class:`RenderCancelled` if the frame being drawn is out of date.
+        The scheduler then starts again on the latest state.
+        """
+        with self._condition:
+            starved = (
+                self._last_frame is None
+                or time.monotonic() - self._last_frame > self.max_latency
+            )
+            if self._closed or (self._pending and not starved):
+                raise RenderCancelled()
+
+    def flush(self, timeout=None):
+        """Wait until all requested renders are done.
+
+        The latest error raised while rendering in the background, if
+        any, is re-raised here. Every error is also logged as it happens.
+
+        Returns
+        -------
+            done : bool
+                    False if the timeout ran out first.
+        """
+        with self._condition:
+            done = self._condition.wait_for(
+                lambda: self._closed or not (self._pending or self._busy),
+                timeout,
+            )
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+        return done
+
+    def _rate(self, times):
+        now = time.monotonic()
+        while times and times[0] < now - self.window:
+            times.popleft()
+        return len(times) / self.window
+
+    @property
+    def requested_fps(self):
+        """How many frames per second have been asked for, recently."""
+        with self._condition:
+            return self._rate(self._requests)
+
+    @property
+    def achieved_fps(self):
+        """How many frames per second have been drawn, recently."""
+        with self._condition:
+            return self._rate(self._frames)
+
+    def stats(self):
+        """A summary of the frames requested, drawn and dropped."""
+        return {
+            "requested_fps": self.requested_fps,
+            "achieved_fps": self.achieved_fps,
+            "rendered": self.rendered,
+            "dropped": self.dropped,
+            "cancelled": self.cancelled,
+        }
+
+    def shutdown(self):
+        """Stop the render thread. Pending renders are abandoned."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
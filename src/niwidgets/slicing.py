@@ -0,0 +1,221 @@
+"""Lazy extraction of 2D planes from volume images."""
+import os.path
+import threading
+import weakref
+
+import nibabel as nib
+import numpy as np
+from nibabel.openers import HAVE_INDEXED_GZIP
+
+COMPRESSED_EXTENSIONS = (".gz", ".bz2", ".zst")
+# compressed images up to this size (once decompressed) are held in memory
+MAX_COMPRESSED_BYTES = 1024 ** 3
+
+# decompressed data, kept for as long as the image it came from
+_decompressed = weakref.WeakKeyDictionary()
+_decompress_lock = threading.Lock()
+
+
+def load_volume(filename):
+    """Load a volume image without reading its voxel data.
+
+    Args
+    ----
+        filename : str, pathlib.Path, nibabel image, VolumeSource
+                The path to your ``.nii`` file or chunked volume (``.zarr``,
+                ``.h5``), or an already loaded image (anything with a
+                ``get_data`` method).
+
+    Returns
+    -------
+        image : nibabel image, VolumeSource
+                The image. Uncompressed files are memory-mapped, so that
+                only the parts of the file that are sliced get read.
+    """
+    if hasattr(filename, "get_data"):
+        return filename
+
+    # imported here, as sources builds on this module
+    from .sources import chunked_backend, open_source
+
+    filename = str(filename)
+    if chunked_backend(filename) is not None and os.path.exists(filename):
+        return open_source(filename)
+    if not os.path.isfile(filename):
+        raise OSError("File " + filename + " not found.")
+
+    # loading makes sure the file is readable by nibabel, but only reads
+    # the header: voxel data stays on disk behind an array proxy. Keeping
+    # the file open lets nibabel use indexed_gzip for compressed files.
+    return nib.load(filename, mmap="r", keep_file_open=True)
+
+
+def _is_compressed(image):
+    filename = image.get_filename() if hasattr(image, "get_filename") else ""
+    filename = str(filename).lower()
+    if HAVE_INDEXED_GZIP and filename.endswith(".gz"):
+        # indexed_gzip seeks within gzipped files, so planes are cheap
+        return False
+    return filename.endswith(COMPRESSED_EXTENSIONS)
+
+
+class DecompressOnRead:
+    """An array proxy that reads a compressed image into memory when sliced.
+
+    Nothing is read until the first slice, which decompresses the whole
+    image; later slices are taken from memory. The decompressed data is
+    shared by every proxy of the image, for as long as the image exists.
+
+    Args
+    ----
+        image : nibabel image
+                The compressed image.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self.shape = image.dataobj.shape
+        self.ndim = len(self.shape)
+
+    def _get_array(self):
+        with _decompress_lock:
+            if self.image not in _decompressed:
+                _decompressed[self.image] = np.asanyarray(self.image.dataobj)
+            return _decompressed[self.image]
+
+    def __getitem__(self, slicer):
+        return self._get_array()[slicer]
+
+    def __array__(self, dtype=None):
+        return np.asanyarray(self._get_array(), dtype=dtype)
+
+
+def get_dataobj(image, max_compressed_bytes=MAX_COMPRESSED_BYTES):
+    """Return the array-like object that holds the image data.
+
+    For nibabel images, this is the array proxy, which reads only the
+    requested part of the file when it is sliced. Other objects fall back
+    to ``get_data``.
+
+    Compressed files can't be read in arbitrary order, so reading one plane
+    costs about as much as reading the whole image. Unless indexed_gzip can
+    seek within them, those up to ``max_compressed_bytes`` are wrapped in a
+    :class:`DecompressOnRead`, which reads them into memory on the first
+    plane read.
+    """
+    if not hasattr(image, "dataobj"):
+        return np.asanyarray(image.get_data())
+
+    dataobj = image.dataobj
+    # scaled data is returned as floats, so assume the widest dtype
+    nbytes = int(np.prod(dataobj.shape)) * 8
+    if _is_compressed(image) and nbytes <= max_compressed_bytes:
+        return DecompressOnRead(image)
+    return dataobj
+
+
+def plane_slicer(shape, axis, index, t=None):
+    """Build the index tuple that selects one plane of a volume.
+
+    Args
+    ----
+        shape : tuple
+                The shape of the volume (3D or more).
+        axis : int
+                The spatial axis (0, 1 or 2) perpendicular to the plane.
+        index : int
+                The position of the plane along ``axis``.
+        t : int
+                The time point to select for 4D data. Ignored for 3D data.
+    """
+    slicer = [slice(None)] * 3
+    slicer[axis] = index
+    if len(shape) > 3:
+        slicer.append(t or 0)
+        # any further dimensions are not displayed
+        slicer.extend([0] * (len(shape) - 4))
+    return tuple(slicer)
+
+
+def extract_plane(dataobj, axis, index, t=None):
+    """Read a single 2D plane from a volume.
+
+    Args
+    ----
+        dataobj : array-like
+                The image data, e.g. a nibabel array proxy or numpy array.
+        axis : int
+                The spatial axis (0, 1 or 2) perpendicular to the plane.
+        index : int
+                The position of the plane along ``axis``.
+        t : int
+                The time point to select for 4D data.
+
+    Returns
+    -------
+        plane : np.ndarray
+                The 2D plane, with the remaining spatial axes in order.
+    """
+    return np.asanyarray(dataobj[plane_slicer(dataobj.shape, axis, index, t)])
+
+
+def extract_planes(dataobj, axis, indices, t=None):
+    """Read several planes along one axis in a single slicing operation.
+
+    Evenly spaced planes are read with one strided slice, which nibabel
+    array proxies turn into a single read of the file. Other planes are
+    picked out of the slab that spans them.
+
+    Args
+    ----
+        dataobj : array-like
+                The image data, e.g. a nibabel array proxy or numpy array.
+        axis : int
+                The spatial axis (0, 1 or 2) perpendicular to the planes.
+        indices : list
+                The positions of the planes along ``axis``, in order.
+        t : int
+                The time point to select for 4D data.
+
+    Returns
+    -------
+        planes : np.ndarray
+                The planes stacked along the first axis, each with the
+                remaining spatial axes in order.
+    """
+    indices = np.asarray(indices, dtype=int)
+    steps = np.diff(indices)
+    if len(steps) and steps[0] > 0 and (steps == steps[0]).all():
+        selection = slice(indices[0], indices[-1] + 1, int(steps[0]))
+        offsets = slice(None)
+    else:
+        selection = slice(indices.min(), indices.max() + 1)
+        offsets = indices - indices.min()
+    slicer = list(plane_slicer(dataobj.shape, axis, 0, t))
+    slicer[axis] = selection
+    slab = np.asanyarray(dataobj[tuple(slicer)])
+    return np.moveaxis(slab, axis, 0)[offsets]
+
+
+def extract_timecourse(dataobj, x, y, z):
+    """Read the time series of one voxel of a 4D volume.
+
+    Only the voxel's values are read: nibabel array proxies and memory maps
+    turn this into one small strided read per time point, rather than
+    loading the whole run.
+
+    Args
+    ----
+        dataobj : array-like
+                The 4D image data.
+        x, y, z : int
+                The voxel.
+
+    Returns
+    -------
+        values : np.ndarray
+                The voxel's value at each time point.
+    """
+    # any further dimensions are not displayed
+    slicer = (x, y, z, slice(None)) + (0,) * (len(dataobj.shape) - 4)
+    return np.asarray(dataobj[slicer], dtype=float)
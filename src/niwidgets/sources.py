@@ -0,0 +1,233 @@
+"""Volume sources: where the widgets get their voxel data from.
+
+A volume source behaves like a read-only numpy array that only reads the
+part of the data it is sliced with. The widgets accept a source in place
+of a filename or nibabel image, so data that doesn't fit in memory can be
+kept in a chunked format on disk (Zarr or HDF5) and viewed a plane at a
+time.
+"""
+import abc
+
+import numpy as np
+
+from .slicing import get_dataobj, load_volume
+
+ZARR_EXTENSIONS = (".zarr",)
+HDF5_EXTENSIONS = (".h5", ".hdf5")
+
+
+class VolumeSource(abc.ABC):
+    """The interface of a source of volume data.
+
+    Subclasses set ``shape``, ``dtype`` and ``affine``, and implement
+    ``__getitem__``, which should only read the data that is asked for.
+    Sources also act as their own ``dataobj``, so they can be used wherever
+    niwidgets expects a nibabel image.
+    """
+
+    shape = ()
+    dtype = np.dtype(np.float64)
+    affine = np.eye(4)
+    filename = None
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def dataobj(self):
+        return self
+
+    @abc.abstractmethod
+    def __getitem__(self, slicer):
+        """Read the part of the volume selected by ``slicer``."""
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[...], dtype=dtype)
+
+    def get_filename(self):
+        return self.filename
+
+    def get_data(self):
+        """Read the whole volume into memory."""
+        return np.asarray(self)
+
+
+class ArraySource(VolumeSource):
+    """A volume held in an in-memory (or memory-mapped) array."""
+
+    def __init__(self, array, affine=None):
+        self._array = array
+        self.shape = tuple(array.shape)
+        self.dtype = np.dtype(array.dtype)
+        self.affine = np.eye(4) if affine is None else np.asarray(affine)
+
+    def __getitem__(self, slicer):
+        return np.asarray(self._array[slicer])
+
+
+class ZarrSource(VolumeSource):
+    """A volume stored as a chunked Zarr array.
+
+    Args
+    ----
+        path : str
+                The path to the ``.zarr`` store, as written by
+                :func:`convert_nifti`.
+    """
+
+    def __init__(self, path):
+        zarr = _import_optional("zarr")
+        self.filename = str(path)
+        self._array = zarr.open_array(self.filename, mode="r")
+        self.shape = tuple(self._array.shape)
+        self.dtype = np.dtype(self._array.dtype)
+        self.affine = np.asarray(
+            self._array.attrs.get("affine", np.eye(4).tolist())
+        )
+
+    def __getitem__(self, slicer):
+        return np.asarray(self._array[slicer])
+
+
+class HDF5Source(VolumeSource):
+    """A volume stored as a chunked dataset in an HDF5 file.
+
+    Args
+    ----
+        path : str
+                The path to the HDF5 file.
+        dataset : str
+                The name of the dataset in the file.
+    """
+
+    def __init__(self, path, dataset="data"):
+        h5py = _import_optional("h5py")
+        self.filename = str(path)
+        self._file = h5py.File(self.filename, "r")
+        self._array = self._file[dataset]
+        self.shape = tuple(self._array.shape)
+        self.dtype = np.dtype(self._array.dtype)
+        self.affine = np.asarray(self._array.attrs.get("affine", np.eye(4)))
+
+    def __getitem__(self, slicer):
+        if slicer is Ellipsis:
+            return self._array[()]
+        return self._array[slicer]
+
+    def close(self):
+        self._file.close()
+
+
+def _import_optional(
+    name, feature="Reading and writing chunked volumes", package=None
+):
+    try:
+        return __import__(name)
+    except ImportError:
+        raise ImportError(
+            "{0} needs the optional dependency {1}. You can install it "
+            "with: pip install {1}".format(feature, package or name)
+        )
+
+
+def chunked_backend(path):
+    """The chunked format a path is in ("zarr" or "hdf5"), or None."""
+    path = str(path).rstrip("/\\").lower()
+    if path.endswith(ZARR_EXTENSIONS):
+        return "zarr"
+    if path.endswith(HDF5_EXTENSIONS):
+        return "hdf5"
+    return None
+
+
+def open_source(path):
+    """Open a chunked volume, choosing the backend from the extension.
+
+    Args
+    ----
+        path : str, pathlib.Path
+                A ``.zarr`` store, or an ``.h5`` / ``.hdf5`` file.
+    """
+    backend = chunked_backend(path)
+    if backend == "zarr":
+        return ZarrSource(path)
+    elif backend == "hdf5":
+        return HDF5Source(path)
+    else:
+        raise ValueError(
+            "Can't tell the format of " + str(path) + ". Chunked volumes "
+            "should end in .zarr, .h5 or .hdf5."
+        )
+
+
+def default_chunks(shape, size=64):
+    """Cubic spatial chunks, and one chunk per time point."""
+    return tuple(min(n, size) for n in shape[:3]) + (1,) * len(shape[3:])
+
+
+def convert_nifti(filename, output, chunks=None, backend=None):
+    """Convert a NIfTI file to a chunked volume.
+
+    The image is copied a slab at a time, so it never has to fit into
+    memory. The affine is stored along with the data.
+
+    Args
+    ----
+        filename : str, pathlib.Path, nibabel image
+                The image to convert.
+        output : str, pathlib.Path
+                Where to write the chunked volume.
+        chunks : tuple
+                The chunk shape. By default, 64 voxel cubes in space, and one
+                chunk per time point.
+        backend : str
+                "zarr" or "hdf5". By default, this is chosen from the
+                extension of ``output``.
+
+    Returns
+    -------
+        source : VolumeSource
+                The converted volume, opened for reading.
+    """
+    image = load_volume(filename)
+    dataobj = get_dataobj(image)
+    shape = tuple(dataobj.shape)
+    chunks = chunks or default_chunks(shape)
+    backend = backend or chunked_backend(output)
+    output = str(output)
+    dtype = np.asanyarray(dataobj[(0,) * len(shape)]).dtype
+    affine = np.asarray(image.affine, dtype=float)
+
+    if backend == "zarr":
+        zarr = _import_optional("zarr")
+        target = zarr.open_array(
+            output, mode="w", shape=shape, chunks=chunks, dtype=dtype
+        )
+        target.attrs["affine"] = affine.tolist()
+        _copy_slabs(dataobj, target, chunks[2])
+        return ZarrSource(output)
+    elif backend == "hdf5":
+        h5py = _import_optional("h5py")
+        with h5py.File(output, "w") as f:
+            target = f.create_dataset(
+                "data", shape=shape, chunks=chunks, dtype=dtype
+            )
+            target.attrs["affine"] = affine
+            _copy_slabs(dataobj, target, chunks[2])
+        return HDF5Source(output)
+    else:
+        raise ValueError("The backend should be either 'zarr' or 'hdf5'.")
+
+
+def _copy_slabs(source, target, depth):
+    """Copy source into target in slabs of ``depth`` axial planes."""
+    shape = source.shape
+    for extra in np.ndindex(*shape[3:]):
+        for start in range(0, shape[2], depth):
+            slicer = (
+                slice(None),
+                slice(None),
+                slice(start, start + depth),
+            ) + extra
+            target[slicer] = np.asanyarray(source[slicer])
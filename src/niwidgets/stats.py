@@ -0,0 +1,306 @@
+"""Intensity statistics of volume images, computed once and cached."""
+import weakref
+
+import numpy as np
+
+from .slicing import get_dataobj
+
+# statistics are kept as long as the image they describe is alive
+_cache = weakref.WeakKeyDictionary()
+
+DEFAULT_PERCENTILES = (0.5, 1, 2, 5, 25, 50, 75, 95, 98, 99, 99.5)
+
+
+class ImageStatistics:
+    """Summary of the intensities in an image (or in one frame of it).
+
+    The minimum and maximum are exact. Percentiles and the histogram are
+    computed from at most ``max_samples`` evenly strided voxels, which makes
+    them exact for small images and a close estimate for large ones.
+
+    Attributes
+    ----------
+        min : float
+                The smallest finite value.
+        max : float
+                The largest finite value.
+        percentiles : dict
+                Maps each requested percentile to its value.
+        histogram : tuple
+                The ``(counts, bin_edges)`` of the intensities, with counts
+                scaled to the number of voxels in the image.
+        frames : list
+                One ``ImageStatistics`` per time point of a 4D image, or
+                None if per-frame statistics were not requested.
+    """
+
+    def __init__(self, minimum, maximum, sample, n_voxels, percentiles, bins):
+        self.min = float(minimum)
+        self.max = float(maximum)
+        self.n_voxels = n_voxels
+        self.frames = None
+
+        if sample.size == 0:
+            self.percentiles = {q: np.nan for q in percentiles}
+            self.histogram = (np.zeros(bins), np.zeros(bins + 1))
+            return
+
+        self.percentiles = dict(
+            zip(percentiles, np.percentile(sample, percentiles))
+        )
+        counts, edges = np.histogram(
+            sample, bins=bins, range=(self.min, self.max)
+        )
+        self.histogram = (counts * (n_voxels / sample.size), edges)
+
+    def window(self, robust=False):
+        """Return the ``(vmin, vmax)`` display range.
+
+        Args
+        ----
+            robust : bool
+                    Whether to clip the range to the 2nd and 98th
+                    percentile, rather than using the full range.
+        """
+        if robust and 2 in self.percentiles and 98 in self.percentiles:
+            return self.percentiles[2], self.percentiles[98]
+        return self.min, self.max
+
+
+def _iter_chunks(dataobj, chunk_bytes):
+    """Yield ``(frame, chunk)`` pairs that together cover the image.
+
+    Chunks are slabs along the last axis, which is the slowest-changing
+    axis on disk for NIfTI files, so each chunk is one contiguous read.
+    4D images are read one volume at a time (or less, for big volumes).
+    """
+    shape = dataobj.shape
+    n_frames = shape[3] if len(shape) > 3 else 1
+    frame_shape = shape[:3]
+    itemsize = max(np.dtype(getattr(dataobj, "dtype", float)).itemsize, 8)
+    slab_bytes = int(np.prod(frame_shape[:2])) * itemsize
+    step = max(1, int(chunk_bytes // max(slab_bytes, 1)))
+
+    for frame in range(n_frames):
+        for start in range(0, frame_shape[2], step):
+            slicer = (slice(None), slice(None), slice(start, start + step))
+            if len(shape) > 3:
+                slicer += (frame,) + (0,) * (len(shape) - 4)
+            yield frame, np.asanyarray(dataobj[slicer])
+
+
+class _Accumulator:
+    """Running min, max and strided sample of a stream of chunks."""
+
+    def __init__(self, stride):
+        self.stride = stride
+        self.min = np.inf
+        self.max = -np.inf
+        self.n_voxels = 0
+        self.samples = []
+
+    def add(self, values):
+        self.n_voxels += values.size
+        if values.size == 0:
+            return
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.samples.append(values[:: self.stride].copy())
+
+    def finish(self, percentiles, bins):
+        sample = (
+            np.concatenate(self.samples) if self.samples else np.zeros(0)
+        )
+        return ImageStatistics(
+            self.min, self.max, sample, self.n_voxels, percentiles, bins
+        )
+
+
+def compute_statistics(
+    image,
+    per_frame=False,
+    percentiles=DEFAULT_PERCENTILES,
+    bins=256,
+    max_samples=1000000,
+    chunk_bytes=64 * 1024 ** 2,
+):
+    """Compute intensity statistics in a single pass over the image data.
+
+    The data is read in chunks of about ``chunk_bytes``, so the whole image
+    is never held in memory.
+
+    Args
+    ----
+        image : nibabel image
+                The image to summarise.
+        per_frame : bool
+                Whether to also keep separate statistics for each time point
+                of a 4D image.
+        percentiles : tuple
+                The percentiles to compute, between 0 and 100.
+        bins : int
+                The number of histogram bins.
+        max_samples : int
+                The maximum number of voxels to keep for the percentile and
+                histogram estimates (per image, and per frame).
+        chunk_bytes : int
+                The approximate amount of data read at once.
+
+    Returns
+    -------
+        stats : ImageStatistics
+    """
+    dataobj = get_dataobj(image)
+    shape = dataobj.shape
+    n_frames = shape[3] if len(shape) > 3 else 1
+    frame_size = int(np.prod(shape[:3]))
+    stride = max(1, int(np.ceil(frame_size * n_frames / max_samples)))
+    frame_stride = max(1, int(np.ceil(frame_size / max_samples)))
+
+    total = _Accumulator(stride)
+    frames = []
+    current = None
+
+    for frame, chunk in _iter_chunks(dataobj, chunk_bytes):
+        values = chunk.ravel()
+        if np.ma.isMaskedArray(values):
+            values = values.compressed()
+        if values.dtype.kind == "f":
+            values = values[np.isfinite(values)]
+        total.add(values)
+        if per_frame:
+            if frame != len(frames) - 1:
+                # finish the previous frame so only one sample is kept
+                if current is not None:
+                    frames[-1] = current.finish(percentiles, bins)
+                current = _Accumulator(frame_stride)
+                frames.append(None)
+            current.add(values)
+
+    stats = total.finish(percentiles, bins)
+    if per_frame:
+        frames[-1] = current.finish(percentiles, bins)
+        stats.frames = frames
+    return stats
+
+
+def get_statistics(image, per_frame=False, **kwargs):
+    """Return the (cached) intensity statistics of an image.
+
+    The statistics are computed the first time they are requested for an
+    image, and reused afterwards. Any keyword arguments are passed on to
+    :func:`compute_statistics`.
+    """
+    try:
+        stats = _cache.get(image)
+    except TypeError:
+        # not weak-referenceable, so it can't be cached
+        return compute_statistics(image, per_frame=per_frame, **kwargs)
+
+    if stats is None or (per_frame and stats.frames is None):
+        stats = compute_statistics(image, per_frame=per_frame, **kwargs)
+        _cache[image] = stats
+    return stats
+
+
+TIME_REDUCTIONS = ("max", "min", "mean", "std", "tsnr")
+
+
+def reduce_time(
+    image, reductions=("mean",), transform=None, chunk_bytes=64 * 1024 ** 2
+):
+    """Summarise each voxel over time, reading a few volumes at a time.
+
+    Only one chunk of time points is in memory at once, along with the
+    running results, so this works on runs much bigger than memory.
+    Means and standard deviations are combined across chunks with Chan's
+    parallel algorithm, which stays accurate over long runs.
+
+    Args
+    ----
+        image : nibabel image, array-like
+                A 3D or 4D image, or its data. 3D images count as a single
+                time point.
+        reductions : tuple
+                Any of "max", "min", "mean", "std" and "tsnr" (the mean
+                divided by the standard deviation, or 0 where that is 0).
+        transform : callable
+                Applied to each chunk before it is reduced, e.g.
+                ``np.round``.
+        chunk_bytes : int
+                The approximate amount of data read at once.
+
+    Returns
+    -------
+        results : dict
+                The 3D result of each reduction, keyed by its name.
+    """
+    unknown = set(reductions) - set(TIME_REDUCTIONS)
+    if unknown:
+        raise ValueError(
+            "Unknown reductions: {}. Choose from {}.".format(
+                ", ".join(sorted(unknown)), ", ".join(TIME_REDUCTIONS)
+            )
+        )
+
+    dataobj = get_dataobj(image) if hasattr(image, "get_data") else image
+    shape = dataobj.shape
+    n_frames = shape[3] if len(shape) > 3 else 1
+    frame_bytes = int(np.prod(shape[:3])) * 8
+    step = max(1, int(chunk_bytes // frame_bytes))
+
+    count = 0
+    mean = m2 = maximum = minimum = None
+    for start in range(0, n_frames, step):
+        if len(shape) > 3:
+            # any dimensions after time are fixed at their first index
+            slicer = (slice(None),) * 3 + (slice(start, start + step),)
+            chunk = dataobj[slicer + (0,) * (len(shape) - 4)]
+        else:
+            chunk = np.asanyarray(dataobj)[..., np.newaxis]
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if transform is not None:
+            chunk = transform(chunk)
+
+        if "max" in reductions:
+            chunk_max = chunk.max(axis=3)
+            maximum = (
+                chunk_max
+                if maximum is None
+                else np.maximum(maximum, chunk_max)
+            )
+        if "min" in reductions:
+            chunk_min = chunk.min(axis=3)
+            minimum = (
+                chunk_min
+                if minimum is None
+                else np.minimum(minimum, chunk_min)
+            )
+        if {"mean", "std", "tsnr"} & set(reductions):
+            n = chunk.shape[3]
+            chunk_mean = chunk.mean(axis=3)
+            chunk_m2 = ((chunk - chunk_mean[..., np.newaxis]) ** 2).sum(axis=3)
+            if mean is None:
+                mean, m2 = chunk_mean, chunk_m2
+            else:
+                delta = chunk_mean - mean
+                mean = mean + delta * (n / (count + n))
+                m2 = m2 + chunk_m2 + delta ** 2 * (count * n / (count + n))
+            count += n
+        del chunk
+
+    results = {}
+    if "max" in reductions:
+        results["max"] = maximum
+    if "min" in reductions:
+        results["min"] = minimum
+    if "mean" in reductions:
+        results["mean"] = mean
+    if "std" in reductions or "tsnr" in reductions:
+        std = np.sqrt(m2 / count)
+        if "std" in reductions:
+            results["std"] = std
+        if "tsnr" in reductions:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                results["tsnr"] = np.where(std > 0, mean / std, 0)
+    return results
@@ -1,12 +1,15 @@
 from __future__ import print_function
 
 import os
+import time
 
 import ipyvolume as ipv
 import nibabel as nib
 import numpy as np
 from ipywidgets import fixed, interact, widgets
 
+from .instrumentation import FRAME, PipelineStats
+
 
 def length(x):
     """Returns the sum of euclidean distances between neighboring points"""
@@ -41,9 +44,15 @@ class StreamlineWidget:
         streamlines : a nibabel streamline object
                 An streamlines attribute of an object loaded by
                 nibabel.streamlines.load
+        stats_callback : callable
+                Called as ``stats_callback(stage, seconds, nbytes)`` after
+                each timed stage of drawing, e.g. to log them. The "frame"
+                stage marks the end of a frame.
     """
 
-    def __init__(self, filename=None, streamlines=None):
+    def __init__(self, filename=None, streamlines=None, stats_callback=None):
+        # the time taken by each stage of plotting
+        self.stats = PipelineStats(callback=stats_callback)
 
         if filename:
             filename = str(filename)
@@ -60,7 +69,8 @@ class StreamlineWidget:
                 )
 
             # load data in advance
-            self.streamlines = nib.streamlines.load(filename).streamlines
+            with self.stats.stage("load"):
+                self.streamlines = nib.streamlines.load(filename).streamlines
         elif streamlines:
             self.streamlines = streamlines
         else:
@@ -101,6 +111,7 @@ class StreamlineWidget:
         self._default_plotter(**kwargs)
 
     def _create_mesh(self, indices2use=None):
+        start = time.perf_counter()
         if indices2use is None:
             lines2use = self.lines2use_
             local_colors = self.colors
@@ -141,6 +152,7 @@ class StreamlineWidget:
             ]
             line_offset += line_length * 2 - 2
             vertex_offset += line_length
+        self.stats.record("mesh", time.perf_counter() - start)
         return x, y, z, indices, colors, line_pointers
 
     def _default_plotter(self, **kwargs):
@@ -216,6 +228,7 @@ class StreamlineWidget:
 
         This function is called by _default_plotter
         """
+        start = time.perf_counter()
         if threshold < state["threshold"]:
             # when threshold is reduced, increase the number of lines
             state["indices"] = np.where(self.lengths > threshold)[0]
@@ -232,7 +245,8 @@ class StreamlineWidget:
                         line_offset : line_offset + line_length * 2 - 2
                     ] = line_indices
                 mesh.lines = copy
-                mesh.send_state("lines")
+                with self.stats.stage("send", copy.nbytes):
+                    mesh.send_state("lines")
         else:
             # when threshold is increased, decrease the number of lines
             indices = np.where(self.lengths <= threshold)[0]
@@ -247,6 +261,8 @@ class StreamlineWidget:
                     ) = self.line_pointers[idx]
                     copy[line_offset : line_offset + line_length * 2 - 2] = 0
                 mesh.lines = copy
-                mesh.send_state("lines")
+                with self.stats.stage("send", copy.nbytes):
+                    mesh.send_state("lines")
             state["indices"] = np.where(self.lengths > threshold)[0]
         state["threshold"] = threshold
+        self.stats.record(FRAME, time.perf_counter() - start)
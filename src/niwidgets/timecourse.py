@@ -0,0 +1,167 @@
+"""Time series of single voxels of 4D images.
+
+Volumes are stored with time as the slowest axis, so a voxel's time series
+is spread across the whole file. Reading it with a strided slice only
+touches those values, which is fast once the file is in the page cache. For
+repeated access to large runs, a time-major copy of the image, in which
+each voxel's series is contiguous, can be kept on disk.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+from .cache import get_cache_dir
+from .pyramid import _is_fresh
+from .slicing import extract_timecourse, get_dataobj
+
+
+def time_major_path(filename):
+    """Where the time-major copy of a file is stored.
+
+    This is a ``.timemajor.npy`` file beside the file, or a file in the
+    niwidgets cache if the file's directory isn't writable.
+    """
+    filename = os.path.abspath(str(filename))
+    if os.access(os.path.dirname(filename), os.W_OK):
+        return filename + ".timemajor.npy"
+    key = hashlib.sha1(filename.encode("utf-8")).hexdigest()
+    return os.path.join(get_cache_dir(), "timemajor", key + ".npy")
+
+
+def _transpose(source, target, chunk_bytes):
+    """Copy a volume into a C-ordered target, a slab of planes at a time."""
+    plane_bytes = int(np.prod(source.shape[:2])) * source.shape[3] * 8
+    chunk_planes = max(1, chunk_bytes // plane_bytes)
+    extra = (0,) * (len(source.shape) - 4)
+    for start in range(0, source.shape[2], chunk_planes):
+        stop = min(start + chunk_planes, source.shape[2])
+        slicer = (slice(None), slice(None), slice(start, stop))
+        target[slicer] = np.asanyarray(source[slicer + (slice(None),) + extra])
+
+
+def build_time_major(image, path=None, chunk_bytes=64 * 1024 ** 2):
+    """Build (or load) a copy of a 4D image with time as the fastest axis.
+
+    The copy is saved as a C-ordered ``.npy`` file and memory-mapped, so
+    each voxel's time series is one contiguous read. It is rebuilt if the
+    source file is newer. Images that aren't backed by a file are copied in
+    memory instead.
+
+    Args
+    ----
+        image : nibabel image
+                The 4D image.
+        path : str
+                Where to keep the copy. By default, see
+                :func:`time_major_path`.
+        chunk_bytes : int
+                Roughly how much of the image is read at a time while the
+                copy is built.
+    """
+    dataobj = get_dataobj(image)
+    if len(dataobj.shape) < 4:
+        raise ValueError("Time series need a 4D image.")
+    shape = tuple(dataobj.shape[:4])
+
+    filename = image.get_filename() if hasattr(image, "get_filename") else None
+    if path is None and filename is not None:
+        path = time_major_path(filename)
+    if path is None:
+        copy = np.empty(shape, dtype=np.float32)
+        _transpose(dataobj, copy, chunk_bytes)
+        return copy
+
+    if not _is_fresh(path, filename):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file, so that an interrupted build doesn't
+        # leave a copy behind that looks complete
+        partial = np.lib.format.open_memmap(
+            path + ".partial", mode="w+", dtype=np.float32, shape=shape
+        )
+        _transpose(dataobj, partial, chunk_bytes)
+        partial.flush()
+        del partial
+        os.replace(path + ".partial", path)
+    return np.load(path, mmap_mode="r")
+
+
+class TimeCourses:
+    """Read the time series of voxels of a 4D image.
+
+    Args
+    ----
+        image : nibabel image
+                The 4D image.
+        time_major : bool
+                Whether to read from a time-major copy of the image (see
+                :func:`build_time_major`) rather than the image itself.
+                Building it takes one pass over the image.
+    """
+
+    def __init__(self, image, time_major=False):
+        self.dataobj = get_dataobj(image)
+        if len(self.dataobj.shape) < 4:
+            raise ValueError("Time series need a 4D image.")
+        self.time_major = build_time_major(image) if time_major else None
+
+    @property
+    def n_frames(self):
+        return self.dataobj.shape[3]
+
+    def __call__(self, x, y, z):
+        """The time series of a voxel, or NaNs if it's outside the image."""
+        if not all(0 <= i < n for i, n in zip((x, y, z), self.dataobj.shape)):
+            return np.full(self.n_frames, np.nan)
+        if self.time_major is not None:
+            return np.asarray(self.time_major[x, y, z], dtype=float)
+        return extract_timecourse(self.dataobj, x, y, z)
+
+
+def timecourse_svg(values, t=None, width=600, height=120, color="#4682b4"):
+    """Draw a time series as a small SVG line plot.
+
+    Args
+    ----
+        values : np.ndarray
+                The value at each time point.
+        t : int
+                The time point to mark with a vertical line, if any.
+        width, height : int
+                The size of the plot, in pixels.
+        color : str
+                The colour of the line.
+    """
+    values = np.asarray(values, dtype=float)
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return '<svg width="{}" height="{}"></svg>'.format(width, height)
+    low, high = finite.min(), finite.max()
+    span = high - low if high > low else 1.0
+    # leave a margin for the value labels
+    margin = 40
+    xs = margin + np.arange(len(values)) * (
+        (width - margin) / max(len(values) - 1, 1)
+    )
+    ys = (height - 5) - (values - low) / span * (height - 10)
+    points = " ".join(
+        "{:.1f},{:.1f}".format(x, y) for x, y in zip(xs, ys) if np.isfinite(y)
+    )
+    header = '<svg width="{}" height="{}" xmlns="{}">'
+    parts = [
+        header.format(width, height, "http://www.w3.org/2000/svg"),
+        '<polyline points="{}" fill="none" stroke="{}"/>'.format(
+            points, color
+        ),
+        '<text x="0" y="12" font-size="10">{:.4g}</text>'.format(high),
+        '<text x="0" y="{}" font-size="10">{:.4g}</text>'.format(
+            height - 2, low
+        ),
+    ]
+    if t is not None and 0 <= t < len(values):
+        parts.append(
+            '<line x1="{0:.1f}" x2="{0:.1f}" y1="0" y2="{1}" '
+            'stroke="gray"/>'.format(xs[t], height)
+        )
+    parts.append("</svg>")
+    return "".join(parts)
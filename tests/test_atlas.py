@@ -0,0 +1,51 @@
+import nibabel as nib
+import numpy as np
+
+from niwidgets import exampleatlas
+from niwidgets.atlas import AtlasIndex, read_label_table
+
+
+def test_atlas_index():
+    data = np.asarray(nib.load(exampleatlas).dataobj)
+    # small chunks, so the index is built from several of them
+    atlas = AtlasIndex(exampleatlas, chunk_bytes=100000)
+    assert list(atlas.labels) == list(np.unique(data)[1:])
+    for label in (1, 57, atlas.labels[-1]):
+        voxels = np.argwhere(data == label)
+        region = atlas.region(label)
+        assert region["voxels"] == len(voxels)
+        np.testing.assert_allclose(region["centroid"], voxels.mean(axis=0))
+        assert region["bounding_box"] == (
+            tuple(voxels.min(axis=0)),
+            tuple(voxels.max(axis=0)),
+        )
+    assert atlas.label_at(0, 0, 0) == data[0, 0, 0]
+    assert atlas.name(0) is None
+
+
+def test_atlas_names_and_colors(tmp_path):
+    table = tmp_path / "labels.txt"
+    table.write_text("# label name r g b a\n1 Left 255 0 0 0\n2 Right\n")
+    names, colors = read_label_table(table)
+    assert names == {1: "Left", 2: "Right"}
+    assert colors == {1: (255, 0, 0)}
+
+    labels = np.zeros((4, 4, 4), dtype=np.int16)
+    labels[0], labels[3] = 1, 2
+    atlas = AtlasIndex(nib.Nifti1Image(labels, np.eye(4)), names=str(table))
+    assert atlas.find("Right") == 2
+    rgba = atlas.colorize(np.array([[0, 1, 2, np.nan]]))
+    assert tuple(rgba[0, 1]) == (255, 0, 0, 255)
+    assert rgba[0, 3, 3] == 0
+    assert len({tuple(color) for color in rgba[0, :3]}) == 3
+
+
+def test_volume_widget_atlas():
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    widget = VolumeWidget(exampleatlas, renderer="raster", atlas=True)
+    widget.jump_to_region(57)
+    widget.wait()
+    assert widget.atlas.label_at(*widget._cursor_voxel()) in (0, 57)
+    assert "Region" in widget.region_label.value
+    widget.close()
@@ -0,0 +1,27 @@
+import time
+
+import numpy as np
+
+from niwidgets.cache import PlaneCache, Prefetcher
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PlaneCache(max_bytes=3 * 800)
+    for i in range(3):
+        cache.put(i, np.zeros(100))
+    cache.get(0)
+    cache.put(3, np.zeros(100))
+    assert 0 in cache and 1 not in cache
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_prefetcher_fills_cache():
+    cache = PlaneCache()
+    prefetcher = Prefetcher(cache, lambda axis, index: np.full(3, index))
+    prefetcher.prefetch([(0, i) for i in range(5)])
+    for _ in range(100):
+        if len(cache) == 5:
+            break
+        time.sleep(0.01)
+    assert cache.get((0, 4))[0] == 4
+    prefetcher.shutdown()
@@ -0,0 +1,25 @@
+import numpy as np
+
+from niwidgets.client import N_LEVELS, quantise_volume, transfer_function_rgba
+
+
+def test_quantise_volume():
+    array = np.random.rand(6, 7, 8, 2)
+    array[0, 0, 0, 1] = np.nan
+    # small chunks, so the volume is quantised in several slabs
+    volume = quantise_volume(array, 0, 1, t=1, chunk_bytes=1000)
+    assert volume.dtype == np.uint8 and volume.shape == (6, 7, 8)
+    assert volume[0, 0, 0] == N_LEVELS
+    np.testing.assert_array_equal(
+        volume[1:],
+        np.clip(array[1:, ..., 1] * N_LEVELS, 0, N_LEVELS - 1).astype(
+            np.uint8
+        ),
+    )
+
+
+def test_transfer_function_rgba():
+    rgba = transfer_function_rgba("gray", opacity=0.5)
+    assert rgba.shape == (N_LEVELS + 1, 4)
+    assert rgba[0, 3] == 0 and np.isclose(rgba[N_LEVELS - 1, 3], 0.5)
+    assert rgba[N_LEVELS, 3] == 0
@@ -0,0 +1,140 @@
+import os
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+from niwidgets.export import (
+    export_batch,
+    export_volume,
+    render_lightbox,
+    render_plane,
+)
+from niwidgets.raster import tile_images
+
+
+def test_tile_images():
+    images = [np.full((2, 3, 4), i, dtype=np.uint8) for i in range(5)]
+    mosaic = tile_images(images, columns=3)
+    assert mosaic.shape == (4, 9, 4)
+    assert (mosaic[2:4, 3:6] == 4).all()
+    assert (mosaic[2:4, 6:9] == (0, 0, 0, 255)).all()
+
+
+def test_render(tmp_path):
+    image = nib.Nifti1Image(np.random.rand(10, 12, 14), np.eye(4))
+    assert render_plane(image, 2, 5).shape == (12, 10, 4)
+    assert render_lightbox(image, axis=2, n_planes=4).shape == (24, 20, 4)
+
+
+def test_export_batch(tmp_path):
+    filenames = []
+    for i in range(2):
+        filename = str(tmp_path / "sub-{}.nii.gz".format(i))
+        nib.save(
+            nib.Nifti1Image(np.random.rand(10, 12, 14, 3), np.eye(4)),
+            filename,
+        )
+        filenames.append(filename)
+
+    files = export_batch(
+        filenames, str(tmp_path / "qc"), processes=2, lightbox=2, sweep="gif"
+    )
+    assert sorted(files) == sorted(filenames)
+    for written in files.values():
+        assert len(written) == 5
+        with open(written[0], "rb") as f:
+            assert f.read(4) == b"\x89PNG"
+    assert (tmp_path / "qc" / "sub-0_sweep.gif").exists()
+
+
+def test_export_batch_same_names(tmp_path):
+    filenames = []
+    for subject in ("sub-01", "sub-02"):
+        (tmp_path / subject).mkdir()
+        filename = str(tmp_path / subject / "T1.nii.gz")
+        nib.save(nib.Nifti1Image(np.random.rand(6, 7, 8), np.eye(4)), filename)
+        filenames.append(filename)
+
+    files = export_batch(filenames, str(tmp_path / "qc"), processes=1)
+    written = [path for paths in files.values() for path in paths]
+    assert len(set(written)) == 6
+    assert (tmp_path / "qc" / "sub-01_T1_axial.png").exists()
+    assert (tmp_path / "qc" / "sub-02_T1_axial.png").exists()
+    with pytest.raises(ValueError):
+        export_batch(filenames, str(tmp_path / "qc"), name="qc", processes=1)
+
+
+def test_export_volume_name(tmp_path):
+    filename = str(tmp_path / "T1.nii.gz")
+    nib.save(nib.Nifti1Image(np.random.rand(6, 7, 8), np.eye(4)), filename)
+    files = export_volume(
+        filename, str(tmp_path / "qc"), lightbox=2, n_planes=4, name="sub"
+    )
+    assert [os.path.basename(path) for path in files] == [
+        "sub_sagittal.png",
+        "sub_coronal.png",
+        "sub_axial.png",
+        "sub_lightbox.png",
+    ]
+
+
+def test_extract_planes():
+    from niwidgets.slicing import extract_planes
+
+    array = np.random.rand(6, 7, 8, 2)
+    np.testing.assert_array_equal(
+        extract_planes(array, 1, [1, 3, 5], t=1),
+        np.moveaxis(array[:, 1:6:2, :, 1], 1, 0),
+    )
+    np.testing.assert_array_equal(
+        extract_planes(array[..., 0], 2, [0, 1, 5]),
+        np.moveaxis(array[:, :, [0, 1, 5], 0], 2, 0),
+    )
+
+
+def test_tile_stack():
+    images = np.arange(5)[:, None, None, None] * np.ones((5, 2, 3, 4))
+    images = images.astype(np.uint8)
+    np.testing.assert_array_equal(
+        tile_images(images, columns=3), tile_images(list(images), columns=3)
+    )
+
+
+def test_lightbox_widget():
+    from niwidgets.lightbox import LightboxWidget
+
+    image = nib.Nifti1Image(np.random.rand(10, 12, 14, 3), np.eye(4))
+    widget = LightboxWidget(image, n_planes=4, colormap="gray")
+    widget.wait()
+    assert widget.image.value == _png(
+        render_lightbox(image, n_planes=4, colormap="gray", t=0)
+    )
+    widget.t = 2
+    widget.colormap = "viridis"
+    widget.wait()
+    assert widget.image.value == _png(
+        render_lightbox(image, n_planes=4, colormap="viridis", t=2)
+    )
+    widget.close()
+
+
+def test_lightbox_widget_is_collected():
+    import gc
+    import weakref
+    from niwidgets.lightbox import LightboxWidget
+
+    image = nib.Nifti1Image(np.random.rand(10, 12, 14, 3), np.eye(4))
+    widget = LightboxWidget(image, n_planes=4)
+    widget.t = 1
+    widget.wait()
+    widget_ref = weakref.ref(widget)
+    del widget
+    gc.collect()
+    assert widget_ref() is None
+
+
+def _png(rgba):
+    from niwidgets.raster import encode_png
+
+    return encode_png(rgba)
@@ -0,0 +1,36 @@
+import gc
+import weakref
+
+import nibabel as nib
+import numpy as np
+
+from niwidgets.grid import GridWidget
+
+
+def test_grid_widget():
+    array = np.random.rand(10, 12, 14)
+    canonical = nib.Nifti1Image(array, np.eye(4))
+    # the same image, stored with its first axis reversed
+    affine = np.diag([-1.0, 1.0, 1.0, 1.0])
+    affine[0, 3] = 9
+    flipped = nib.Nifti1Image(array[::-1].copy(), affine)
+    grid = GridWidget([canonical, flipped], columns=2)
+    grid.x = 3
+    grid.wait()
+    assert grid.image.value.startswith(b"\x89PNG")
+    for axis in range(3):
+        first, second = grid._rgba[axis]
+        np.testing.assert_array_equal(first, second)
+    assert grid.stats["send"].count >= 1
+    grid.close()
+
+
+def test_grid_widget_is_collected():
+    image = nib.Nifti1Image(np.random.rand(10, 12, 14), np.eye(4))
+    grid = GridWidget([image, image])
+    grid.x = 3
+    grid.wait()
+    grid_ref = weakref.ref(grid)
+    del grid
+    gc.collect()
+    assert grid_ref() is None
@@ -0,0 +1,32 @@
+from niwidgets.instrumentation import FRAME, PipelineStats
+
+
+def test_pipeline_stats():
+    calls = []
+    stats = PipelineStats(callback=lambda *args: calls.append(args))
+    with stats.stage("encode", 100):
+        pass
+    stats.record("encode", 0.015, 50)
+    overlay = stats.overlay()
+    stats.record(FRAME, 0.02)
+
+    summary = stats.summary()
+    assert summary["encode"]["count"] == 2
+    assert summary["encode"]["bytes"] == 150
+    assert summary["encode"]["max"] == 0.015
+    # 15 ms falls in the bin up to 20 ms
+    assert dict(summary["encode"]["histogram"])[0.02] == 1
+    assert len(calls) == 3 and calls[1] == ("encode", 0.015, 50)
+    assert overlay.value.startswith("Frame: 20.0 ms")
+    assert "encode" in stats.report()
+
+    stats.record("send", 0.001, 300)
+    stats.record("send", 0.001, 200)
+    stats.record(FRAME, 0.01)
+    # the bytes sent while drawing a frame are the frame's
+    assert stats[FRAME].last_nbytes == 500
+    assert stats.summary()[FRAME]["mean_bytes"] == 250
+    assert overlay.value.endswith("0.5 kB")
+
+    stats.reset()
+    assert stats.summary() == {}
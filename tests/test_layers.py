@@ -0,0 +1,56 @@
+import nibabel as nib
+import numpy as np
+
+from niwidgets.layers import Layer
+from niwidgets.raster import blend
+
+
+def test_layer_resampling():
+    base_affine = np.eye(4)
+    # half the resolution, and stored with the first axis flipped
+    overlay_affine = np.diag([-2.0, 2.0, 2.0, 1.0])
+    overlay_affine[0, 3] = 18
+    overlay = np.random.rand(10, 8, 6)
+    layer = Layer(nib.Nifti1Image(overlay, overlay_affine))
+    layer.bind([base_affine], [(20, 16, 12)])
+
+    plane = layer.plane(2, 4)
+    assert plane.shape == (20, 16)
+    # base voxel (x, y, 4) is nearest to overlay voxel (9 - x/2, y/2, 2)
+    x, y = np.meshgrid(np.arange(20), np.arange(16), indexing="ij")
+    inside = ~np.isnan(plane)
+    assert inside.mean() > 0.8
+    expected = overlay[
+        np.round(9 - x[inside] / 2).astype(int),
+        np.round(y[inside] / 2).astype(int),
+        2,
+    ]
+    np.testing.assert_array_equal(plane[inside], expected)
+
+
+def test_layer_with_fewer_time_points():
+    overlay = np.random.rand(4, 5, 6, 2)
+    layer = Layer(nib.Nifti1Image(overlay, np.eye(4)))
+    layer.bind([np.eye(4)], [(4, 5, 6)])
+    np.testing.assert_array_equal(layer.plane(2, 3, t=1), overlay[:, :, 3, 1])
+    np.testing.assert_array_equal(layer.plane(2, 3, t=7), overlay[:, :, 3, 1])
+
+
+def test_layer_colorize():
+    layer = Layer(
+        nib.Nifti1Image(np.zeros((2, 2, 2)), np.eye(4)),
+        threshold=2,
+        opacity=0.5,
+        window=(0, 4),
+    )
+    rgba = layer.colorize(np.array([[1.0, 3.0], [-3.0, np.nan]]))
+    assert rgba[0, 0, 3] == 0 and rgba[1, 1, 3] == 0
+    assert rgba[0, 1, 3] == 127
+
+
+def test_blend():
+    bottom = np.full((1, 2, 4), 255, dtype=np.uint8)
+    top = np.array([[[0, 0, 0, 0], [0, 0, 0, 255]]], dtype=np.uint8)
+    blended = blend(bottom, top)
+    np.testing.assert_array_equal(blended[0, 0], bottom[0, 0])
+    np.testing.assert_array_equal(blended[0, 1], top[0, 1])
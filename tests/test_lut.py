@@ -0,0 +1,17 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+from niwidgets.lut import apply_lut, get_lut
+
+
+def test_lut_matches_matplotlib():
+    data = np.linspace(-1, 2, 1000).reshape(10, 100)
+    expected = plt.get_cmap("viridis")((data + 1) / 3, bytes=True)
+    np.testing.assert_array_equal(apply_lut(data, "viridis", -1, 2), expected)
+
+
+def test_lut_missing_values():
+    data = np.ma.masked_less(np.array([np.nan, 0.5, -1.0]), 0)
+    colors = apply_lut(data, "gray_r", 0, 1)
+    assert (colors[0] == get_lut("gray_r")[-1]).all()
+    assert (colors[2] == get_lut("gray_r")[-1]).all()
@@ -0,0 +1,54 @@
+import os
+
+import nibabel as nib
+import numpy as np
+
+from niwidgets.masking import (
+    compute_background_mask,
+    get_background_mask,
+    pack_mask,
+    unpack_mask,
+)
+
+
+def test_background_mask():
+    array = np.ones((10, 10, 10))
+    array[:2] = 0  # background, touching the edge
+    array[5, 5, 5] = 0  # a hole inside the image
+    mask = compute_background_mask(array)
+    assert mask[:2].all()
+    assert not mask[5, 5, 5]
+    assert mask.sum() == 200
+
+
+def test_mask_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("NIWIDGETS_CACHE_DIR", str(tmp_path / "cache"))
+    array = np.pad(np.ones((5, 6, 7)), 2)
+    filename = str(tmp_path / "test.nii")
+    nib.save(nib.Nifti1Image(array, np.eye(4)), filename)
+
+    first = get_background_mask(nib.load(filename))
+    assert len(list((tmp_path / "cache" / "masks").iterdir())) == 1
+    np.testing.assert_array_equal(
+        get_background_mask(nib.load(filename)), first
+    )
+    np.testing.assert_array_equal(unpack_mask(*pack_mask(first)), first)
+
+    # a changed file gets a new mask, without its content being hashed
+    array[5, 5, 5] = 0
+    array[0, 0, 0] = 1
+    nib.save(nib.Nifti1Image(array, np.eye(4)), filename)
+    os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 10 ** 9))
+    second = get_background_mask(nib.load(filename))
+    assert len(list((tmp_path / "cache" / "masks").iterdir())) == 2
+    assert not second[0, 0, 0] and first[0, 0, 0]
+
+
+def test_background_mask_4d():
+    array = np.zeros((8, 8, 8, 5))
+    array[2:6, 2:6, 2:6, 3] = 1  # only non-zero at one time point
+    image = nib.Nifti1Image(array, np.eye(4))
+    np.testing.assert_array_equal(
+        get_background_mask(image, use_cache=False),
+        compute_background_mask(array),
+    )
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+import pytest
+
+import niwidgets
+
+
+def test_import_is_lazy():
+    # a fresh interpreter, since other tests have imported the widgets
+    loaded = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys, niwidgets; "
+            "print(' '.join(m for m in ('matplotlib', 'ipywidgets') "
+            "if m in sys.modules))",
+        ],
+        universal_newlines=True,
+    )
+    assert loaded.strip() == ""
+
+
+def test_lazy_attributes():
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    assert niwidgets.VolumeWidget is VolumeWidget
+    assert "VolumeWidget" in dir(niwidgets)
+    with pytest.raises(AttributeError):
+        niwidgets.NotAWidget
@@ -0,0 +1,81 @@
+import os
+
+import nibabel as nib
+import numpy as np
+
+from niwidgets.pyramid import build_pyramid
+
+
+def test_pyramid_levels(tmp_path):
+    array = np.random.rand(40, 36, 32, 2).astype(np.float32)
+    filename = str(tmp_path / "test.nii")
+    nib.save(nib.Nifti1Image(array, np.eye(4)), filename)
+
+    pyramid = build_pyramid(nib.load(filename), min_size=8)
+    assert pyramid.n_levels == 3
+    assert pyramid.levels[2].shape == (10, 9, 8, 2)
+    assert os.path.isfile(filename + ".pyramid/level2.npy")
+    np.testing.assert_allclose(
+        pyramid.levels[1][0, 0, 0, 1], array[:2, :2, :2, 1].mean(), rtol=1e-5
+    )
+    assert pyramid.plane(1, 2, 31).shape == (20, 18)
+    assert pyramid.level_for_size((40, 36), 15) == 1
+    # the intensity range is recorded, and saved with the levels
+    np.testing.assert_allclose(pyramid.window, (array.min(), array.max()))
+    assert os.path.isfile(filename + ".pyramid/window.npy")
+    reloaded = build_pyramid(nib.load(filename), min_size=8)
+    np.testing.assert_allclose(reloaded.window, pyramid.window)
+
+
+def test_pyramid_window_is_exact(tmp_path):
+    # odd sizes, so the last plane of each axis isn't part of level 1
+    array = np.zeros((21, 19, 17), dtype=np.float32)
+    array[-1, -1, -1] = 5
+    array[0, 0, -1] = -3
+    filename = str(tmp_path / "test.nii")
+    nib.save(nib.Nifti1Image(array, np.eye(4)), filename)
+
+    pyramid = build_pyramid(nib.load(filename), min_size=8)
+    assert pyramid.window == (-3, 5)
+    # pyramids without a recorded range are rebuilt, not estimated
+    os.remove(filename + ".pyramid/window.npy")
+    rebuilt = build_pyramid(nib.load(filename), min_size=8)
+    assert rebuilt.window == (-3, 5)
+    assert os.path.isfile(filename + ".pyramid/window.npy")
+
+
+def test_pyramid_5d(tmp_path):
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    array = np.random.rand(20, 18, 16, 3, 2).astype(np.float32)
+    image = nib.Nifti1Image(array, np.eye(4))
+    pyramid = build_pyramid(image, min_size=8)
+    assert pyramid.levels[1].shape == (10, 9, 8, 3)
+    np.testing.assert_allclose(
+        pyramid.levels[1][0, 0, 0, 2],
+        array[:2, :2, :2, 2, 0].mean(),
+        rtol=1e-5,
+    )
+
+    widget = VolumeWidget(image, renderer="raster", pyramid=True)
+    widget.wait()
+    widget.close()
+
+
+def test_pyramid_window_skips_full_scan(tmp_path, monkeypatch):
+    import niwidgets.niwidget_volume as niwidget_volume
+
+    array = np.random.rand(40, 36, 32).astype(np.float32)
+    filename = str(tmp_path / "test.nii")
+    nib.save(nib.Nifti1Image(array, np.eye(4)), filename)
+    build_pyramid(nib.load(filename), min_size=8)
+
+    def scan(image, *args, **kwargs):
+        raise AssertionError("the full resolution image was scanned")
+
+    monkeypatch.setattr(niwidget_volume, "get_statistics", scan)
+    widget = niwidget_volume.VolumeWidget(
+        filename, renderer="raster", pyramid=True
+    )
+    widget.wait()
+    widget.close()
@@ -0,0 +1,51 @@
+import io
+
+import numpy as np
+import pytest
+
+from niwidgets.raster import FrameEncoder, encode_frame
+
+
+def _decode(data):
+    from PIL import Image
+
+    return np.asarray(Image.open(io.BytesIO(data)))
+
+
+def test_encode_frame():
+    pytest.importorskip("PIL")
+    rgba = np.zeros((20, 30, 4), dtype=np.uint8)
+    rgba[..., 0] = np.arange(30) * 8
+    rgba[..., 3] = 255
+
+    raw, raw_format = encode_frame(rgba, "raw")
+    png, png_format = encode_frame(rgba, "png")
+    assert raw_format == png_format == "png"
+    assert len(png) < len(raw)
+    np.testing.assert_array_equal(_decode(raw), rgba)
+    np.testing.assert_array_equal(_decode(png), rgba)
+
+    for image_format in ("jpeg", "webp"):
+        data, encoded_format = encode_frame(rgba, image_format, quality=90)
+        assert encoded_format == image_format
+        decoded = _decode(data)
+        # lossy formats drop the alpha channel, but stay close
+        assert decoded.shape == (20, 30, 3)
+        assert np.abs(decoded.astype(int) - rgba[..., :3]).mean() < 4
+
+    with pytest.raises(ValueError):
+        encode_frame(rgba, "gif")
+
+
+def test_frame_encoder():
+    rgba = np.full((8, 8, 4), 255, dtype=np.uint8)
+    assert not FrameEncoder("png").lossy_drag
+    assert not FrameEncoder("jpeg", drag_format="png").lossy_drag
+    assert FrameEncoder("jpeg", drag_quality=40).lossy_drag
+    encoder = FrameEncoder("png", drag_format="jpeg")
+    assert encoder.lossy_drag
+    assert encoder.encode(rgba)[1] == "png"
+    with pytest.raises(ValueError):
+        FrameEncoder(drag_format="bmp")
+    pytest.importorskip("PIL")
+    assert encoder.encode(rgba, dragging=True)[1] == "jpeg"
@@ -0,0 +1,52 @@
+import nibabel as nib
+import numpy as np
+
+from niwidgets.reslice import Reslicer, is_oblique
+
+
+def test_canonical_reslicing():
+    array = np.random.rand(7, 8, 9, 2)
+    affine = np.array(
+        [[0, 0, -2, 10], [-1.5, 0, 0, 3], [0, 3, 0, 1], [0, 0, 0, 1]]
+    )
+    image = nib.Nifti1Image(array, affine)
+    canonical = nib.as_closest_canonical(image).get_fdata()
+
+    reslicer = Reslicer(image.dataobj, affine)
+    assert not reslicer.oblique
+    assert reslicer.shape == canonical.shape
+    for axis in range(3):
+        index = reslicer.shape[axis] // 3
+        slicer = [slice(None)] * 3 + [1]
+        slicer[axis] = index
+        np.testing.assert_allclose(
+            reslicer.plane(axis, index, t=1), canonical[tuple(slicer)]
+        )
+
+
+def test_oblique_reslicing():
+    # a 30 degree rotation about the z axis
+    angle = np.deg2rad(30)
+    affine = np.eye(4)
+    affine[:2, :2] = 2 * np.array(
+        [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    )
+    assert is_oblique(affine)
+
+    # linear in world coordinates, so interpolation is exact
+    voxels = np.indices((10, 12, 8)).reshape(3, -1)
+    world = affine[:3, :3].dot(voxels)
+    array = (world[0] + 2 * world[1]).reshape(10, 12, 8)
+
+    reslicer = Reslicer(array, affine)
+    plane = reslicer.plane(2, 4)
+    grid_to_world = reslicer.grid_affine
+    rows, columns = np.indices(plane.shape)
+    expected = (
+        grid_to_world[0, 3]
+        + grid_to_world[0, 0] * rows
+        + 2 * (grid_to_world[1, 3] + grid_to_world[1, 1] * columns)
+    )
+    inside = ~np.isnan(plane)
+    assert inside.any() and not inside.all()
+    np.testing.assert_allclose(plane[inside], expected[inside])
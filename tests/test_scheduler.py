@@ -0,0 +1,101 @@
+import gc
+import threading
+import time
+import weakref
+
+import pytest
+
+from niwidgets.scheduler import RenderScheduler
+
+
+def test_requests_are_coalesced():
+    started = threading.Event()
+    release = threading.Event()
+    frames = []
+
+    def render():
+        started.set()
+        release.wait()
+        frames.append(time.monotonic())
+
+    scheduler = RenderScheduler(render)
+    scheduler.request()
+    started.wait()
+    # these arrive while the first frame is being drawn
+    for _ in range(10):
+        scheduler.request()
+    release.set()
+    assert scheduler.flush(timeout=5)
+
+    assert len(frames) == 2
+    assert scheduler.rendered == 2
+    assert scheduler.dropped == 9
+    stats = scheduler.stats()
+    assert stats["requested_fps"] > stats["achieved_fps"]
+    scheduler.shutdown()
+
+
+def test_stale_renders_are_cancelled():
+    started = threading.Event()
+    release = threading.Event()
+    frames = []
+
+    def render():
+        started.set()
+        release.wait()
+        scheduler.checkpoint()
+        frames.append(time.monotonic())
+
+    scheduler = RenderScheduler(render, max_latency=60)
+    release.set()
+    scheduler.request()
+    assert scheduler.flush(timeout=5)
+
+    release.clear()
+    started.clear()
+    scheduler.request()
+    started.wait()
+    # this makes the frame being drawn out of date
+    scheduler.request()
+    release.set()
+    assert scheduler.flush(timeout=5)
+
+    # the stale frame was abandoned, and only the latest one finished
+    assert len(frames) == 2
+    assert scheduler.cancelled == 1
+    assert scheduler.stats()["rendered"] == 2
+    scheduler.shutdown()
+
+
+def test_render_errors_are_reported(caplog):
+    def render():
+        raise ValueError("bad colormap")
+
+    scheduler = RenderScheduler(render)
+    for _ in range(3):
+        scheduler.request()
+        with pytest.raises(ValueError):
+            scheduler.flush(timeout=5)
+    # each error is logged, and none are kept once re-raised
+    assert caplog.text.count("Drawing a frame failed") == 3
+    assert scheduler.error is None
+    scheduler.shutdown()
+
+
+def test_render_thread_does_not_keep_its_owner_alive():
+    class Owner:
+        def render(self):
+            pass
+
+    owner = Owner()
+    scheduler = RenderScheduler(owner.render)
+    scheduler.request()
+    assert scheduler.flush(timeout=5)
+
+    owner_ref = weakref.ref(owner)
+    del owner
+    gc.collect()
+    assert owner_ref() is None
+    # the thread notices its owner is gone, and stops
+    scheduler._thread.join(timeout=5)
+    assert not scheduler._thread.is_alive()
@@ -0,0 +1,34 @@
+import nibabel as nib
+import numpy as np
+import pytest
+
+from niwidgets.slicing import extract_plane, load_volume
+from niwidgets.sources import ArraySource, VolumeSource, convert_nifti
+
+
+def test_array_source():
+    array = np.random.rand(4, 5, 6, 2, 3)
+    source = ArraySource(array)
+    assert load_volume(source) is source
+    np.testing.assert_array_equal(
+        extract_plane(source, 0, 1, t=1), array[1, :, :, 1, 0]
+    )
+    # sources have to say how they are read
+    with pytest.raises(TypeError):
+        VolumeSource()
+
+
+@pytest.mark.parametrize(
+    "module, extension", [("zarr", ".zarr"), ("h5py", ".h5")]
+)
+def test_convert_nifti(tmp_path, module, extension):
+    pytest.importorskip(module)
+    array = np.random.rand(10, 11, 12, 2).astype(np.float32)
+    filename = str(tmp_path / "test.nii")
+    nib.save(nib.Nifti1Image(array, np.diag([2, 2, 2, 1])), filename)
+
+    convert_nifti(filename, str(tmp_path / ("test" + extension)), (4, 4, 4, 1))
+    source = load_volume(str(tmp_path / ("test" + extension)))
+    assert source.shape == array.shape
+    assert source.affine[0, 0] == 2
+    np.testing.assert_array_equal(source[:, :, 5, 1], array[:, :, 5, 1])
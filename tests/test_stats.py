@@ -0,0 +1,39 @@
+import nibabel as nib
+import numpy as np
+
+from niwidgets.stats import compute_statistics, get_statistics, reduce_time
+
+
+def test_statistics_match_numpy():
+    array = np.random.rand(10, 12, 14, 3)
+    image = nib.Nifti1Image(array, np.eye(4))
+
+    stats = compute_statistics(image, per_frame=True, chunk_bytes=1000)
+    assert stats.min == array.min()
+    assert stats.max == array.max()
+    assert np.isclose(stats.percentiles[50], np.percentile(array, 50))
+    assert stats.histogram[0].sum() == array.size
+    assert len(stats.frames) == 3
+    assert stats.frames[1].max == array[..., 1].max()
+
+
+def test_statistics_are_cached():
+    image = nib.Nifti1Image(np.random.rand(5, 5, 5), np.eye(4))
+    assert get_statistics(image) is get_statistics(image)
+
+
+def test_time_reductions_match_numpy():
+    array = np.random.rand(6, 7, 8, 11) * 100
+    image = nib.Nifti1Image(array, np.eye(4))
+
+    # a small chunk size, so the results are combined across chunks
+    results = reduce_time(
+        image, ("max", "min", "mean", "std", "tsnr"), chunk_bytes=3000
+    )
+    np.testing.assert_allclose(results["max"], array.max(axis=3))
+    np.testing.assert_allclose(results["min"], array.min(axis=3))
+    np.testing.assert_allclose(results["mean"], array.mean(axis=3))
+    np.testing.assert_allclose(results["std"], array.std(axis=3))
+    np.testing.assert_allclose(
+        results["tsnr"], array.mean(axis=3) / array.std(axis=3)
+    )
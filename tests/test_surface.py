@@ -4,3 +4,44 @@ from niwidgets.exampledata import examplesurface
 
 def test_creation():
     SurfaceWidget(examplesurface)
+
+
+def test_overlay_is_coloured_in_background(tmp_path):
+    import nibabel as nb
+    import numpy as np
+
+    coords = np.random.rand(4, 3).astype(np.float32)
+    faces = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.int32)
+    mesh = str(tmp_path / "lh.test")
+    nb.freesurfer.write_geometry(mesh, coords, faces)
+
+    widget = SurfaceWidget(mesh)
+    x, y, z = coords.T
+    widget._plot_surface(
+        x,
+        y,
+        z,
+        faces,
+        overlays={None: np.arange(4.0)},
+        frame=None,
+        colormap="gray",
+    )
+    widget.wait()
+    colors = widget.fig.meshes[0].color
+    assert colors.shape == (4, 3)
+    assert colors[0].sum() < colors[-1].sum()
+    assert widget.stats["frame"].count == 1
+    # the overlay was quantised once, so other colormaps are just a lookup
+    widget._plot_surface(
+        x,
+        y,
+        z,
+        faces,
+        overlays=widget._request[0],
+        frame=None,
+        colormap="hot",
+    )
+    widget.wait()
+    assert widget.stats["quantise"].count == 1
+    assert widget.stats["frame"].count == 2
+    widget.close()
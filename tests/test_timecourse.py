@@ -0,0 +1,47 @@
+import os
+
+import nibabel as nib
+import numpy as np
+
+from niwidgets.timecourse import TimeCourses, build_time_major, timecourse_svg
+
+
+def test_timecourses(tmp_path):
+    array = np.random.rand(6, 7, 8, 5).astype(np.float32)
+    filename = str(tmp_path / "run.nii")
+    nib.save(nib.Nifti1Image(array, np.eye(4)), filename)
+    image = nib.load(filename)
+
+    strided = TimeCourses(image)
+    np.testing.assert_allclose(strided(1, 2, 3), array[1, 2, 3])
+    assert np.isnan(strided(-1, 2, 3)).all()
+
+    time_major = TimeCourses(image, time_major=True)
+    assert os.path.isfile(filename + ".timemajor.npy")
+    assert time_major.time_major.flags.c_contiguous
+    np.testing.assert_allclose(time_major(5, 6, 7), array[5, 6, 7])
+
+    in_memory = build_time_major(nib.Nifti1Image(array, np.eye(4)))
+    np.testing.assert_allclose(in_memory, array)
+
+
+def test_timecourse_svg():
+    svg = timecourse_svg([1, 3, 2], t=1)
+    assert svg.startswith("<svg") and "<polyline" in svg and "<line" in svg
+    assert "<polyline" not in timecourse_svg([np.nan, np.nan])
+
+
+def test_volume_widget_timecourse():
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    array = np.random.rand(6, 7, 8, 5)
+    widget = VolumeWidget(
+        nib.Nifti1Image(array, np.eye(4)), renderer="raster", timecourse=True
+    )
+    widget.x, widget.y, widget.z = 1, 2, 3
+    widget.wait()
+    voxel, values = widget._timecourse
+    assert voxel == (1, 2, 3)
+    np.testing.assert_allclose(values, array[1, 2, 3])
+    assert "<polyline" in widget.timecourse_display.value
+    widget.close()
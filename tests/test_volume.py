@@ -1,5 +1,314 @@
+import time
+
+import pytest
+
 from niwidgets import NiftiWidget, examplet1
 
 
 def test_creation():
     test_widget = NiftiWidget(examplet1)
+
+
+def test_creation_5d():
+    import nibabel as nib
+    import numpy as np
+
+    # only VolumeWidget shows the first index of axes after time
+    test_widget = NiftiWidget(nib.Nifti1Image(np.zeros((4, 5, 6, 2, 2)), None))
+    with pytest.raises(ValueError):
+        test_widget.nifti_plotter()
+
+
+def test_extract_plane(tmp_path):
+    import nibabel as nib
+    import numpy as np
+    from niwidgets.slicing import extract_plane, load_volume
+
+    array = np.random.rand(4, 5, 6, 3).astype(np.float32)
+    filename = str(tmp_path / "test.nii")
+    nib.save(nib.Nifti1Image(array, np.eye(4)), filename)
+
+    image = load_volume(filename)
+    np.testing.assert_allclose(
+        extract_plane(image.dataobj, 1, 2, t=1), array[:, 2, :, 1]
+    )
+    np.testing.assert_allclose(
+        extract_plane(array[..., 0], 2, 5), array[:, :, 5, 0]
+    )
+
+
+def test_compressed_images_are_read_on_first_plane(tmp_path):
+    import nibabel as nib
+    import numpy as np
+    from niwidgets.slicing import (
+        _decompressed,
+        extract_plane,
+        get_dataobj,
+        load_volume,
+    )
+
+    array = np.random.rand(4, 5, 6).astype(np.float32)
+    filename = str(tmp_path / "test.nii.bz2")
+    nib.save(nib.Nifti1Image(array, np.eye(4)), filename)
+
+    image = load_volume(filename)
+    dataobj = get_dataobj(image)
+    assert dataobj.shape == array.shape
+    assert image not in _decompressed
+    np.testing.assert_allclose(extract_plane(dataobj, 0, 1), array[1])
+    assert image in _decompressed
+    np.testing.assert_allclose(np.asanyarray(get_dataobj(image)), array)
+
+
+def test_volume_widget_creation():
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    test_widget = VolumeWidget(examplet1)
+    test_widget.x = 10
+    test_widget.wait()
+    assert test_widget.displays[0].outputs
+    test_widget.close()
+
+
+def test_custom_plot_cache():
+    from niwidgets.niwidget_volume import NiftiWidget
+
+    calls = []
+
+    def plot(image, cut_coords=None, figure=None, cmap=None):
+        calls.append((tuple(cut_coords), cmap))
+        figure.add_subplot(1, 1, 1).plot(cut_coords)
+
+    test_widget = NiftiWidget(examplet1)
+    test_widget.nifti_plotter(
+        plotting_func=plot, colormap=["gray", "hot"], prerender=True
+    )
+    settings = {"x": 5, "y": 0, "z": 0, "colormap": "gray"}
+    test_widget._custom_plot_wrapper(None, figsize=(2, 2), **settings)
+    test_widget._custom_plot_wrapper(None, figsize=(2, 2), **settings)
+    # the second call is served from the cache
+    assert calls.count(((5, 0, 0), "gray")) == 1
+
+    # wait for the neighbouring slider values to be rendered
+    deadline = time.monotonic() + 10
+    while len(calls) < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ((6, 0, 0), "gray") in calls and ((5, 0, -1), "gray") in calls
+    n_calls = len(calls)
+    test_widget._custom_plot_wrapper(
+        None, figsize=(2, 2), **dict(settings, x=6)
+    )
+    assert len(calls) == n_calls
+    test_widget.close()
+
+
+def test_custom_plot_default_cmap_is_set_on_main_thread():
+    import threading
+
+    import matplotlib.pyplot as plt
+    from niwidgets.niwidget_volume import NiftiWidget
+
+    calls = []
+
+    def plot(image, cut_coords=None, figure=None):
+        calls.append((threading.current_thread(), plt.rcParams["image.cmap"]))
+        figure.add_subplot(1, 1, 1).plot(cut_coords)
+
+    default = plt.rcParams["image.cmap"]
+    test_widget = NiftiWidget(examplet1)
+    test_widget.nifti_plotter(
+        plotting_func=plot, colormap=["gray", "hot"], prerender=True
+    )
+    settings = {"x": 5, "y": 0, "z": 0, "colormap": "hot"}
+    test_widget._custom_plot_wrapper(None, figsize=(2, 2), **settings)
+    time.sleep(0.2)
+    # only the requested plot was drawn, on this thread, in its colormap
+    assert calls == [(threading.current_thread(), "hot")]
+    assert plt.rcParams["image.cmap"] == default
+    test_widget.close()
+
+
+def test_volume_widget_raster():
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    test_widget = VolumeWidget(examplet1, renderer="raster")
+    test_widget.z = 10
+    test_widget.wait()
+    assert test_widget.images[2].value.startswith(b"\x89PNG")
+    stats = test_widget.stats.summary()
+    assert stats["send"]["bytes"] > 0
+    assert {"load", "read", "colormap", "encode", "frame"} <= set(stats)
+    test_widget.close()
+
+
+def test_volume_widget_caches_coloured_views():
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    test_widget = VolumeWidget(examplet1, renderer="raster", prefetch=0)
+    colormap = test_widget.colormap
+    for z in (10, 20):
+        test_widget.z = z
+        test_widget.wait()
+    test_widget.colormap = "gray"
+    test_widget.wait()
+    n_colormapped = test_widget.stats["colormap"].count
+    # views shown before are neither read nor colour-mapped again
+    test_widget.colormap = colormap
+    test_widget.z = 10
+    test_widget.wait()
+    assert test_widget.stats["colormap"].count == n_colormapped
+    test_widget.close()
+
+
+def test_volume_widget_is_collected():
+    import gc
+    import weakref
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    test_widget = VolumeWidget(examplet1, renderer="raster")
+    test_widget.z = 10
+    test_widget.wait()
+    test_widget.render()
+    widget_ref = weakref.ref(test_widget)
+    del test_widget
+    gc.collect()
+    assert widget_ref() is None
+
+
+def test_volume_widget_stats_callback():
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    calls = []
+    test_widget = VolumeWidget(
+        examplet1,
+        renderer="raster",
+        stats_callback=lambda *args: calls.append(args),
+    )
+    test_widget.z = 10
+    test_widget.wait()
+    stages = [stage for stage, seconds, nbytes in calls]
+    assert "load" in stages and "frame" in stages
+    assert all(seconds >= 0 for stage, seconds, nbytes in calls)
+    test_widget.close()
+
+
+def test_volume_widget_encoding():
+    from niwidgets.niwidget_volume import VolumeWidget
+    from niwidgets.raster import FrameEncoder
+
+    pytest.importorskip("PIL")
+    test_widget = VolumeWidget(
+        examplet1, renderer="raster", encoding=FrameEncoder("jpeg", 70)
+    )
+    test_widget.z = 10
+    test_widget.wait()
+    assert test_widget.images[2].format == "jpeg"
+    assert test_widget.images[2].value.startswith(b"\xff\xd8")
+    assert test_widget.stats["frame"].last_nbytes > 0
+    test_widget.close()
+
+    test_widget = VolumeWidget(
+        examplet1,
+        encoding=FrameEncoder(drag_format="jpeg"),
+        settle_time=10,
+    )
+    test_widget.x, test_widget.x = 10, 11
+    test_widget.wait()
+    # sent lossily while dragging, then losslessly once settled
+    assert "image/jpeg" in test_widget.displays[0].outputs[0]["data"]
+    test_widget._refine_timer.cancel()
+    test_widget._refine()
+    test_widget.wait()
+    assert "image/png" in test_widget.displays[0].outputs[0]["data"]
+    test_widget.close()
+    with pytest.raises(ValueError):
+        VolumeWidget(examplet1, encoding="webp")
+    # closing a widget whose arguments were rejected doesn't fail too
+    VolumeWidget.__new__(VolumeWidget).close()
+
+
+def test_volume_widget_cancels_stale_frames():
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    for renderer in ("raster", "matplotlib"):
+        test_widget = VolumeWidget(examplet1, renderer=renderer)
+        test_widget.wait()
+        test_widget._scheduler.max_latency = 60
+        for z in range(10, 20):
+            test_widget.z = z
+        test_widget.orient_radiology = False
+        test_widget.wait()
+        # whatever was cancelled, the views end up in the latest state
+        assert not test_widget._dirty_content | test_widget._dirty_overlay
+        if renderer == "raster":
+            expected = test_widget._get_plane(2, 19, 0)
+            assert test_widget._rgba[2].shape[:2] == expected.shape
+        else:
+            assert test_widget._figure_orientations == [False] * 3
+            left, right = test_widget.axes[2].get_xlim()
+            assert left < right
+        test_widget.close()
+
+
+def test_volume_widget_reslice():
+    import nibabel as nib
+    import numpy as np
+    from niwidgets.niwidget_volume import VolumeWidget
+
+    array = np.random.rand(10, 12, 14)
+    affine = np.diag([-1.0, 1.0, 1.0, 1.0])
+    flipped = VolumeWidget(
+        nib.Nifti1Image(array, affine), renderer="raster", reslice=True
+    )
+    canonical = VolumeWidget(
+        nib.Nifti1Image(array[::-1], np.eye(4)), renderer="raster"
+    )
+    for widget in (flipped, canonical):
+        widget.z = 3
+        widget.wait()
+    np.testing.assert_array_equal(flipped._rgba[2], canonical._rgba[2])
+    flipped.close()
+    canonical.close()
+
+
+def test_volume_widget_layers():
+    import nibabel as nib
+    import numpy as np
+    from niwidgets.niwidget_volume import VolumeWidget
+    from niwidgets.raster import colormap_plane
+
+    base = np.random.rand(10, 12, 14)
+    overlay = np.ones((10, 12, 14))
+    overlay[:5] = 5
+    for renderer in ("raster", "matplotlib"):
+        test_widget = VolumeWidget(
+            nib.Nifti1Image(base, np.eye(4)),
+            renderer=renderer,
+            colormap="gray",
+            guidelines=False,
+            layers=[nib.Nifti1Image(overlay, np.eye(4))],
+        )
+        layer = test_widget.layers[0]
+        layer.threshold = 3
+        test_widget.z = 7
+        test_widget.wait()
+        test_widget.render()
+        # views are rotated for display
+        above = np.rot90(overlay[:, :, 7] >= 3)
+        layer_rgba = layer.colorize(np.rot90(overlay[:, :, 7]))
+        assert above.any() and not above.all()
+        assert (layer_rgba[above, 3] == 255).all()
+        assert (layer_rgba[~above, 3] == 0).all()
+        if renderer == "raster":
+            # the overlay colour above the threshold, the image below it
+            rgba = test_widget._rgba[2]
+            vmin, vmax = test_widget._window
+            base_rgba = colormap_plane(
+                np.rot90(base[:, :, 7]), "gray", vmin, vmax
+            )
+            np.testing.assert_array_equal(rgba[above], layer_rgba[above])
+            np.testing.assert_array_equal(rgba[~above], base_rgba[~above])
+        else:
+            drawn = test_widget.layer_images[2][0].get_array()
+            np.testing.assert_array_equal(drawn, layer_rgba)
+        test_widget.close()